@@ -1,119 +1,547 @@
 #!/usr/bin/env python3
 """
 Excel File Analysis Script
-Analyzes the structure and content of the readmission data Excel file
+Analyzes the structure and content of readmission data extracts in a single
+streaming pass per sheet (openpyxl read-only mode), accumulating per-column
+counts, numeric moments and bounded distinct-value and quantile sketches so
+memory stays flat regardless of workbook size. As a CLI it profiles many files
+and sheets concurrently, writes a JSON/Parquet profile per sheet and diffs each
+against a baseline schema.
 """
 
-import pandas as pd
-import numpy as np
-import sys
+import argparse
+import csv
+import glob
+import hashlib
+import heapq
+import json
+import math
 import os
+import random
+import re
+import sys
+import time as timer
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+# Distinct values are tracked exactly up to this many, then estimated from a KMV sketch
+DISTINCT_EXACT_LIMIT = 4096
+KMV_SKETCH_SIZE = 1024
+# Numeric quantiles come from a uniform reservoir sample (exact below this many values)
+QUANTILE_RESERVOIR_SIZE = 10_000
+HEAD_ROWS = 5
+SAMPLE_VALUES = 10
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+CSV_EXTENSIONS = ('.csv',)
+OUTPUT_FORMATS = ["json", "parquet"]
+
+KEY_FIELD_KEYWORDS = ['hospital', 'idn', 'provider', 'facility', 'name', 'id', 'code']
+METRIC_KEYWORDS = ['cmi', 'los', 'length', 'stay', 'readmission', 'rate', 'ratio', 'index', 'score']
+
+def _hash64(value):
+    """Stable 64-bit hash (hash() of str is salted per process, which would make estimates vary run to run)"""
+    return int.from_bytes(hashlib.blake2b(repr(value).encode(), digest_size=8).digest(), "little")
+
+def _json_value(value):
+    """Convert cell values and numpy scalars to JSON-friendly values"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return value
+
+def slugify(text):
+    """Make a filesystem-safe file name"""
+    return re.sub(r'[^A-Za-z0-9]+', '-', str(text)).strip('-').lower() or "sheet"
+
+def _type_name(value):
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "int" if isinstance(value, int) else "float"
+    if isinstance(value, (datetime, date)):
+        return "datetime"
+    if isinstance(value, time):
+        return "time"
+    return "str"
+
+def is_key_field(column):
+    """Columns that look like hospital/IDN identifiers"""
+    return any(keyword in column.lower() for keyword in KEY_FIELD_KEYWORDS)
+
+def is_metric_column(column):
+    """Columns that look like outcome metrics"""
+    return any(keyword in column.lower() for keyword in METRIC_KEYWORDS)
+
+def is_drg_column(column):
+    return 'drg' in column.lower()
+
+class ColumnProfile:
+    """Running statistics of one column, updated one cell at a time in bounded memory"""
+
+    def __init__(self, name, seed=0):
+        self.name = name
+        self.count = 0
+        self.nulls = 0
+        self.types = Counter()
+        self.numeric_count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+        # Insertion-ordered exact distinct values until the limit, then only the sketch
+        self._distinct = {}
+        self._distinct_overflow = False
+        # K smallest distinct hash values (negated for heapq's min-heap)
+        self._kmv = []
+        self._kmv_members = set()
+        self._reservoir = []
+        self._rng = random.Random(seed)
+
+    def add(self, value):
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            self.nulls += 1
+            return
+        self.count += 1
+        kind = _type_name(value)
+        self.types[kind] += 1
+
+        if kind in ("int", "float"):
+            self._add_numeric(float(value))
+
+        if self._distinct_overflow:
+            self._add_to_sketch(value)
+        else:
+            self._distinct[value] = None
+            if len(self._distinct) > DISTINCT_EXACT_LIMIT:
+                # The exact set holds every distinct value so far, so the sketch can start from it
+                self._distinct_overflow = True
+                for seen in self._distinct:
+                    self._add_to_sketch(seen)
+
+    def _add_numeric(self, x):
+        # Welford's update keeps mean and variance numerically stable in one pass
+        self.numeric_count += 1
+        delta = x - self.mean
+        self.mean += delta / self.numeric_count
+        self._m2 += delta * (x - self.mean)
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+
+        if len(self._reservoir) < QUANTILE_RESERVOIR_SIZE:
+            self._reservoir.append(x)
+        else:
+            slot = self._rng.randrange(self.numeric_count)
+            if slot < QUANTILE_RESERVOIR_SIZE:
+                self._reservoir[slot] = x
+
+    def _add_to_sketch(self, value):
+        h = _hash64(value)
+        if h in self._kmv_members:
+            return
+        if len(self._kmv) < KMV_SKETCH_SIZE:
+            heapq.heappush(self._kmv, -h)
+            self._kmv_members.add(h)
+        elif h < -self._kmv[0]:
+            evicted = -heapq.heapreplace(self._kmv, -h)
+            self._kmv_members.discard(evicted)
+            self._kmv_members.add(h)
+
+    @property
+    def rows(self):
+        return self.count + self.nulls
+
+    @property
+    def dtype(self):
+        """The dtype pandas would infer for the column"""
+        kinds = set(self.types)
+        if not kinds:
+            return "float64"
+        if kinds == {"int"}:
+            return "int64" if self.nulls == 0 else "float64"
+        if kinds <= {"int", "float"}:
+            return "float64"
+        if kinds == {"bool"} and self.nulls == 0:
+            return "bool"
+        if kinds == {"datetime"}:
+            return "datetime64[ns]"
+        return "object"
+
+    @property
+    def is_numeric(self):
+        return self.dtype in ("int64", "float64") and self.numeric_count > 0
+
+    @property
+    def distinct_exact(self):
+        """Whether distinct_count is an exact count rather than an estimate"""
+        return not self._distinct_overflow
+
+    @property
+    def distinct_count(self):
+        """Number of distinct non-null values (KMV estimate past DISTINCT_EXACT_LIMIT)"""
+        if not self._distinct_overflow:
+            return len(self._distinct)
+        kth_smallest = -self._kmv[0] / 2 ** 64
+        return int(round((KMV_SKETCH_SIZE - 1) / kth_smallest))
+
+    def sample_values(self, limit):
+        """First distinct values in order of appearance"""
+        return list(self._distinct)[:limit]
+
+    @property
+    def std(self):
+        """Sample standard deviation (ddof=1, as in pandas)"""
+        if self.numeric_count < 2:
+            return np.nan
+        return math.sqrt(self._m2 / (self.numeric_count - 1))
+
+    def quantile(self, q):
+        """Linear-interpolated quantile, exact up to QUANTILE_RESERVOIR_SIZE numeric values"""
+        if not self._reservoir:
+            return np.nan
+        return float(np.quantile(self._reservoir, q))
+
+    def describe(self):
+        """The statistics pandas' describe() reports for a numeric column"""
+        return {
+            'count': self.numeric_count,
+            'mean': self.mean if self.numeric_count else np.nan,
+            'std': self.std,
+            'min': self.min if self.min is not None else np.nan,
+            '25%': self.quantile(0.25),
+            '50%': self.quantile(0.5),
+            '75%': self.quantile(0.75),
+            'max': self.max if self.max is not None else np.nan,
+        }
+
+    def to_dict(self):
+        """JSON-serializable profile of the column"""
+        record = {
+            'name': self.name,
+            'dtype': self.dtype,
+            'count': self.count,
+            'nulls': self.nulls,
+            'types': dict(self.types),
+            'distinct_count': self.distinct_count,
+            'distinct_exact': self.distinct_exact,
+            'numeric_count': self.numeric_count,
+            'key_field': is_key_field(self.name),
+            'metric_column': is_metric_column(self.name),
+            'drg_column': is_drg_column(self.name),
+            'sample_values': [_json_value(v) for v in self.sample_values(SAMPLE_VALUES)],
+        }
+        stats = self.describe()
+        for stat in ('mean', 'std', 'min', '25%', '50%', '75%', 'max'):
+            record[stat] = _json_value(float(stats[stat]))
+        return record
+
+def unique_headers(header_row):
+    """Column names as pandas would read them: blank headers become "Unnamed: i", repeats get ".n" suffixes"""
+    names = []
+    seen = Counter()
+    for i, value in enumerate(header_row):
+        base = f"Unnamed: {i}" if value is None or str(value).strip() == "" else str(value)
+        names.append(f"{base}.{seen[base]}" if seen[base] else base)
+        seen[base] += 1
+    return names
+
+class SheetProfile:
+    """One streaming pass over a worksheet: shape, per-column profiles and the first rows"""
+
+    def __init__(self, sheet_name, columns):
+        self.sheet_name = sheet_name
+        self.columns = [ColumnProfile(name, seed=i) for i, name in enumerate(columns)]
+        self.rows = 0
+        self.head = []
+
+    @classmethod
+    def from_rows(cls, sheet_name, rows):
+        """Profile an iterator of row tuples whose first row is the header"""
+        rows = iter(rows)
+        header = next(rows, None)
+        profile = cls(sheet_name, unique_headers(header or ()))
+        for row in rows:
+            profile.add_row(row)
+        return profile
+
+    @property
+    def column_names(self):
+        return [column.name for column in self.columns]
+
+    def add_row(self, row):
+        # Fully blank rows (e.g. formatting below the data) are not data
+        if all(value is None for value in row):
+            return
+        self.rows += 1
+        if len(self.head) < HEAD_ROWS:
+            self.head.append(tuple(row[:len(self.columns)]))
+        for i, column in enumerate(self.columns):
+            column.add(row[i] if i < len(row) else None)
+
+    def to_dict(self):
+        """JSON-serializable profile of the sheet, including key-field and metric-column detection"""
+        columns = [column.to_dict() for column in self.columns]
+        return {
+            'sheet': self.sheet_name,
+            'rows': self.rows,
+            'columns': columns,
+            'key_fields': [c['name'] for c in columns if c['key_field']],
+            'metric_columns': [c['name'] for c in columns if c['metric_column']],
+            'drg_columns': [c['name'] for c in columns if c['drg_column']],
+        }
+
+    def head_frame(self):
+        """The first rows as a small DataFrame for display"""
+        width = len(self.columns)
+        return pd.DataFrame([row + (None,) * (width - len(row)) for row in self.head], columns=self.column_names)
+
+def _csv_rows(file_path):
+    """Rows of a CSV file with numbers parsed, as openpyxl's values_only rows would be"""
+    def parse(value):
+        if value == "":
+            return None
+        for convert in (int, float):
+            try:
+                return convert(value)
+            except ValueError:
+                pass
+        return value
+
+    with open(file_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        yield tuple(name or None for name in header)
+        for row in reader:
+            yield tuple(parse(value) for value in row)
+
+def list_sheets(file_path):
+    """Sheet names of a workbook; a CSV file is a single sheet named after the file"""
+    if file_path.lower().endswith(CSV_EXTENSIONS):
+        return [os.path.splitext(os.path.basename(file_path))[0]]
+    workbook = load_workbook(file_path, read_only=True)
+    try:
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+
+def profile_sheet(file_path, sheet_name):
+    """Profile one sheet of a workbook (or a whole CSV file) in a single pass"""
+    if file_path.lower().endswith(CSV_EXTENSIONS):
+        return SheetProfile.from_rows(sheet_name, _csv_rows(file_path))
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        return SheetProfile.from_rows(sheet_name, workbook[sheet_name].iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+def _profile_task(task):
+    """Process-pool entry point: profile one (file, sheet) pair, reporting errors instead of raising"""
+    file_path, sheet_name = task
+    start = timer.perf_counter()
+    try:
+        profile = profile_sheet(file_path, sheet_name)
+        error = None
+    except Exception as e:
+        profile, error = None, f"{type(e).__name__}: {e}"
+    return {'file': file_path, 'sheet': sheet_name, 'profile': profile, 'error': error,
+            'seconds': timer.perf_counter() - start}
+
+def expand_paths(patterns):
+    """Files matching each path or glob pattern, in order and without duplicates"""
+    files = []
+    for pattern in patterns:
+        matches = [pattern] if os.path.isfile(pattern) else sorted(glob.glob(pattern, recursive=True))
+        files += [m for m in matches if os.path.isfile(m) and m.lower().endswith(EXCEL_EXTENSIONS + CSV_EXTENSIONS)]
+    return list(dict.fromkeys(files))
+
+def schema_of(profile):
+    """The schema part of a sheet profile: column order, dtypes, nullability and empty columns"""
+    return {
+        'columns': [{'name': c['name'], 'dtype': c['dtype'], 'nullable': c['nulls'] > 0, 'empty': c['count'] == 0}
+                    for c in profile['columns']],
+        'key_fields': profile.get('key_fields', []),
+        'metric_columns': profile.get('metric_columns', []),
+    }
+
+def load_baseline(path):
+    """Baseline schema from a schema file or from any earlier sheet profile"""
+    with open(path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if 'columns' not in baseline:
+        raise ValueError(f"'{path}' is neither a schema nor a sheet profile")
+    if baseline['columns'] and 'nulls' in baseline['columns'][0]:
+        baseline = schema_of(baseline)
+    return baseline
+
+def diff_schema(profile, baseline):
+    """Differences between a sheet profile and a baseline schema, as human-readable issues"""
+    current = {c['name']: c for c in profile['columns']}
+    expected = {c['name']: c for c in baseline['columns']}
+    issues = []
+    for name in expected:
+        if name not in current:
+            issues.append(f"missing column '{name}'")
+    for name in current:
+        if name not in expected:
+            issues.append(f"unexpected column '{name}'")
+    for name, column in expected.items():
+        actual = current.get(name)
+        if actual is None:
+            continue
+        if actual['dtype'] != column['dtype']:
+            issues.append(f"'{name}' dtype changed: {column['dtype']} -> {actual['dtype']}")
+        if not column.get('nullable', True) and actual['nulls']:
+            issues.append(f"'{name}' has {actual['nulls']} null(s) but was never null")
+        if actual['count'] == 0 and profile['rows'] and not column.get('empty', False):
+            issues.append(f"'{name}' is entirely empty")
+    shared_current = [name for name in current if name in expected]
+    shared_expected = [name for name in expected if name in current]
+    if shared_current != shared_expected:
+        issues.append("column order changed")
+    return issues
+
+def profile_stem(file_path, sheet_name):
+    """<file>-<hash>--<sheet>: the hash of the resolved path keeps same-named extracts from
+    different directories (and sheets whose names slugify alike) from overwriting each other"""
+    digest = hashlib.blake2b(f"{os.path.realpath(file_path)}\0{sheet_name}".encode(), digest_size=4).hexdigest()
+    return f"{slugify(os.path.splitext(os.path.basename(file_path))[0])}-{digest}--{slugify(sheet_name)}"
+
+def write_profile(profile, output_dir, formats):
+    """Write one sheet profile as <file>-<hash>--<sheet>.json and/or .parquet; returns the paths written"""
+    stem = profile_stem(profile['file'], profile['sheet'])
+    paths = []
+    if "json" in formats:
+        path = os.path.join(output_dir, f"{stem}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(profile, f, indent=2, default=str)
+        paths.append(path)
+    if "parquet" in formats:
+        # One row per column; nested fields are stored as JSON text
+        table = pd.DataFrame(profile['columns'])
+        table.insert(0, 'file', profile['file'])
+        table.insert(1, 'sheet', profile['sheet'])
+        table.insert(2, 'rows', profile['rows'])
+        for field in ('types', 'sample_values'):
+            table[field] = table[field].map(lambda value: json.dumps(value, default=str))
+        table['schema_issues'] = json.dumps(profile.get('schema_issues', []))
+        path = os.path.join(output_dir, f"{stem}.parquet")
+        table.to_parquet(path, index=False)
+        paths.append(path)
+    return paths
+
+def _format_values(values):
+    return [value.item() if isinstance(value, np.generic) else value for value in values]
+
+def print_sheet_profile(profile):
+    """Print the human-readable report for one sheet"""
+    n_columns = len(profile.columns)
+    print(f"Shape: {(profile.rows, n_columns)} (rows x columns)")
+    print(f"Total cells: {profile.rows * n_columns:,}")
+
+    # Column information
+    print(f"\nColumn Names ({n_columns} total):")
+    for j, column in enumerate(profile.columns, 1):
+        print(f"  {j:2d}. {column.name}")
+
+    # Data types
+    print(f"\nData Types:")
+    for column in profile.columns:
+        print(f"  {column.name:<40} | {column.dtype:<12} | Non-null: {column.count:>6} | Null: {column.nulls:>6}")
+
+    # First few rows
+    print(f"\nFirst 5 rows:")
+    print(profile.head_frame().to_string())
+
+    # Basic statistics for numeric columns
+    numeric_columns = [column for column in profile.columns if column.is_numeric]
+    if numeric_columns:
+        print(f"\nNumeric Column Statistics:")
+        stats = pd.DataFrame({column.name: column.describe() for column in numeric_columns})
+        print(stats.round(2).to_string())
+
+    # Unique values for potential key fields (showing first 20 unique values)
+    key_fields = [column for column in profile.columns if is_key_field(column.name)]
+    if key_fields:
+        print(f"\nPotential Key Fields for Hospital/IDN Selection:")
+        for column in key_fields:
+            n_unique = column.distinct_count
+            approx = "" if column.distinct_exact else "~"
+            print(f"  {column.name}:")
+            print(f"    Unique values: {approx}{n_unique}")
+            if column.distinct_exact and n_unique <= 20:
+                print(f"    Values: {_format_values(column.sample_values(20))}")
+            else:
+                print(f"    Sample values: {_format_values(column.sample_values(10))}... "
+                      f"(showing first 10 of {approx}{n_unique})")
+
+    # Check for DRG-related columns
+    drg_columns = [column for column in profile.columns if is_drg_column(column.name)]
+    if drg_columns:
+        print(f"\nDRG-related columns:")
+        for column in drg_columns:
+            print(f"  {column.name}: {column.distinct_count} unique values")
+            if column.distinct_exact and column.distinct_count <= 10:
+                print(f"    Values: {sorted(column.sample_values(10), key=str)}")
+
+    # Check for outcome/metric columns
+    metric_columns = [column for column in profile.columns if is_metric_column(column.name)]
+    if metric_columns:
+        print(f"\nPotential Outcome/Metric Columns:")
+        for column in metric_columns:
+            if column.is_numeric:
+                stats = column.describe()
+                print(f"  {column.name}:")
+                print(f"    Range: {stats['min']:.3f} to {stats['max']:.3f}")
+                print(f"    Mean: {stats['mean']:.3f}, Median: {stats['50%']:.3f}")
+            else:
+                print(f"  {column.name}: {column.distinct_count} unique values")
+                if column.numeric_count:
+                    # e.g. CMI: numbers mixed with "Data unavailable" text
+                    print(f"    Numeric values: {column.numeric_count} of {column.count} (needs coercion)")
 
 def analyze_excel_file(file_path):
     """Analyze Excel file structure and content"""
-    
+
     print(f"Analyzing Excel file: {file_path}")
     print("=" * 60)
-    
+
     try:
         # Check if file exists
         if not os.path.exists(file_path):
             print(f"ERROR: File not found: {file_path}")
             return
-        
-        # Read Excel file to check for multiple sheets
-        excel_file = pd.ExcelFile(file_path)
-        sheet_names = excel_file.sheet_names
-        
-        print(f"Number of sheets: {len(sheet_names)}")
-        print(f"Sheet names: {sheet_names}")
-        print("-" * 60)
-        
-        # Analyze each sheet
-        for i, sheet_name in enumerate(sheet_names):
-            print(f"\n{'='*20} SHEET {i+1}: '{sheet_name}' {'='*20}")
-            
-            try:
-                # Read the sheet
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
-                
-                print(f"Shape: {df.shape} (rows x columns)")
-                print(f"Total cells: {df.shape[0] * df.shape[1]:,}")
-                
-                # Column information
-                print(f"\nColumn Names ({len(df.columns)} total):")
-                for j, col in enumerate(df.columns, 1):
-                    print(f"  {j:2d}. {col}")
-                
-                # Data types
-                print(f"\nData Types:")
-                for col, dtype in df.dtypes.items():
-                    non_null_count = df[col].notna().sum()
-                    null_count = df[col].isna().sum()
-                    print(f"  {col:<40} | {str(dtype):<12} | Non-null: {non_null_count:>6} | Null: {null_count:>6}")
-                
-                # First few rows
-                print(f"\nFirst 5 rows:")
-                print(df.head().to_string())
-                
-                # Basic statistics for numeric columns
-                numeric_cols = df.select_dtypes(include=[np.number]).columns
-                if len(numeric_cols) > 0:
-                    print(f"\nNumeric Column Statistics:")
-                    print(df[numeric_cols].describe().round(2).to_string())
-                
-                # Unique values for potential key fields (showing first 20 unique values)
-                potential_key_fields = []
-                for col in df.columns:
-                    col_lower = col.lower()
-                    if any(keyword in col_lower for keyword in ['hospital', 'idn', 'provider', 'facility', 'name', 'id', 'code']):
-                        potential_key_fields.append(col)
-                
-                if potential_key_fields:
-                    print(f"\nPotential Key Fields for Hospital/IDN Selection:")
-                    for col in potential_key_fields:
-                        unique_vals = df[col].dropna().unique()
-                        print(f"  {col}:")
-                        print(f"    Unique values: {len(unique_vals)}")
-                        if len(unique_vals) <= 20:
-                            print(f"    Values: {list(unique_vals)}")
-                        else:
-                            print(f"    Sample values: {list(unique_vals[:10])}... (showing first 10 of {len(unique_vals)})")
-                
-                # Check for DRG-related columns
-                drg_cols = [col for col in df.columns if 'drg' in col.lower()]
-                if drg_cols:
-                    print(f"\nDRG-related columns:")
-                    for col in drg_cols:
-                        unique_vals = df[col].dropna().unique()
-                        print(f"  {col}: {len(unique_vals)} unique values")
-                        if len(unique_vals) <= 10:
-                            print(f"    Values: {sorted(unique_vals)}")
-                
-                # Check for outcome/metric columns
-                metric_keywords = ['cmi', 'los', 'length', 'stay', 'readmission', 'rate', 'ratio', 'index', 'score']
-                metric_cols = []
-                for col in df.columns:
-                    col_lower = col.lower()
-                    if any(keyword in col_lower for keyword in metric_keywords):
-                        metric_cols.append(col)
-                
-                if metric_cols:
-                    print(f"\nPotential Outcome/Metric Columns:")
-                    for col in metric_cols:
-                        if df[col].dtype in ['int64', 'float64']:
-                            stats = df[col].describe()
-                            print(f"  {col}:")
-                            print(f"    Range: {stats['min']:.3f} to {stats['max']:.3f}")
-                            print(f"    Mean: {stats['mean']:.3f}, Median: {stats['50%']:.3f}")
-                        else:
-                            unique_vals = df[col].dropna().unique()
-                            print(f"  {col}: {len(unique_vals)} unique values")
-                
-            except Exception as e:
-                print(f"Error reading sheet '{sheet_name}': {str(e)}")
-                continue
-        
+
+        # One read-only pass per sheet; rows are streamed, never loaded as a whole
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            sheet_names = workbook.sheetnames
+
+            print(f"Number of sheets: {len(sheet_names)}")
+            print(f"Sheet names: {sheet_names}")
+            print("-" * 60)
+
+            # Analyze each sheet
+            for i, sheet_name in enumerate(sheet_names):
+                print(f"\n{'='*20} SHEET {i+1}: '{sheet_name}' {'='*20}")
+
+                try:
+                    rows = workbook[sheet_name].iter_rows(values_only=True)
+                    print_sheet_profile(SheetProfile.from_rows(sheet_name, rows))
+                except Exception as e:
+                    print(f"Error reading sheet '{sheet_name}': {str(e)}")
+                    continue
+        finally:
+            workbook.close()
+
         print(f"\n{'='*60}")
         print("ANALYSIS SUMMARY FOR APPLICATION DESIGN:")
         print("="*60)
@@ -124,11 +552,97 @@ def analyze_excel_file(file_path):
         print("4. Metrics: CMI (Case Mix Index), LOS (Length of Stay), Readmission rates")
         print("5. Data Types: Mix of categorical and numeric data requiring different handling")
         print("6. Missing Data: Check null counts for data quality considerations")
-        
+
     except Exception as e:
         print(f"ERROR: Failed to analyze file: {str(e)}")
         return
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="analyze_excel",
+        description="Profile the sheets of Excel/CSV data extracts and check them against a baseline schema."
+    )
+    parser.add_argument("paths", nargs="+", metavar="PATH",
+                        help="Workbooks, CSV files or glob patterns (quote globs, e.g. 'extracts/**/*.xlsx')")
+    parser.add_argument("--output", default="profiles", help="Directory for the profiles (default: %(default)s)")
+    parser.add_argument("--formats", nargs="+", choices=OUTPUT_FORMATS, default=["json"],
+                        help="Profile formats to write (default: json)")
+    parser.add_argument("--baseline", metavar="SCHEMA",
+                        help="Schema (or earlier sheet profile) JSON to diff every sheet against")
+    parser.add_argument("--write-schema", metavar="PATH",
+                        help="Write the schema of the first profiled sheet, for use as a future --baseline")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: CPU count)")
+    parser.add_argument("--report", action="store_true",
+                        help="Also print the full human-readable report for each sheet")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    wall_start = timer.perf_counter()
+
+    files = expand_paths(args.paths)
+    if not files:
+        print("ERROR: No Excel or CSV files matched", file=sys.stderr)
+        return 1
+    baseline = load_baseline(args.baseline) if args.baseline else None
+
+    tasks = []
+    failures = []
+    for file_path in files:
+        try:
+            tasks += [(file_path, sheet_name) for sheet_name in list_sheets(file_path)]
+        except Exception as e:
+            failures.append(f"{file_path}: {type(e).__name__}: {e}")
+
+    workers = max(1, min(args.workers, len(tasks)))
+    print(f"Profiling {len(tasks)} sheet(s) from {len(files)} file(s) with {workers} worker(s) into '{args.output}'")
+    if workers == 1:
+        results = [_profile_task(task) for task in tasks]
+    else:
+        # One task per sheet, so large sheets of one workbook are profiled in parallel too
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_profile_task, tasks))
+
+    os.makedirs(args.output, exist_ok=True)
+    schema_written = False
+    profiled = 0
+    sheets_with_issues = 0
+    for result in results:
+        label = f"{result['file']} [{result['sheet']}]"
+        if result['error']:
+            failures.append(f"{label}: {result['error']}")
+            continue
+        sheet = result['profile']
+        profile = {'file': result['file'], **sheet.to_dict()}
+        if baseline is not None:
+            profile['schema_issues'] = diff_schema(profile, baseline)
+        write_profile(profile, args.output, args.formats)
+        profiled += 1
+        if args.write_schema and not schema_written:
+            with open(args.write_schema, "w", encoding="utf-8") as f:
+                json.dump(schema_of(profile), f, indent=2)
+            schema_written = True
+
+        issues = profile.get('schema_issues', [])
+        status = "" if baseline is None else ("  schema OK" if not issues else f"  {len(issues)} schema issue(s)")
+        print(f"{label}: {sheet.rows:,} rows x {len(sheet.columns)} columns in {result['seconds']:.2f}s{status}")
+        for issue in issues:
+            print(f"    - {issue}")
+        sheets_with_issues += bool(issues)
+        if args.report:
+            print_sheet_profile(sheet)
+            print()
+
+    for failure in failures:
+        print(f"ERROR: {failure}", file=sys.stderr)
+    print(f"Profiled {profiled} sheet(s) in {timer.perf_counter() - wall_start:.2f}s")
+    if baseline is not None:
+        print(f"{sheets_with_issues} sheet(s) differ from the baseline schema")
+    return 1 if failures or sheets_with_issues else 0
+
 if __name__ == "__main__":
-    file_path = "/Users/jcromwell/hospital-normalized-outcomes/Readmission CMI-LOS-DRG 329-334 2022.xlsx"
-    analyze_excel_file(file_path)
\ No newline at end of file
+    sys.exit(main())
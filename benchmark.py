@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Hospital Outcomes Analyzer - Benchmarks
+Runs the web app's real load, filter, ranking, chart, scatter and export
+functions headlessly on synthetic datasets of increasing size and records latency
+percentiles, throughput and peak traced memory per stage as JSON
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from streamlit import config as streamlit_config
+from streamlit import logger as streamlit_logger
+
+import hospital_analyzer_web as web
+from comparator_index import ComparatorIndex, SelectorCatalog
+from exports import EXPORT_FORMATS, export_bytes
+from funnel import FunnelLimits
+from percentiles import PercentileEngine, league_table
+from prepared_data import cache_path_for, clean_hospital_data, source_fingerprint, write_prepared_cache
+from risk_adjustment import RiskModel
+from synthetic_data import generate_hospital_data
+
+DEFAULT_SIZES = [3_000, 30_000, 300_000, 3_000_000]
+DEFAULT_REPEAT = 5
+# Stop repeating a stage once it has used this many seconds (it always runs at least once)
+DEFAULT_STAGE_BUDGET = 30.0
+# openpyxl serializes cell by cell; larger Excel exports and cold workbook loads are skipped unless asked for
+DEFAULT_EXCEL_MAX_ROWS = 30_000
+EXCEL_ROW_LIMIT = 1_048_575
+COMPARATORS = ["All Hospitals", "Same IDN", "Same State"]
+
+# Outside `streamlit run`, st.* calls only log bare-mode warnings; keep the output clean
+streamlit_config.get_config_options()
+streamlit_config.set_option("global.showWarningOnDirectExecution", False)
+streamlit_logger.set_log_level("error")
+
+def write_benchmark_source(df, directory, n_rows):
+    """Write a placeholder source with a current prepared cache, so load_data takes the warm path"""
+    source_path = os.path.join(directory, f"hospitals_{n_rows}.xlsx")
+    with open(source_path, "wb") as f:
+        f.write(f"benchmark source, {n_rows} rows\n".encode())
+    write_prepared_cache(df, cache_path_for(source_path), source_fingerprint(source_path))
+    return source_path
+
+def write_benchmark_workbook(raw, directory, n_rows):
+    """Write the raw synthetic data as a real workbook, for load_data's cold (parsing) path"""
+    workbook_path = os.path.join(directory, f"workbook_{n_rows}.xlsx")
+    raw.to_excel(workbook_path, index=False)
+    return workbook_path
+
+def drop_prepared_cache(source_path):
+    """Unload a data file and delete its prepared cache, so the next load parses the workbook"""
+    web.load_partition_store().clear()
+    cache_path = cache_path_for(source_path)
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+
+def summarize(stage, n_rows, rows, latencies, peak_bytes):
+    """Latency percentiles, throughput and peak memory of one stage"""
+    latencies = np.asarray(latencies) * 1000
+    p50 = float(np.percentile(latencies, 50))
+    return {
+        'size': n_rows,
+        'stage': stage,
+        'rows': rows,
+        'calls': len(latencies),
+        'mean_ms': float(latencies.mean()),
+        'p50_ms': p50,
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'max_ms': float(latencies.max()),
+        'throughput_rows_per_s': rows / (p50 / 1000) if rows and p50 > 0 else None,
+        'peak_bytes': peak_bytes,
+    }
+
+def measure(stage, n_rows, rows, calls, repeat, budget=DEFAULT_STAGE_BUDGET):
+    """Time each call (untraced), then trace one extra pass of every call for peak memory
+
+    calls is a list of (setup, func) pairs; setup() runs untimed and its result is passed to func.
+    Repetitions stop early once the stage has used budget seconds.
+    """
+    latencies = []
+    for _ in range(repeat):
+        for setup, func in calls:
+            arg = setup() if setup else None
+            start = time.perf_counter()
+            func(arg)
+            latencies.append(time.perf_counter() - start)
+        if sum(latencies) > budget:
+            break
+
+    peak = 0
+    tracemalloc.start()
+    try:
+        for setup, func in calls:
+            arg = setup() if setup else None
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            func(arg)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    result = summarize(stage, n_rows, rows, latencies, peak)
+    print(f"{n_rows:>10,} {stage:<26} p50 {result['p50_ms']:>10.2f} ms  p95 {result['p95_ms']:>10.2f} ms  "
+          f"peak {peak / 1024 ** 2:>9.1f} MB", flush=True)
+    return result
+
+def sample_selections(df, selector_catalog, count, rng):
+    """Random hospitals with claims data, as (index_data, comparator) pairs"""
+    candidates = np.flatnonzero(df['Medicare Total Claims'].notna().to_numpy())
+    picks = rng.choice(candidates, size=min(count, len(candidates)), replace=False)
+    selections = []
+    for i, position in enumerate(picks):
+        provider_id = df['Provider'].iloc[position]
+        index_data = df.take(selector_catalog.provider_positions(provider_id))
+        selections.append((index_data, COMPARATORS[i % len(COMPARATORS)]))
+    return selections
+
+def resolve_selection(df, comparator_index, risk_model, index_data, comparator_type):
+    """Comparator group and comparator rows (with O/E columns) of one selection, as the page builds them"""
+    selected_hospital = str(index_data['Provider'].iloc[0])
+    group = web.resolve_comparator_group(index_data, comparator_type, selected_hospital, None, comparator_index)
+    data = web.filter_comparator_data(df, index_data, comparator_type, selected_hospital, None, comparator_index)
+    return group, web.add_risk_adjusted_metrics(data, group, risk_model)
+
+def resolve_selections(df, comparator_index, risk_model, selections):
+    """(index_data, group, comparator_data) of every selection"""
+    resolved = []
+    for index_data, comparator_type in selections:
+        group, data = resolve_selection(df, comparator_index, risk_model, index_data, comparator_type)
+        resolved.append((web.add_risk_adjusted_metrics(index_data, group, risk_model), group, data))
+    return resolved
+
+def rank_selection(engine, index_data, group, data):
+    """Index percentiles and comparator statistics of one selection"""
+    web.compute_index_percentiles(index_data, data, engine, group)
+    web.compute_comparator_stats(data, engine, group)
+
+def measure_ranking(df, comparator_index, resolved, n_rows, repeat, budget=DEFAULT_STAGE_BUDGET):
+    """rank_cold and rank_warm results
+
+    Cold: a fresh engine sorts each group's metrics; warm: an engine that has already
+    ranked every selection once, so only the memoized distributions are timed.
+    """
+    def new_engine():
+        return PercentileEngine(df, comparator_index, RiskModel(df, comparator_index))
+    cold = measure("rank_cold", n_rows, None,
+                   [(new_engine, lambda engine, r=r: rank_selection(engine, *r)) for r in resolved], repeat, budget)
+    engine = new_engine()
+    for r in resolved:
+        rank_selection(engine, *r)
+    warm = measure("rank_warm", n_rows, None,
+                   [(None, lambda _, r=r: rank_selection(engine, *r)) for r in resolved], repeat, budget)
+    return [cold, warm]
+
+def run_size(n_rows, args, workdir):
+    """Benchmark every stage at one dataset size"""
+    rng = np.random.default_rng(args.seed)
+    results = []
+
+    def run(stage, rows, calls):
+        results.append(measure(stage, n_rows, rows, calls, args.repeat, args.stage_budget))
+
+    raw = generate_hospital_data(n_rows, seed=args.seed)
+    if n_rows <= min(args.excel_max_rows, EXCEL_ROW_LIMIT):
+        workbook_path = write_benchmark_workbook(raw, workdir, n_rows)
+        run("load_data_cold", n_rows,
+            [(lambda: drop_prepared_cache(workbook_path), lambda _: web.load_data(workbook_path))])
+        drop_prepared_cache(workbook_path)
+    prepared = clean_hospital_data(raw)
+    source_path = write_benchmark_source(prepared, workdir, n_rows)
+    del raw, prepared
+
+    def load(_):
+        web.load_partition_store().clear()
+        return web.load_data(source_path)
+    run("load_data", n_rows, [(None, load)])
+    df = web.load_data(source_path)
+
+    run("build_indexes", n_rows, [(None, lambda _: (ComparatorIndex(df), SelectorCatalog(df)))])
+    comparator_index = ComparatorIndex(df)
+    selector_catalog = SelectorCatalog(df)
+    risk_model = RiskModel(df, comparator_index)
+    selections = sample_selections(df, selector_catalog, args.selections, rng)
+
+    run("filter_comparator_data", None,
+        [(None, lambda _, s=s: resolve_selection(df, comparator_index, risk_model, *s)) for s in selections])
+    resolved = resolve_selections(df, comparator_index, risk_model, selections)
+
+    results.extend(measure_ranking(df, comparator_index, resolved, n_rows, args.repeat, args.stage_budget))
+
+    def new_engine():
+        return PercentileEngine(df, comparator_index, RiskModel(df, comparator_index))
+    run("league_table", n_rows, [(None, lambda _: league_table(df))])
+
+    def metric_chart(chart_engine, index_data, group, data):
+        return web.create_metric_chart(data, 'Readmission Rate', "", chart_engine, group)
+
+    def comparison_chart(chart_engine, index_data, group, data):
+        return web.create_comparison_chart(index_data, data, 'Readmission Rate', chart_engine, group)
+
+    # Chart builders start from a fresh engine, as after a selection change
+    run("create_metric_chart", None, [(new_engine, lambda e, r=r: metric_chart(e, *r)) for r in resolved])
+    run("create_comparison_chart", None, [(new_engine, lambda e, r=r: comparison_chart(e, *r)) for r in resolved])
+
+    rates, claims = df['Readmission Rate'].to_numpy(), df['Medicare Total Claims'].to_numpy()
+
+    def funnel_limits(group):
+        positions = None if group is None else comparator_index.positions(*group)
+        return FunnelLimits(rates, claims, positions)
+
+    def funnel_chart(index_data, group, data):
+        funnel = funnel_limits(group)
+        return web.create_funnel_chart(funnel, web.funnel_hospitals(df, funnel), index_data)
+
+    run("funnel_limits", None, [(None, lambda _, g=group: funnel_limits(g)) for _, group, _ in resolved])
+    run("create_funnel_chart", None, [(None, lambda _, r=r: funnel_chart(*r)) for r in resolved])
+
+    scatter_data = df[['Provider', 'Hospital', 'Normalized ALOS', 'Normalized Readmission Rate']]
+    scatter_data = scatter_data.dropna(subset=['Normalized ALOS', 'Normalized Readmission Rate'])
+    index_data = resolved[0][0]
+    run("create_scatter_chart", len(scatter_data),
+        [(None, lambda _: web.create_scatter_chart(scatter_data, index_data))])
+
+    for export_format in EXPORT_FORMATS:
+        if export_format == "Excel" and n_rows > min(args.excel_max_rows, EXCEL_ROW_LIMIT):
+            continue
+        run(f"export:{export_format}", n_rows, [(None, lambda _, f=export_format: export_bytes(df, f))])
+
+    web.load_partition_store().clear()
+    return results
+
+def compare_results(results, baseline, tolerance):
+    """Stages whose p50 latency grew by more than tolerance versus a baseline run"""
+    previous = {(r['size'], r['stage']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get((result['size'], result['stage']))
+        if before and before['p50_ms'] > 0 and result['p50_ms'] > before['p50_ms'] * tolerance:
+            regressions.append((result, before))
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="benchmark",
+        description="Benchmark load, filter, ranking, chart and export stages at increasing dataset sizes."
+    )
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, metavar="ROWS",
+                        help="Dataset sizes in rows (default: 3k, 30k, 300k and 3M)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="Timed repetitions of each stage (default: %(default)s)")
+    parser.add_argument("--stage-budget", type=float, default=DEFAULT_STAGE_BUDGET,
+                        help="Seconds after which a stage stops repeating (default: %(default)s)")
+    parser.add_argument("--selections", type=int, default=6,
+                        help="Hospitals sampled for the per-selection stages (default: %(default)s)")
+    parser.add_argument("--excel-max-rows", type=int, default=DEFAULT_EXCEL_MAX_ROWS,
+                        help="Largest size to benchmark the Excel export and cold workbook load at (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: %(default)s)")
+    parser.add_argument("--output", default="benchmark_results.json", help="Results file (default: %(default)s)")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="Earlier results file; exit 1 if any stage's p50 regressed beyond --tolerance")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="Allowed p50 slowdown ratio versus the baseline (default: %(default)s)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="hospital-benchmark-") as workdir:
+        for n_rows in args.sizes:
+            results += run_size(n_rows, args, workdir)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'cpu_count': os.cpu_count(),
+            'source': "synthetic_data",
+            'repeat': args.repeat,
+            'selections': args.selections,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(results)} stage results to '{args.output}'")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance)
+        for result, before in regressions:
+            print(f"REGRESSION {result['size']:>10,} {result['stage']:<26} "
+                  f"p50 {before['p50_ms']:.2f} -> {result['p50_ms']:.2f} ms", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No p50 regressions beyond {args.tolerance:.2f}x versus '{args.compare}'")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Encounter-Level Claims Ingestion
+Streams discharge-level claims files (CSV, Parquet or Arrow IPC) in fixed-size
+chunks, accumulates per-provider discharge counts, length-of-stay sums, 30-day
+readmission flags and DRG weights, and finalizes them onto a hospital roster as
+the same one-row-per-hospital frame load_data() produces. Memory is bounded by
+the number of hospitals, not the number of encounters.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from exports import EXPORT_FORMATS
+from prepared_data import cache_path_for, clean_hospital_data, source_fingerprint, write_prepared_cache
+
+# Encounter file column for each role; override with --column ROLE=NAME
+ENCOUNTER_COLUMNS = {
+    'provider': 'Provider',
+    'drg': 'DRG',
+    'los': 'Length of Stay',
+    'readmitted': 'Readmitted Within 30 Days',
+    'drg_weight': 'DRG Weight',
+}
+# The DRG family the bundled workbook covers
+DEFAULT_DRGS = list(range(329, 335))
+DEFAULT_CHUNK_ROWS = 1_000_000
+# CMS suppresses metrics of hospitals with fewer than 11 claims
+DEFAULT_MIN_CLAIMS = 11
+
+METRIC_COLUMNS = ['CMI', 'ALOS', 'Readmission Rate', 'Medicare Total Claims']
+ACCUMULATOR_COLUMNS = ['discharges', 'los_sum', 'los_n', 'readmit_sum', 'readmit_n', 'weight_sum', 'weight_n']
+FLAG_VALUES = {'Y': 1.0, 'YES': 1.0, 'TRUE': 1.0, 'T': 1.0, '1': 1.0,
+               'N': 0.0, 'NO': 0.0, 'FALSE': 0.0, 'F': 0.0, '0': 0.0}
+
+def iter_encounter_chunks(path, columns, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield DataFrames of at most chunk_rows encounters, reading only the given columns"""
+    name = path.lower()
+    extension = os.path.splitext(name[:-3] if name.endswith('.gz') else name)[1]
+    if extension == '.parquet':
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    elif extension in ('.arrow', '.feather'):
+        with pa.memory_map(path, 'r') as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i).select(columns)
+                for offset in range(0, batch.num_rows, chunk_rows):
+                    yield batch.slice(offset, chunk_rows).to_pandas()
+    elif extension == '.csv':
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_rows, low_memory=False)
+    else:
+        raise ValueError(f"Unsupported encounter file type: '{path}'")
+
+def to_flag(values):
+    """30-day readmission flags (1/0, Y/N, True/False) as floats; anything else is missing"""
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+    return values.astype(str).str.strip().str.upper().map(FLAG_VALUES)
+
+class EncounterAccumulator:
+    """Per-provider running sums of encounter chunks
+
+    Each chunk is reduced with a groupby and folded into one row per provider,
+    so memory grows with the number of hospitals only. Every metric keeps its
+    own count, so encounters missing a field do not bias the other metrics.
+    """
+
+    def __init__(self, columns=None, drgs=DEFAULT_DRGS, provider_dtype=None):
+        self.columns = {**ENCOUNTER_COLUMNS, **(columns or {})}
+        self.drgs = None if drgs is None else set(drgs)
+        self.provider_dtype = provider_dtype
+        self.totals = pd.DataFrame(columns=ACCUMULATOR_COLUMNS, dtype=float)
+        self.encounters = 0
+        self.included = 0
+
+    @property
+    def source_columns(self):
+        """Encounter file columns the accumulator reads"""
+        roles = ['provider', 'los', 'readmitted', 'drg_weight'] + (['drg'] if self.drgs is not None else [])
+        return list(dict.fromkeys(self.columns[role] for role in roles))
+
+    def _providers(self, values):
+        """Provider keys in the roster's representation (e.g. "020026" -> 20026 for a numeric roster)"""
+        if self.provider_dtype is not None and pd.api.types.is_numeric_dtype(self.provider_dtype):
+            return pd.to_numeric(values, errors='coerce')
+        return values.astype(str).str.strip().where(values.notna())
+
+    def add(self, chunk):
+        """Fold one chunk of encounters into the running totals"""
+        self.encounters += len(chunk)
+        if self.drgs is not None:
+            drg = pd.to_numeric(chunk[self.columns['drg']], errors='coerce')
+            chunk = chunk[drg.isin(self.drgs).to_numpy()]
+
+        frame = pd.DataFrame({
+            'provider': self._providers(chunk[self.columns['provider']]),
+            'los': pd.to_numeric(chunk[self.columns['los']], errors='coerce'),
+            'readmit': to_flag(chunk[self.columns['readmitted']]),
+            'weight': pd.to_numeric(chunk[self.columns['drg_weight']], errors='coerce'),
+        }).dropna(subset=['provider'])
+        self.included += len(frame)
+        if frame.empty:
+            return
+
+        grouped = frame.groupby('provider', sort=False)
+        sums = grouped[['los', 'readmit', 'weight']].sum()
+        counts = grouped[['los', 'readmit', 'weight']].count()
+        partial = pd.DataFrame({
+            'discharges': grouped.size(),
+            'los_sum': sums['los'],
+            'los_n': counts['los'],
+            'readmit_sum': sums['readmit'],
+            'readmit_n': counts['readmit'],
+            'weight_sum': sums['weight'],
+            'weight_n': counts['weight'],
+        }).astype(float)
+        self.totals = partial if self.totals.empty else self.totals.add(partial, fill_value=0)
+
+    def add_file(self, path, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """Stream one encounter file through the accumulator"""
+        for chunk in iter_encounter_chunks(path, self.source_columns, chunk_rows):
+            self.add(chunk)
+
+    def metrics(self, min_claims=DEFAULT_MIN_CLAIMS):
+        """Per-provider CMI, ALOS, Readmission Rate and Medicare Total Claims"""
+        totals = self.totals
+        with np.errstate(divide='ignore', invalid='ignore'):
+            metrics = pd.DataFrame({
+                'CMI': totals['weight_sum'] / totals['weight_n'],
+                'ALOS': totals['los_sum'] / totals['los_n'],
+                'Readmission Rate': totals['readmit_sum'] / totals['readmit_n'],
+                'Medicare Total Claims': totals['discharges'],
+            }, index=totals.index)
+        # Small-cell suppression, as in the published files
+        metrics.loc[metrics['Medicare Total Claims'] < min_claims, METRIC_COLUMNS] = np.nan
+        return metrics.replace([np.inf, -np.inf], np.nan)
+
+    def finalize(self, roster, min_claims=DEFAULT_MIN_CLAIMS):
+        """Roster with the aggregated metrics in place of its own, in the raw workbook layout
+
+        Roster hospitals without encounters get missing metrics; encounters of
+        providers missing from the roster are left out (see unmatched_providers).
+        """
+        metrics = self.metrics(min_claims)
+        raw = roster.copy()
+        providers = self._providers(raw['Provider'])
+        for column in METRIC_COLUMNS:
+            raw[column] = providers.map(metrics[column])
+        return raw
+
+    def unmatched_providers(self, roster):
+        """Providers with encounters that are not on the roster"""
+        return self.totals.index.difference(pd.Index(self._providers(roster['Provider']).dropna()))
+
+def read_roster(path):
+    """Hospital attributes (one row per hospital) from a workbook, CSV or Parquet file"""
+    extension = os.path.splitext(path.lower())[1]
+    if extension == '.csv':
+        return pd.read_csv(path)
+    if extension == '.parquet':
+        return pd.read_parquet(path)
+    return pd.read_excel(path)
+
+def write_hospital_workbook(raw, df, path):
+    """Write the hospital-level workbook and prime its prepared cache with the cleaned frame"""
+    # Untitled roster columns keep their blank header, as in the source workbooks
+    raw = raw.rename(columns={c: '' for c in raw.columns if str(c).startswith('Unnamed: ')})
+    with open(path, "wb") as f:
+        EXPORT_FORMATS["Excel"].writer(raw, f)
+    write_prepared_cache(df, cache_path_for(path), source_fingerprint(path))
+
+def parse_column_overrides(parser, overrides):
+    columns = {}
+    for override in overrides or []:
+        role, sep, name = override.partition("=")
+        if not sep or role not in ENCOUNTER_COLUMNS or not name:
+            parser.error(f"--column expects ROLE=NAME with ROLE one of {', '.join(ENCOUNTER_COLUMNS)}")
+        columns[role] = name
+    return columns
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="claims_ingest",
+        description="Aggregate encounter-level claims files into the hospital-level workbook the app loads."
+    )
+    parser.add_argument("encounters", nargs="+", metavar="FILE",
+                        help="Encounter files (.csv, .csv.gz, .parquet, .arrow)")
+    parser.add_argument("--roster", required=True,
+                        help="Hospital attribute workbook/CSV/Parquet with one row per Provider")
+    parser.add_argument("--output", required=True, help="Hospital-level workbook to write (.xlsx)")
+    parser.add_argument("--drgs", nargs="+", type=int, default=DEFAULT_DRGS, metavar="DRG",
+                        help="DRG codes to include (default: 329-334)")
+    parser.add_argument("--all-drgs", action="store_true", help="Include every DRG (no DRG column needed)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="Encounters read per chunk (default: %(default)s)")
+    parser.add_argument("--min-claims", type=int, default=DEFAULT_MIN_CLAIMS,
+                        help="Suppress metrics of hospitals with fewer claims (default: %(default)s)")
+    parser.add_argument("--column", action="append", metavar="ROLE=NAME",
+                        help=f"Encounter column name for a role ({', '.join(ENCOUNTER_COLUMNS)})")
+    args = parser.parse_args(argv)
+    args.columns = parse_column_overrides(parser, args.column)
+    if args.chunk_rows < 1:
+        parser.error("--chunk-rows must be at least 1")
+    if not args.output.lower().endswith(".xlsx"):
+        parser.error("--output must be an .xlsx workbook")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    roster = read_roster(args.roster)
+    drgs = None if args.all_drgs else args.drgs
+    accumulator = EncounterAccumulator(args.columns, drgs, roster['Provider'].dtype)
+
+    for path in args.encounters:
+        if not os.path.exists(path):
+            print(f"ERROR: Encounter file '{path}' not found", file=sys.stderr)
+            return 1
+        before = accumulator.encounters
+        accumulator.add_file(path, args.chunk_rows)
+        print(f"{path}: {accumulator.encounters - before:,} encounters")
+
+    raw = accumulator.finalize(roster, args.min_claims)
+    df = clean_hospital_data(raw.copy())
+    output_dir = os.path.dirname(os.path.abspath(args.output))
+    os.makedirs(output_dir, exist_ok=True)
+    write_hospital_workbook(raw, df, args.output)
+
+    unmatched = accumulator.unmatched_providers(roster)
+    with_claims = int(df['Medicare Total Claims'].notna().sum())
+    print(f"Aggregated {accumulator.included:,} of {accumulator.encounters:,} encounters into "
+          f"{len(accumulator.totals):,} providers in {time.perf_counter() - start:.1f}s")
+    print(f"Wrote {len(df):,} hospitals ({with_claims:,} with reportable claims) to '{args.output}'")
+    if len(unmatched):
+        print(f"{len(unmatched):,} provider(s) with encounters are not on the roster and were left out",
+              file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
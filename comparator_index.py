@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Comparator Group Index
+Precomputed row positions for every comparator group (IDN, state, ...) so a
+comparator slice is a take over the group's rows instead of a full-frame mask,
+the sorted claims index behind the procedure-volume peer window, KD-trees over
+standardized hospital features for "most similar hospitals" peer groups, and
+the pre-sorted hospital/IDN selector options used by the sidebar
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from result_cache import BoundedMemo
+
+# Dimension name -> function(df) returning one group key per row (NaN = no group)
+COMPARATOR_DIMENSIONS = {}
+
+def register_comparator_dimension(name):
+    """Decorator registering a key function as a comparator dimension"""
+    def decorator(key_func):
+        COMPARATOR_DIMENSIONS[name] = key_func
+        return key_func
+    return decorator
+
+@register_comparator_dimension("IDN")
+def idn_key(df):
+    """Group hospitals by Integrated Delivery Network"""
+    return df['IDN']
+
+@register_comparator_dimension("State")
+def state_key(df):
+    """Group hospitals by normalized two-letter state code"""
+    if 'State' in df.columns:
+        states = df['State']
+    elif 'City/State' in df.columns:
+        # Only the text after the last ", " is the state; never substring-match
+        states = df['City/State'].str.rsplit(', ', n=1).str[-1]
+    else:
+        return pd.Series(np.nan, index=df.index)
+    states = states.astype('string').str.strip().str.upper()
+    return states.where(states.str.len() > 0)
+
+# Similarity feature column -> transform applied before standardizing (counts are log-scaled)
+SIMILARITY_FEATURES = {
+    'Number of Staffed Beds': np.log1p,
+    'Medicare Total Claims': np.log1p,
+    'CMI': None,
+    'Payor Mix: Medicare': None,
+    'Payor Mix: Medicaid': None,
+    'Payor Mix: Private/Self-Pay/Other': None,
+}
+
+# Weight preset -> per-feature weights (unlisted features weigh 1)
+SIMILARITY_PRESETS = {
+    "Balanced": {},
+    "Size & Volume": {'Number of Staffed Beds': 3, 'Medicare Total Claims': 3},
+    "Case Mix": {'CMI': 3},
+    "Payor Mix": {
+        'Payor Mix: Medicare': 3,
+        'Payor Mix: Medicaid': 3,
+        'Payor Mix: Private/Self-Pay/Other': 3,
+    },
+}
+DEFAULT_SIMILARITY_PRESET = "Balanced"
+DEFAULT_NEIGHBOR_COUNT = 50
+# Memoized (provider, preset, k) neighbour queries kept per index
+NEIGHBOR_MEMO_ENTRIES = 4096
+
+# Comparator group dimension whose keys are (provider, preset, k) nearest-neighbour queries
+SIMILAR_DIMENSION = "Similar"
+
+def build_group_positions(keys):
+    """Map each distinct key to the ascending int row positions holding it"""
+    codes, uniques = pd.factorize(keys, sort=False)
+    valid = codes >= 0
+    positions = np.flatnonzero(valid)
+    # Stable sort keeps positions ascending within each group
+    order = np.argsort(codes[valid], kind='stable')
+    positions = positions[order]
+    counts = np.bincount(codes[valid], minlength=len(uniques))
+    groups = {}
+    for key, group in zip(uniques, np.split(positions, np.cumsum(counts)[:-1])):
+        group.flags.writeable = False
+        groups[key] = group
+    return groups
+
+class ComparatorIndex:
+    """Row positions of every comparator group, built once per dataset"""
+
+    def __init__(self, df, dimensions=None):
+        if dimensions is None:
+            dimensions = COMPARATOR_DIMENSIONS
+        self.n_rows = len(df)
+        self._key_funcs = dict(dimensions)
+        self._groups = {
+            name: build_group_positions(key_func(df))
+            for name, key_func in self._key_funcs.items()
+        }
+        self.similarity = SimilarityIndex(df)
+
+    @property
+    def dimensions(self):
+        """Names of the indexed comparator dimensions"""
+        return list(self._groups)
+
+    def keys(self, dimension):
+        """Sorted group keys for a dimension"""
+        return sorted(self._groups[dimension])
+
+    def key_for(self, dimension, rows):
+        """Group key of the first row in a frame, or None if it has none"""
+        if rows.empty:
+            return None
+        key = self._key_funcs[dimension](rows.iloc[:1]).iloc[0]
+        return None if pd.isna(key) else key
+
+    def positions(self, dimension, key):
+        """Int row positions for a group (empty when the key is unknown)"""
+        if dimension == SIMILAR_DIMENSION:
+            return self.similarity.neighbors(*key)
+        return self._groups[dimension].get(key, np.empty(0, dtype=np.intp))
+
+    def take(self, df, dimension, key):
+        """Slice the rows of one comparator group out of df"""
+        return df.take(self.positions(dimension, key))
+
+    def group_sizes(self, dimension):
+        """Number of rows in each group of a dimension"""
+        return {key: len(rows) for key, rows in self._groups[dimension].items()}
+
+class SimilarityIndex:
+    """KD-trees over weighted, standardized hospital features, one per weight preset"""
+
+    def __init__(self, df, features=None, presets=None):
+        if features is None:
+            features = SIMILARITY_FEATURES
+        if presets is None:
+            presets = SIMILARITY_PRESETS
+        self.features = [name for name in features if name in df.columns]
+        columns = []
+        for name in self.features:
+            values = df[name].to_numpy(dtype=float, na_value=np.nan)
+            if features[name] is not None:
+                values = features[name](values)
+            std = np.nanstd(values) if np.isfinite(values).any() else 0.0
+            columns.append((values - np.nanmean(values)) / (std if std > 0 else 1.0))
+        matrix = np.column_stack(columns) if columns else np.empty((len(df), 0))
+
+        # Hospitals missing any feature cannot be placed and are left out of the trees
+        valid = np.isfinite(matrix).all(axis=1) if self.features else np.zeros(len(df), dtype=bool)
+        self.positions = np.flatnonzero(valid)
+        self.positions.flags.writeable = False
+        points = matrix[valid]
+
+        # First indexed row of each provider -> its point in the trees
+        providers = df['Provider'].astype(str).to_numpy(dtype=object)[valid]
+        self._provider_points = {}
+        for point, provider in enumerate(providers):
+            self._provider_points.setdefault(provider, point)
+
+        # Scaling by sqrt(weight) makes squared distances weight-proportional
+        self._points = {}
+        self._trees = {}
+        for preset, weights in presets.items():
+            scale = np.sqrt([weights.get(name, 1) for name in self.features])
+            self._points[preset] = points * scale
+            self._trees[preset] = cKDTree(self._points[preset]) if len(points) else None
+        self._neighbors = BoundedMemo(NEIGHBOR_MEMO_ENTRIES)
+
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def presets(self):
+        """Names of the weight presets"""
+        return list(self._trees)
+
+    def contains(self, provider_id):
+        """Whether a provider has every feature and can be queried"""
+        return str(provider_id) in self._provider_points
+
+    def neighbors(self, provider_id, preset=DEFAULT_SIMILARITY_PRESET, k=DEFAULT_NEIGHBOR_COUNT):
+        """Ascending row positions of a hospital and its k nearest neighbours (empty when not indexed)"""
+        cache_key = (str(provider_id), preset, k)
+        positions = self._neighbors.get(cache_key)
+        if positions is None:
+            point = self._provider_points.get(cache_key[0])
+            if point is None:
+                return np.empty(0, dtype=np.intp)
+            tree = self._trees[preset]
+            # The hospital itself is its own nearest neighbour at distance 0
+            count = min(k + 1, len(self.positions))
+            _, points = tree.query(self._points[preset][point], k=count)
+            points = np.atleast_1d(points)
+            positions = np.sort(self.positions[points])
+            positions.flags.writeable = False
+            positions = self._neighbors.setdefault(cache_key, positions)
+        return positions
+
+class ClaimsRangeIndex:
+    """Rows of a comparator group sorted by volume so a tolerance window is a range query"""
+
+    def __init__(self, claims, positions=None):
+        claims = np.asarray(claims, dtype=float)
+        if positions is None:
+            positions = np.arange(len(claims))
+        positions = np.asarray(positions)
+        group_claims = claims[positions]
+        valid = ~np.isnan(group_claims)
+        order = np.argsort(group_claims[valid], kind='stable')
+        self.sorted_claims = group_claims[valid][order]
+        self.sorted_positions = positions[valid][order]
+
+    def __len__(self):
+        return len(self.sorted_claims)
+
+    def window(self, low, high):
+        """Ascending row positions with low <= claims <= high"""
+        if np.isnan(low) or np.isnan(high):
+            return np.empty(0, dtype=self.sorted_positions.dtype)
+        start = np.searchsorted(self.sorted_claims, low, side='left')
+        stop = np.searchsorted(self.sorted_claims, high, side='right')
+        return np.sort(self.sorted_positions[start:stop])
+
+    def peer_counts(self, center, percents, include=None):
+        """Number of rows within ±percent of center, for every percent at once
+
+        Row positions in include (e.g. the index hospitals) are counted whether or
+        not they fall in the window, matching a window joined with those rows.
+        """
+        percents = np.asarray(percents, dtype=float)
+        include = np.empty(0, dtype=np.intp) if include is None else np.unique(include)
+        if np.isnan(center):
+            return np.full(len(percents), len(include), dtype=int)
+        tolerance = center * percents / 100
+        lows = np.searchsorted(self.sorted_claims, center - tolerance, side='left')
+        highs = np.searchsorted(self.sorted_claims, center + tolerance, side='right')
+        counts = highs - lows
+        if len(include):
+            # Included rows already inside a window are not counted twice
+            claims = self.sorted_claims[np.isin(self.sorted_positions, include)]
+            inside = ((claims >= (center - tolerance)[:, None]) & (claims <= (center + tolerance)[:, None])).sum(axis=1)
+            counts = counts + len(include) - inside
+        return counts
+
+class SelectorCatalog:
+    """Pre-sorted sidebar options with O(1) lookups back to row positions"""
+
+    def __init__(self, df):
+        named = df['Hospital'].notna().to_numpy()
+        positions = np.flatnonzero(named)
+        labels = (df['Provider'].astype(str) + ' - ' + df['Hospital'].astype(str)).to_numpy(dtype=object)[named]
+        order = np.argsort(labels, kind='stable')
+
+        self.hospital_labels = labels[order].tolist()
+        self.hospital_positions = positions[order]
+        self._label_to_position = dict(zip(self.hospital_labels, self.hospital_positions.tolist()))
+        self._provider_rows = build_group_positions(df['Provider'].astype(str))
+        self.idn_options = sorted(df['IDN'].dropna().unique())
+
+    def position_for_label(self, label):
+        """Row position of a hospital selectbox label, or None"""
+        return self._label_to_position.get(label)
+
+    def provider_positions(self, provider_id):
+        """All row positions for a provider ID"""
+        return self._provider_rows.get(str(provider_id), np.empty(0, dtype=np.intp))
+
+    def hospital_rows(self, df, label):
+        """Index data for a hospital selectbox label"""
+        if self.position_for_label(label) is None:
+            return df.iloc[0:0]
+        provider_id = label.split(' - ')[0]
+        return df.take(self.provider_positions(provider_id))
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Partitioned Dataset Store
+Catalog of hospital workbooks keyed by (year, DRG family), discovered from file
+names without reading them, and a process-wide LRU of loaded partitions. A
+partition is loaded only when selected, and everything built from it (indexes,
+models, per-group caches) lives and is evicted with it, so memory is bounded by
+the partitions in use rather than the size of the catalog.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+from prepared_data import HospitalDataset, dataset_version, load_prepared_data
+from result_cache import BoundedMemo
+
+# os.pathsep-separated directories to scan for workbooks (default: the working directory)
+DATA_DIR_ENV = "HOSPITAL_DATA_DIR"
+# "Readmission CMI-LOS-DRG 329-334 2022.xlsx", "Synthetic CMI-LOS-DRG 329-334 2023.xlsx", ...
+PARTITION_FILE_PATTERN = re.compile(r"CMI-LOS-DRG (?P<drg_family>\d{3}(?:-\d{3})?) (?P<year>\d{4})\.xlsx$",
+                                    re.IGNORECASE)
+# The partition in view plus the one before it, so switching back is instant
+DEFAULT_MAX_PARTITIONS = 2
+# Per-comparator-group resources kept per loaded partition
+GROUP_RESOURCE_LIMIT = 1024
+
+# DRG family -> procedure description shown next to it
+DRG_FAMILY_NAMES = {
+    "329-334": "Intestinal Resection Procedures",
+}
+
+PartitionKey = namedtuple("PartitionKey", ["year", "drg_family"])
+
+def data_directories():
+    """Directories named by HOSPITAL_DATA_DIR, or the working directory"""
+    value = os.environ.get(DATA_DIR_ENV)
+    return [d for d in value.split(os.pathsep) if d] if value else [os.curdir]
+
+def parse_partition_key(file_name):
+    """(year, DRG family) encoded in a workbook name, or None for other files"""
+    match = PARTITION_FILE_PATTERN.search(os.path.basename(file_name))
+    if match is None:
+        return None
+    return PartitionKey(int(match.group("year")), match.group("drg_family"))
+
+def drg_family_label(drg_family):
+    """"DRG 329-334 Intestinal Resection Procedures" (just the codes for unnamed families)"""
+    name = DRG_FAMILY_NAMES.get(drg_family)
+    return f"DRG {drg_family} {name}" if name else f"DRG {drg_family}"
+
+class PartitionCatalog:
+    """Workbooks available per (year, DRG family); nothing is read until a partition is loaded"""
+
+    def __init__(self, paths):
+        self._paths = dict(sorted(paths.items()))
+
+    @classmethod
+    def scan(cls, directories=None):
+        """Catalog of the workbooks in the given directories; the first directory wins on duplicates"""
+        paths = {}
+        for directory in directories or data_directories():
+            try:
+                entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+            except OSError:
+                continue
+            for entry in entries:
+                key = parse_partition_key(entry.name)
+                # Skip Excel lock files ("~$...") and directories
+                if key is not None and not entry.name.startswith("~$") and entry.is_file():
+                    paths.setdefault(key, entry.path)
+        return cls(paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __contains__(self, key):
+        return key in self._paths
+
+    @property
+    def keys(self):
+        return list(self._paths)
+
+    def years(self):
+        """Years with at least one partition, newest first"""
+        return sorted({key.year for key in self._paths}, reverse=True)
+
+    def drg_families(self, year=None):
+        """DRG families available in a year (in any year by default)"""
+        return sorted({key.drg_family for key in self._paths if year is None or key.year == year})
+
+    def path(self, key):
+        return self._paths[key]
+
+    def default_key(self, drg_family=None):
+        """Newest partition, of the given DRG family when it has one; None for an empty catalog"""
+        keys = [key for key in self._paths if key.drg_family == drg_family] or list(self._paths)
+        return max(keys, key=lambda key: key.year) if keys else None
+
+class LoadedPartition:
+    """A loaded dataset and the resources built from it
+
+    Named resources (indexes, models, tables) are a fixed handful; their own
+    per-group memos are entry-bounded LRUs, as are the group resources here.
+    """
+
+    def __init__(self, path, dataset, group_limit=GROUP_RESOURCE_LIMIT):
+        self.path = path
+        self.dataset = dataset
+        self._resources = {}
+        self._group_resources = BoundedMemo(group_limit)
+        self._lock = threading.Lock()
+
+    def resource(self, name, build):
+        """Memoized build() for this partition (indexes, models, tables)"""
+        value = self._resources.get(name)
+        if value is None:
+            value = build()
+            if value is not None:
+                with self._lock:
+                    value = self._resources.setdefault(name, value)
+        return value
+
+    def group_resource(self, key, build):
+        """Memoized build() for one comparator group, keeping the most recently used"""
+        return self._group_resources.get_or_compute(key, build)
+
+def load_hospital_dataset(path):
+    """Read-only dataset of a workbook, through its prepared cache"""
+    return HospitalDataset(load_prepared_data(path), version=dataset_version(path))
+
+class PartitionStore:
+    """Thread-safe LRU of loaded partitions keyed by data file
+
+    A partition is loaded on first use by one thread while others asking for it
+    wait; loading a partition beyond max_partitions evicts the least recently used.
+    """
+
+    def __init__(self, max_partitions=DEFAULT_MAX_PARTITIONS, loader=load_hospital_dataset):
+        self.max_partitions = max_partitions
+        self.loader = loader
+        self._partitions = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._partitions)
+
+    def is_loaded(self, path):
+        return os.path.abspath(path) in self._partitions
+
+    def get(self, path):
+        """Loaded partition of a data file, loading it (and evicting others) on a miss"""
+        path = os.path.abspath(path)
+        with self._lock:
+            partition = self._partitions.get(path)
+            if partition is not None:
+                self._partitions.move_to_end(path)
+                return partition
+            load_lock = self._loading.setdefault(path, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                partition = self._partitions.get(path)
+            if partition is None:
+                partition = LoadedPartition(path, self.loader(path))
+                with self._lock:
+                    self._partitions[path] = partition
+                    self.loads += 1
+                    while len(self._partitions) > self.max_partitions:
+                        self._partitions.popitem(last=False)
+                        self.evictions += 1
+            with self._lock:
+                self._loading.pop(path, None)
+        return partition
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+
+    def stats(self):
+        """Loaded data files (least recently used first) and load/eviction counters"""
+        with self._lock:
+            return {
+                "loaded": list(self._partitions),
+                "max_partitions": self.max_partitions,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
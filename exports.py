@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Data Exports
+Serializes hospital tables to CSV (written in row chunks), Excel (openpyxl
+write-only mode), Parquet and Arrow IPC without building one large
+intermediate string, so the bytes can be cached per dataset version and filter
+"""
+
+import io
+from collections import namedtuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+CSV_CHUNK_ROWS = 10_000
+XLSX_CHUNK_ROWS = 5_000
+ARROW_BATCH_ROWS = 64 * 1024
+
+# Serialized exports are larger than figures; they get their own, bigger LRU
+EXPORT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+ExportFormat = namedtuple("ExportFormat", ["extension", "mime", "writer"])
+
+def iter_row_chunks(df, chunk_rows):
+    """Consecutive row slices of at most chunk_rows rows"""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+def write_csv(df, stream, chunk_rows=CSV_CHUNK_ROWS):
+    """Write UTF-8 CSV one chunk of rows at a time"""
+    stream.write(df.iloc[0:0].to_csv(index=False).encode("utf-8"))
+    for chunk in iter_row_chunks(df, chunk_rows):
+        stream.write(chunk.to_csv(index=False, header=False).encode("utf-8"))
+
+def write_xlsx(df, stream, chunk_rows=XLSX_CHUNK_ROWS, sheet_name="Hospital Data"):
+    """Write a single-sheet workbook row by row with openpyxl's write-only mode"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    sheet.append([str(column) for column in df.columns])
+    for chunk in iter_row_chunks(df, chunk_rows):
+        # object dtype turns numpy scalars into Python values openpyxl can write; NaN becomes an empty cell
+        cells = chunk.astype(object)
+        cells = cells.where(chunk.notna(), None)
+        for row in cells.itertuples(index=False, name=None):
+            sheet.append(row)
+    workbook.save(stream)
+
+def to_arrow_table(df):
+    """Arrow table of a frame's columns (the index is dropped, as in the CSV export)"""
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+def write_parquet(df, stream):
+    """Write a Parquet file for downstream analysis tools"""
+    pq.write_table(to_arrow_table(df), stream)
+
+def write_arrow(df, stream, batch_rows=ARROW_BATCH_ROWS):
+    """Write an Arrow IPC (Feather v2) file in record batches"""
+    table = to_arrow_table(df)
+    with pa.ipc.new_file(stream, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=batch_rows):
+            writer.write_batch(batch)
+
+# Format label -> file extension, MIME type and writer(df, binary stream)
+EXPORT_FORMATS = {
+    "CSV": ExportFormat("csv", "text/csv", write_csv),
+    "Excel": ExportFormat("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", write_xlsx),
+    "Parquet": ExportFormat("parquet", "application/vnd.apache.parquet", write_parquet),
+    "Arrow IPC": ExportFormat("arrow", "application/vnd.apache.arrow.file", write_arrow),
+}
+
+def export_bytes(df, export_format):
+    """Serialize a frame in one of EXPORT_FORMATS"""
+    buffer = io.BytesIO()
+    EXPORT_FORMATS[export_format].writer(df, buffer)
+    return buffer.getvalue()
+
+def export_file_name(stem, export_format):
+    """Download file name with the format's extension"""
+    return f"{stem}.{EXPORT_FORMATS[export_format].extension}"
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Funnel Plot Limits
+Control limits for readmission rate against Medicare claim volume around a
+comparator group's pooled rate, from exact binomial quantiles (interpolated
+between integer counts) or the normal approximation, evaluated vectorized over
+a volume grid and at every hospital's own volume to flag outliers
+"""
+
+from statistics import NormalDist
+
+import numpy as np
+from scipy.stats import binom
+
+# Two-sided coverage of the inner (warning) and outer (control) limits
+FUNNEL_LEVELS = (0.95, 0.998)
+FUNNEL_METHODS = ("exact", "normal")
+FUNNEL_GRID_POINTS = 200
+WITHIN_LIMITS = "Within limits"
+
+def level_label(level):
+    """"95%" / "99.8%" """
+    return f"{level * 100:g}%"
+
+def _exact_limit(p, volumes, target):
+    """p-quantile of Binomial(n, target) / n, interpolated between integer counts (Spiegelhalter, 2005)"""
+    count = binom.ppf(p, volumes, target)
+    cdf = binom.cdf(count, volumes, target)
+    cdf_below = binom.cdf(count - 1, volumes, target)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        step = np.where(cdf > cdf_below, (cdf - p) / (cdf - cdf_below), 0.0)
+    return np.clip((count - step) / volumes, 0.0, 1.0)
+
+def binomial_limits(target, volumes, level, method="exact"):
+    """(lower, upper) rate limits at each volume for a two-sided coverage level"""
+    volumes = np.asarray(volumes, dtype=float)
+    tail = (1 - level) / 2
+    if method == "normal":
+        z = NormalDist().inv_cdf(1 - tail)
+        half_width = z * np.sqrt(target * (1 - target) / volumes)
+        return np.clip(target - half_width, 0.0, 1.0), np.clip(target + half_width, 0.0, 1.0)
+    volumes = np.round(volumes)
+    return _exact_limit(tail, volumes, target), _exact_limit(1 - tail, volumes, target)
+
+class FunnelLimits:
+    """Funnel of one comparator group: pooled target rate, limit curves and per-hospital flags"""
+
+    def __init__(self, rates, claims, positions=None, method="exact", levels=FUNNEL_LEVELS,
+                 grid_points=FUNNEL_GRID_POINTS):
+        rates = np.asarray(rates, dtype=float)
+        claims = np.asarray(claims, dtype=float)
+        if positions is None:
+            positions = np.arange(len(rates))
+        positions = np.asarray(positions)
+        group_rates, group_claims = rates[positions], claims[positions]
+        valid = ~np.isnan(group_rates) & (group_claims >= 1)
+
+        self.method = method
+        self.levels = tuple(sorted(levels))
+        self.positions = positions[valid]
+        self.rates = group_rates[valid]
+        self.claims = group_claims[valid]
+        self.positions.flags.writeable = False
+
+        if not len(self.rates):
+            self.target = np.nan
+            self.volumes = np.empty(0)
+            self.limits = {level: (np.empty(0), np.empty(0)) for level in self.levels}
+            self.flags = np.empty(0, dtype=object)
+            return
+
+        # Pooled rate: total readmissions over total claims
+        self.target = float((self.rates * self.claims).sum() / self.claims.sum())
+        low, high = self.claims.min(), self.claims.max()
+        self.volumes = np.unique(np.round(np.geomspace(low, max(high, low + 1), grid_points)))
+        self.limits = {level: binomial_limits(self.target, self.volumes, level, method) for level in self.levels}
+        self.flags = self._flag()
+
+    def __len__(self):
+        return len(self.rates)
+
+    def _flag(self):
+        """Outermost limit each hospital falls outside of, evaluated at its own volume"""
+        flags = np.full(len(self.rates), WITHIN_LIMITS, dtype=object)
+        for level in self.levels:
+            lower, upper = binomial_limits(self.target, self.claims, level, self.method)
+            flags[self.rates > upper] = f"Above {level_label(level)}"
+            flags[self.rates < lower] = f"Below {level_label(level)}"
+        return flags
+
+    def flag_counts(self):
+        """Number of hospitals per flag"""
+        labels, counts = np.unique(self.flags, return_counts=True)
+        return dict(zip(labels.tolist(), counts.tolist()))
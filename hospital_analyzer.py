@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Hospital Outcomes Analyzer - Batch Reports
+Headless command-line generation of per-hospital and per-IDN report bundles
+(JSON summary, CSV metrics table and standalone Plotly HTML) using a process pool
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from streamlit import config as streamlit_config
+from streamlit import logger as streamlit_logger
+
+import hospital_analyzer_web as web
+from comparator_index import DEFAULT_NEIGHBOR_COUNT, DEFAULT_SIMILARITY_PRESET, SIMILARITY_PRESETS, \
+    ComparatorIndex, SelectorCatalog
+from dataset_store import PartitionCatalog, PartitionKey
+from percentiles import SUMMARY_METRICS, PercentileEngine
+from risk_adjustment import RiskModel
+
+COMPARATOR_CHOICES = ["All Hospitals", "Same IDN", "Same State", "Most Similar Hospitals"]
+REPORT_STAGES = ["select", "filter", "stats", "charts", "write"]
+
+# Outside `streamlit run`, st.* calls only log bare-mode warnings; keep the CLI output clean
+streamlit_config.get_config_options()
+streamlit_config.set_option("global.showWarningOnDirectExecution", False)
+streamlit_logger.set_log_level("error")
+
+# Per-process state populated by _init_worker()
+_worker = {}
+
+def slugify(text):
+    """Make a filesystem-safe directory name"""
+    return re.sub(r'[^A-Za-z0-9]+', '-', str(text)).strip('-').lower() or "report"
+
+def _json_value(value):
+    """Convert numpy/pandas scalars to JSON-friendly values"""
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    if isinstance(value, (np.floating, float)):
+        return None if np.isnan(value) else float(value)
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return value
+
+def _init_worker(data_file, comparator_type, similarity, metrics, output_dir, plotlyjs, comparator_rows):
+    """Load the dataset and indexes once per worker process"""
+    df = web.load_data(data_file)
+    if df is None:
+        raise SystemExit(f"Data file '{data_file}' not found")
+    comparator_index = ComparatorIndex(df)
+    _worker.update(
+        df=df,
+        comparator_index=comparator_index,
+        selector_catalog=SelectorCatalog(df),
+        percentile_engine=PercentileEngine(df, comparator_index, RiskModel(df, comparator_index)),
+        comparator_type=comparator_type,
+        similarity=similarity,
+        metrics=metrics,
+        output_dir=output_dir,
+        plotlyjs=plotlyjs,
+        comparator_rows=comparator_rows,
+    )
+
+def write_report_html(path, title, figures, plotlyjs):
+    """Write several Plotly figures into one standalone HTML page"""
+    parts = []
+    for i, fig in enumerate(figures):
+        include = (True if plotlyjs == "inline" else "cdn") if i == 0 else False
+        parts.append(fig.to_html(full_html=False, include_plotlyjs=include))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"<!DOCTYPE html>\n<html>\n<head><meta charset=\"utf-8\"><title>{title}</title></head>\n<body>\n")
+        f.write(f"<h1 style=\"font-family: sans-serif;\">{title}</h1>\n")
+        f.write("\n".join(parts))
+        f.write("\n</body>\n</html>\n")
+
+def build_report(selection):
+    """Generate one report bundle; returns per-stage timings in seconds"""
+    kind, key = selection
+    df = _worker['df']
+    comparator_index = _worker['comparator_index']
+    timings = {}
+
+    start = time.perf_counter()
+    if kind == "hospital":
+        selector_catalog = _worker['selector_catalog']
+        index_data = df.take(selector_catalog.provider_positions(key))
+        selected_hospital, selected_idn = str(key), None
+        title = f"{key} - {index_data.iloc[0]['Hospital']}" if not index_data.empty else str(key)
+    else:
+        index_data = comparator_index.take(df, "IDN", key)
+        selected_hospital, selected_idn = None, key
+        title = str(key)
+    timings['select'] = time.perf_counter() - start
+    if index_data.empty:
+        return {'selection': selection, 'status': 'not found', 'timings': timings}
+
+    start = time.perf_counter()
+    comparator_type = _worker['comparator_type']
+    similarity = _worker['similarity']
+    comparator_group = web.resolve_comparator_group(index_data, comparator_type, selected_hospital, selected_idn,
+                                                    comparator_index, similarity)
+    comparator_data = web.filter_comparator_data(df, index_data, comparator_type, selected_hospital, selected_idn,
+                                                 comparator_index, similarity)
+    risk_model = _worker['percentile_engine'].risk_model
+    index_data = web.add_risk_adjusted_metrics(index_data, comparator_group, risk_model)
+    comparator_data = web.add_risk_adjusted_metrics(comparator_data, comparator_group, risk_model)
+    timings['filter'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    percentile_engine = _worker['percentile_engine']
+    summary = {
+        'selection': {'type': kind, 'key': _json_value(key), 'title': title},
+        'comparator': {'type': comparator_type, 'hospitals': len(comparator_data)},
+        'index_hospitals': len(index_data),
+        'index_metrics': {m: _json_value(v) for m, v in web.compute_index_metrics(index_data).items()},
+        'index_percentiles': {
+            m: _json_value(v)
+            for m, v in web.compute_index_percentiles(index_data, comparator_data, percentile_engine,
+                                                     comparator_group).items()
+        },
+        'index_percentile_intervals': {
+            m: [_json_value(low), _json_value(high)]
+            for m, (low, high) in web.compute_index_percentile_intervals(index_data, comparator_data, percentile_engine,
+                                                                         comparator_group).items()
+        },
+        'comparator_stats': [
+            {k: _json_value(v) for k, v in stats.items()}
+            for stats in web.compute_comparator_stats(comparator_data, percentile_engine, comparator_group)
+        ],
+    }
+    if comparator_type == "Most Similar Hospitals":
+        summary['comparator']['similarity'] = {'preset': similarity[0], 'neighbors': similarity[1],
+                                               'indexed': comparator_group is not None}
+    timings['stats'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    figures = []
+    for metric in _worker['metrics']:
+        chart = web.create_metric_chart(comparator_data, metric, f"{len(comparator_data)} hospitals",
+                                        percentile_engine, comparator_group)
+        if chart:
+            figures.append(chart)
+        comp_chart = web.create_comparison_chart(index_data, comparator_data, metric, percentile_engine,
+                                                 comparator_group)
+        if comp_chart:
+            figures.append(comp_chart)
+    timings['charts'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    report_dir = os.path.join(_worker['output_dir'], f"{kind}-{slugify(key)}")
+    os.makedirs(report_dir, exist_ok=True)
+    with open(os.path.join(report_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    metrics_table = pd.DataFrame(summary['comparator_stats'])
+    if not metrics_table.empty:
+        metrics_table.insert(1, 'Index Value', metrics_table['Metric'].map(summary['index_metrics']))
+        metrics_table.insert(2, 'Index Percentile', metrics_table['Metric'].map(summary['index_percentiles']))
+    metrics_table.to_csv(os.path.join(report_dir, "metrics.csv"), index=False)
+    if _worker['comparator_rows']:
+        comparator_data.to_csv(os.path.join(report_dir, "comparator.csv"), index=False)
+    if figures:
+        write_report_html(os.path.join(report_dir, "report.html"), title, figures, _worker['plotlyjs'])
+    timings['write'] = time.perf_counter() - start
+
+    return {'selection': selection, 'status': 'ok', 'timings': timings}
+
+def resolve_selections(df, hospitals, idns):
+    """Expand the requested hospital/IDN keys ("all" expands to every one)"""
+    selections = []
+    if hospitals:
+        if [h.lower() for h in hospitals] == ["all"]:
+            hospitals = df['Provider'].dropna().astype(str).unique().tolist()
+        selections += [("hospital", h) for h in hospitals]
+    if idns:
+        if [i.lower() for i in idns] == ["all"]:
+            idns = sorted(df['IDN'].dropna().unique())
+        selections += [("idn", i) for i in idns]
+    return selections
+
+def print_timings(stage_timings, setup_timings, n_reports, wall_time):
+    """Print per-stage timing totals"""
+    print(f"\n{'Stage':<10} {'Total (s)':>10} {'Per report (ms)':>16}")
+    print("-" * 38)
+    for stage, seconds in setup_timings.items():
+        print(f"{stage:<10} {seconds:>10.3f} {'':>16}")
+    for stage in REPORT_STAGES:
+        seconds = stage_timings.get(stage, 0.0)
+        per_report = seconds / n_reports * 1000 if n_reports else 0.0
+        print(f"{stage:<10} {seconds:>10.3f} {per_report:>16.2f}")
+    print("-" * 38)
+    print(f"{'wall':<10} {wall_time:>10.3f} {'':>16}")
+    print("Stage totals are summed across workers.")
+
+def resolve_partition_file(parser, drg_family, year):
+    """Workbook of the requested catalog partition (HOSPITAL_DATA_DIR or the working directory)"""
+    catalog = PartitionCatalog.scan()
+    default = catalog.default_key(drg_family)
+    if default is None:
+        parser.error("no hospital data workbooks found; pass --data or set HOSPITAL_DATA_DIR")
+    key = PartitionKey(year or default.year, drg_family or default.drg_family)
+    if key not in catalog:
+        available = ", ".join(f"{k.drg_family} {k.year}" for k in catalog.keys)
+        parser.error(f"no workbook for DRG {key.drg_family} {key.year} (available: {available})")
+    return catalog.path(key)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="hospital-analyzer",
+        description="Generate hospital outcome report bundles without the web interface."
+    )
+    parser.add_argument("--data", help="Hospital data workbook (default: the catalog partition picked by "
+                                       "--drg-family/--year)")
+    parser.add_argument("--drg-family", metavar="DRGS",
+                        help="DRG family of the catalog partition, e.g. 329-334 (default: the newest partition's)")
+    parser.add_argument("--year", type=int, help="Year of the catalog partition (default: newest)")
+    parser.add_argument("--hospitals", nargs="+", metavar="PROVIDER",
+                        help="Provider IDs to report on, or 'all'")
+    parser.add_argument("--idns", nargs="+", metavar="IDN", help="IDN names to report on, or 'all'")
+    parser.add_argument("--comparator", choices=COMPARATOR_CHOICES, default="All Hospitals",
+                        help="Comparator group (default: %(default)s)")
+    parser.add_argument("--similarity-preset", choices=list(SIMILARITY_PRESETS), default=DEFAULT_SIMILARITY_PRESET,
+                        help="Feature weighting for 'Most Similar Hospitals' (default: %(default)s)")
+    parser.add_argument("--neighbors", type=int, default=DEFAULT_NEIGHBOR_COUNT,
+                        help="Number of similar hospitals for 'Most Similar Hospitals' (default: %(default)s)")
+    parser.add_argument("--metrics", nargs="+", choices=SUMMARY_METRICS, default=SUMMARY_METRICS,
+                        metavar="METRIC", help="Metrics to chart (default: all)")
+    parser.add_argument("--output", default="reports", help="Output directory (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: CPU count)")
+    parser.add_argument("--comparator-rows", action="store_true",
+                        help="Also write every comparator hospital's row to comparator.csv")
+    parser.add_argument("--plotlyjs", choices=["inline", "cdn"], default="inline",
+                        help="Embed plotly.js in each HTML file or load it from the CDN (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if not args.hospitals and not args.idns:
+        parser.error("specify --hospitals and/or --idns")
+    if args.comparator in ("Same State", "Most Similar Hospitals") and args.idns:
+        parser.error(f"'{args.comparator}' is only available for hospital reports")
+    if args.neighbors < 1:
+        parser.error("--neighbors must be at least 1")
+    if args.data is None:
+        args.data = resolve_partition_file(parser, args.drg_family, args.year)
+    elif args.drg_family or args.year:
+        parser.error("--drg-family/--year select a catalog partition and cannot be combined with --data")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    wall_start = time.perf_counter()
+    setup_timings = {}
+
+    start = time.perf_counter()
+    df = web.load_data(args.data)
+    if df is None:
+        print(f"ERROR: Data file '{args.data}' not found", file=sys.stderr)
+        return 1
+    setup_timings['load'] = time.perf_counter() - start
+
+    selections = resolve_selections(df, args.hospitals, args.idns)
+    os.makedirs(args.output, exist_ok=True)
+    workers = max(1, min(args.workers, len(selections)))
+    print(f"Generating {len(selections)} report(s) with {workers} worker(s) into '{args.output}'")
+
+    init_args = (args.data, args.comparator, (args.similarity_preset, args.neighbors), args.metrics, args.output, args.plotlyjs, args.comparator_rows)
+    start = time.perf_counter()
+    if workers == 1:
+        _init_worker(*init_args)
+        setup_timings['init'] = time.perf_counter() - start
+        start = time.perf_counter()
+        results = [build_report(selection) for selection in selections]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+            chunksize = max(1, len(selections) // (workers * 8))
+            results = list(pool.map(build_report, selections, chunksize=chunksize))
+    setup_timings['reports'] = time.perf_counter() - start
+
+    stage_timings = defaultdict(float)
+    missing = []
+    for result in results:
+        for stage, seconds in result['timings'].items():
+            stage_timings[stage] += seconds
+        if result['status'] != 'ok':
+            missing.append(result['selection'][1])
+
+    completed = len(results) - len(missing)
+    print(f"Wrote {completed} report bundle(s)")
+    if missing:
+        print(f"Not found: {', '.join(map(str, missing))}", file=sys.stderr)
+    print_timings(stage_timings, setup_timings, completed, time.perf_counter() - wall_start)
+    return 0 if completed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
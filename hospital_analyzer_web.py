@@ -5,25 +5,61 @@ A web-based application for analyzing hospital readmission data
 """
 
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import numpy as np
 import os
+import functools
+from collections import deque
 from datetime import datetime
 import base64
 
-# Configure Streamlit page
-st.set_page_config(
-    page_title="Hospital Outcomes Analyzer",
-    page_icon="🏥",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+from bootstrap import BOOTSTRAP_CONFIDENCE, BOOTSTRAP_SEED, seeded_rng
+from comparator_index import (DEFAULT_NEIGHBOR_COUNT, DEFAULT_SIMILARITY_PRESET, SIMILAR_DIMENSION,
+                              SIMILARITY_PRESETS, ClaimsRangeIndex, ComparatorIndex, SelectorCatalog)
+from dataset_store import PartitionCatalog, PartitionKey, PartitionStore, drg_family_label
+from exports import EXPORT_CACHE_MAX_BYTES, EXPORT_FORMATS, export_bytes, export_file_name
+from funnel import WITHIN_LIMITS, FunnelLimits, level_label
+from instrumentation import PROFILE_LOG_ENV, PROFILE_MEMORY_ENV, instrument, latency_percentiles, profile_rerun
+from percentiles import (LEAGUE_COMPARATORS, SUMMARY_METRICS, MetricDistribution, PercentileEngine,
+                         league_table, league_table_column)
+from result_cache import ResultCache, ResultKey
+from risk_adjustment import RISK_ADJUSTED_METRICS, RiskModel
+
+# Scatter plots with more comparator points than this switch to WebGL and label only a few points
+SCATTER_WEBGL_THRESHOLD = 500
+SCATTER_LABEL_LIMIT = 20
+
+TABLE_PAGE_SIZES = [25, 50, 100, 250]
+
+# Funnel plot limit choices -> funnel.binomial_limits method
+FUNNEL_METHOD_OPTIONS = {"Exact binomial": "exact", "Normal approximation": "normal"}
+FUNNEL_FLAG_COLORS = {
+    "Above 99.8%": '#DC2626', "Above 95%": '#F59E0B', WITHIN_LIMITS: '#60A5FA',
+    "Below 95%": '#34D399', "Below 99.8%": '#059669',
+}
+
+# Comparator statistic -> quantile it reports, for its bootstrap interval
+QUANTILE_STATS = {'Median': 0.5, '25th Percentile': 0.25, '75th Percentile': 0.75}
+
+# Rerun profiles kept per session for the debug panel
+PROFILE_HISTORY = 50
+
+# Choices for the "Total procedures similarity" window, in percent of the index hospital's claims
+CLAIMS_PERCENT_OPTIONS = list(range(1, 76))
+
+# Histogram bin choices shown in the UI -> percentiles.HISTOGRAM_BIN_METHODS
+HISTOGRAM_BIN_OPTIONS = {
+    "30 equal-width bins": "equal",
+    "Freedman–Diaconis": "fd",
+    "Fixed edges (all hospitals)": "fixed",
+}
 
 # Custom CSS for enhanced aesthetics
-st.markdown("""
+PAGE_CSS = """
 <style>
 /* Main container styling */
 .main {
@@ -296,91 +332,281 @@ div[data-testid="metric-container"] label {
     margin-bottom: 1.5rem;
 }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+def configure_page():
+    """Configure the Streamlit page and inject the custom CSS"""
+    st.set_page_config(
+        page_title="Hospital Outcomes Analyzer",
+        page_icon="🏥",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    st.markdown(PAGE_CSS, unsafe_allow_html=True)
 
+@st.cache_resource(show_spinner=False)
 def get_base64_image(image_path):
-    """Convert image to base64 string"""
+    """Convert image to base64 string (encoded once per process)"""
     with open(image_path, "rb") as img_file:
         return base64.b64encode(img_file.read()).decode()
 
-@st.cache_data(show_spinner=False)
-def load_data():
+@st.cache_resource(show_spinner=False, ttl=300)
+def load_partition_catalog():
+    """Workbooks available per (year, DRG family), rescanned every five minutes to pick up new files"""
+    return PartitionCatalog.scan()
+
+@st.cache_resource(show_spinner=False)
+def load_partition_store():
+    """Process-wide LRU of loaded partitions and everything built from them"""
+    return PartitionStore()
+
+def selected_data_file():
+    """Data file of the partition picked in the sidebar (the newest partition before any pick)"""
+    data_file = st.session_state.get("data_file")
+    if data_file is None:
+        catalog = load_partition_catalog()
+        key = catalog.default_key()
+        data_file = None if key is None else catalog.path(key)
+    return data_file
+
+def load_partition(data_file=None):
+    """Loaded partition of a data file (the selected one by default), or None if it is missing"""
+    if data_file is None:
+        data_file = selected_data_file()
+    if data_file is None or not os.path.exists(data_file):
+        st.error(f"Data file '{data_file}' not found" if data_file else "No hospital data files found")
+        return None
+    store = load_partition_store()
+    if store.is_loaded(data_file):
+        return store.get(data_file)
+    with st.spinner("⏳ Loading hospital data..."):
+        # Reads the columnar cache when current, otherwise parses and caches the workbook
+        return store.get(data_file)
+
+def load_dataset(data_file=None):
+    """Read-only hospital data of a partition, shared across sessions while it stays loaded"""
+    partition = load_partition(data_file)
+    return None if partition is None else partition.dataset
+
+@instrument("load_data")
+def load_data(data_file=None):
     """Load and clean the hospital data"""
-    data_file = "Readmission CMI-LOS-DRG 329-334 2022.xlsx"
-    if os.path.exists(data_file):
-        with st.spinner("⏳ Loading hospital data..."):
-            df = pd.read_excel(data_file)
-        
-        # Clean the data
-        df['CMI'] = pd.to_numeric(df['CMI'], errors='coerce')
-        df = df.dropna(axis=1, how='all')
-        df['IDN'] = df['IDN'].fillna('Independent')
-        
-        # Create City/State column if it doesn't exist
-        if 'City/State' not in df.columns and 'City' in df.columns and 'State' in df.columns:
-            df['City/State'] = df['City'].astype(str) + ', ' + df['State'].astype(str)
-            df['City/State'] = df['City/State'].replace('nan, nan', '')
-        
-        # Calculate normalized metrics (divide by CMI to adjust for case complexity)
-        df['Normalized ALOS'] = df['ALOS'] / df['CMI']
-        df['Normalized Readmission Rate'] = df['Readmission Rate'] / df['CMI']
-        
-        return df
-    else:
-        st.error(f"Data file '{data_file}' not found in current directory")
+    dataset = load_dataset(data_file)
+    if dataset is None:
         return None
+    # Zero-copy frame over the shared, read-only buffers
+    return dataset.frame
+
+def load_partition_resource(name, build, data_file=None):
+    """Resource built once from a partition's dataset and evicted with it"""
+    partition = load_partition(data_file)
+    if partition is None:
+        return None
+    return partition.resource(name, lambda: build(partition.dataset))
+
+def load_comparator_index(data_file=None):
+    """Comparator group index of a partition"""
+    return load_partition_resource("comparator_index", lambda dataset: ComparatorIndex(dataset.frame), data_file)
+
+def load_selector_catalog(data_file=None):
+    """Sorted hospital/IDN selector options of a partition"""
+    return load_partition_resource("selector_catalog", lambda dataset: SelectorCatalog(dataset.frame), data_file)
+
+def load_risk_model(data_file=None):
+    """Risk-adjustment design matrix and per-group coefficients, shared across sessions"""
+    return load_partition_resource(
+        "risk_model",
+        lambda dataset: RiskModel(dataset.frame, load_comparator_index(data_file), version=dataset.version),
+        data_file
+    )
+
+def load_percentile_engine(data_file=None):
+    """Share memoized comparator distributions across sessions"""
+    return load_partition_resource(
+        "percentile_engine",
+        lambda dataset: PercentileEngine(dataset.frame, load_comparator_index(data_file), load_risk_model(data_file)),
+        data_file
+    )
+
+def load_group_resource(kind, comparator_group, build, data_file=None):
+    """Resource of one comparator group of a partition, kept for the most recently used groups"""
+    partition = load_partition(data_file)
+    
+    def build_group():
+        positions = None
+        if comparator_group is not None:
+            positions = load_comparator_index(data_file).positions(*comparator_group)
+        return build(partition.dataset, positions)
+    return partition.group_resource((kind, comparator_group), build_group)
+
+def load_claims_index(comparator_group, data_file=None):
+    """Claims-sorted rows of a comparator group, built once per group"""
+    return load_group_resource(
+        "claims_index", comparator_group,
+        lambda dataset, positions: ClaimsRangeIndex(dataset.column('Medicare Total Claims'), positions),
+        data_file
+    )
+
+def load_funnel_limits(comparator_group, method="exact", data_file=None):
+    """Readmission funnel limits and outlier flags of a comparator group, built once per group"""
+    return load_group_resource(
+        f"funnel_limits:{method}", comparator_group,
+        lambda dataset, positions: FunnelLimits(dataset.column('Readmission Rate'),
+                                                dataset.column('Medicare Total Claims'), positions, method),
+        data_file
+    )
+
+@st.cache_resource(show_spinner=False)
+def load_result_cache():
+    """Process-wide LRU of computed tables and figure JSON shared by all sessions"""
+    return ResultCache()
+
+@st.cache_resource(show_spinner=False)
+def load_export_cache():
+    """Process-wide LRU of serialized export files, keyed by dataset version and filter"""
+    return ResultCache(max_bytes=EXPORT_CACHE_MAX_BYTES)
+
+@instrument("export", rows="data")
+def cached_export(key, data, export_format):
+    """Serialized export bytes, produced once per key and format"""
+    return load_export_cache().get_or_compute(
+        key._replace(kind=f"export:{export_format}"),
+        lambda: export_bytes(data, export_format)
+    )
+
+def cached_figure(result_cache, key, build_figure):
+    """Return a figure from its cached JSON, building and caching it on a miss"""
+    fig_json = result_cache.get(key)
+    if fig_json is not None:
+        return pio.from_json(fig_json)
+    fig = build_figure()
+    if fig is not None:
+        result_cache.put(key, fig.to_json())
+    return fig
+
+def profiling_enabled():
+    """Profile reruns while the debug panel is open or a profile log is configured"""
+    return bool(st.session_state.get("debug_panel")) or bool(os.environ.get(PROFILE_LOG_ENV))
+
+def memory_tracing_enabled():
+    """Trace peak memory only when asked for in the debug panel or by PROFILE_MEMORY_ENV"""
+    return bool(st.session_state.get("trace_memory")) or bool(os.environ.get(PROFILE_MEMORY_ENV))
+
+def record_profile(profile):
+    """Keep a finished rerun profile in the session's history"""
+    history = st.session_state.setdefault("rerun_profiles", deque(maxlen=PROFILE_HISTORY))
+    history.append(profile)
+
+def profiled(name):
+    """Decorator profiling a page section; a fragment rerunning alone gets its own profile"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            ctx = get_script_run_ctx()
+            with profile_rerun(name, profiling_enabled(),
+                               context={"session": ctx.session_id if ctx else None},
+                               log_path=os.environ.get(PROFILE_LOG_ENV), on_finish=record_profile,
+                               trace_memory=memory_tracing_enabled()):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def load_league_table(data_file=None):
+    """Rank every hospital of a partition against every comparator group once"""
+    return load_partition_resource(
+        "league_table",
+        lambda dataset: league_table(dataset.frame, risk_model=load_risk_model(data_file),
+                                     comparator_index=load_comparator_index(data_file)),
+        data_file
+    )
 
 def get_hospital_display_name(row):
     """Create a display name for hospitals"""
     return f"{row['Provider']} - {row['Hospital']}"
 
-def filter_comparator_data(df, index_data, comparator_type, selected_hospital, selected_idn):
-    """Filter data based on comparator selection"""
-    if comparator_type == "All Hospitals":
-        return df
-    elif comparator_type == "Same IDN":
+def resolve_comparator_group(index_data, comparator_type, selected_hospital, selected_idn, comparator_index,
+                             similarity=None):
+    """Return the (dimension, key) comparator group, or None for all hospitals
+
+    similarity is the (weight preset, k) used by "Most Similar Hospitals"
+    """
+    if comparator_type == "Same IDN":
         if selected_hospital and not index_data.empty:
-            idn = index_data.iloc[0]['IDN']
-            return df[df['IDN'] == idn]
+            return ("IDN", comparator_index.key_for("IDN", index_data))
         elif selected_idn:
-            return df[df['IDN'] == selected_idn]
-        else:
-            return df
+            return ("IDN", selected_idn)
     elif comparator_type == "Same State":
         if selected_hospital and not index_data.empty:
-            # Try City/State column first, then State column
-            if 'City/State' in index_data.columns:
-                location = index_data.iloc[0]['City/State']
-                if pd.notna(location) and ', ' in str(location):
-                    state = location.split(', ')[-1]
-                    return df[df['City/State'].str.contains(state, na=False)]
-            elif 'State' in index_data.columns:
-                state = index_data.iloc[0]['State']
-                if pd.notna(state):
-                    return df[df['State'] == state]
+            state = comparator_index.key_for("State", index_data)
+            if state is not None:
+                return ("State", state)
+    elif comparator_type == "Most Similar Hospitals":
+        if selected_hospital and not index_data.empty:
+            provider_id = str(index_data['Provider'].iloc[0])
+            if comparator_index.similarity.contains(provider_id):
+                preset, k = similarity or (DEFAULT_SIMILARITY_PRESET, DEFAULT_NEIGHBOR_COUNT)
+                return (SIMILAR_DIMENSION, (provider_id, preset, k))
+    return None
+
+@instrument("filter_comparator_data")
+def filter_comparator_data(df, index_data, comparator_type, selected_hospital, selected_idn, comparator_index=None,
+                           similarity=None):
+    """Filter data based on comparator selection"""
+    if comparator_type == "All Hospitals":
+        return df
+    
+    if comparator_index is None:
+        comparator_index = ComparatorIndex(df)
+    
+    group = resolve_comparator_group(index_data, comparator_type, selected_hospital, selected_idn, comparator_index,
+                                     similarity)
+    if group is None:
         return df
-    return df
+    return comparator_index.take(df, *group)
+
+@instrument("risk_adjust", rows="data")
+def add_risk_adjusted_metrics(data, comparator_group, risk_model=None):
+    """Add expected values and O/E ratios fitted within the comparator group"""
+    if risk_model is None:
+        risk_model = load_risk_model()
+    return risk_model.assign(data, comparator_group)
 
-def create_metric_chart(data, metric, title_suffix=""):
+@instrument("create_metric_chart", rows="data")
+def create_metric_chart(data, metric, title_suffix="", percentile_engine=None, comparator_group=None,
+                        bin_method="equal"):
     """Create a histogram chart for the selected metric"""
-    clean_data = data[metric].dropna()
+    distribution = get_metric_distribution(data, metric, percentile_engine, comparator_group)
     
-    if clean_data.empty:
+    if distribution.empty:
         st.warning(f"No data available for {metric}")
         return None
     
+    # Bin server-side so only the bar heights are sent to the browser
+    if percentile_engine is not None:
+        edges, counts = percentile_engine.histogram(comparator_group, metric, bin_method)
+    else:
+        edges, counts = distribution.histogram(bin_method)
+    
     # Create histogram with enhanced styling
-    fig = px.histogram(
-        x=clean_data,
-        nbins=30,
+    fig = go.Figure(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts,
+        width=np.diff(edges),
+        customdata=np.column_stack([edges[:-1], edges[1:]]),
+        marker_color='#60A5FA',  # Light blue color
+        hovertemplate=f'{metric}: %{{customdata[0]:.3g}} – %{{customdata[1]:.3g}}<br>'
+                      'Number of Hospitals: %{y}<extra></extra>'
+    ))
+    fig.update_layout(
         title=f'<b>{metric} Distribution</b><br><sup style="color: #6B7280">{title_suffix}</sup>',
-        labels={'x': metric, 'y': 'Number of Hospitals'},
-        color_discrete_sequence=['#60A5FA']  # Light blue color
+        xaxis_title=metric,
+        yaxis_title='Number of Hospitals',
+        bargap=0
     )
     
     # Add statistics lines
-    mean_val = clean_data.mean()
-    median_val = clean_data.median()
+    mean_val = distribution.mean
+    median_val = distribution.median
     
     fig.add_vline(
         x=mean_val, 
@@ -431,7 +657,28 @@ def create_metric_chart(data, metric, title_suffix=""):
     
     return fig
 
-def create_comparison_chart(index_data, comparator_data, metric):
+def get_metric_distribution(comparator_data, metric, percentile_engine=None, comparator_group=None):
+    """Sorted comparator values for a metric, memoized when an engine is supplied"""
+    if percentile_engine is not None:
+        return percentile_engine.distribution(comparator_group, metric)
+    return MetricDistribution.from_series(comparator_data[metric])
+
+def get_percentile_interval(index_data, comparator_data, metric, percentile_engine=None, comparator_group=None):
+    """Bootstrap confidence interval of the index hospital/IDN's percentile rank"""
+    if percentile_engine is not None:
+        return percentile_engine.percentile_interval(comparator_group, metric, index_data)
+    distribution = MetricDistribution.from_series(comparator_data[metric])
+    return distribution.percentile_interval(index_data, metric, seeded_rng(BOOTSTRAP_SEED, comparator_group, metric))
+
+def get_quantile_intervals(comparator_data, metric, percentile_engine=None, comparator_group=None):
+    """Bootstrap confidence intervals of the comparator quartiles, memoized when an engine is supplied"""
+    if percentile_engine is not None:
+        return percentile_engine.quantile_intervals(comparator_group, metric)
+    distribution = MetricDistribution.from_series(comparator_data[metric])
+    return distribution.quantile_intervals(rng=seeded_rng(BOOTSTRAP_SEED, comparator_group, metric))
+
+@instrument("create_comparison_chart", rows="comparator_data")
+def create_comparison_chart(index_data, comparator_data, metric, percentile_engine=None, comparator_group=None):
     """Create a comparison chart showing index vs comparator"""
     if index_data.empty or comparator_data.empty:
         return None
@@ -449,12 +696,16 @@ def create_comparison_chart(index_data, comparator_data, metric):
         return None
     
     # Get comparator distribution
-    comp_data = comparator_data[metric].dropna()
-    if comp_data.empty:
+    distribution = get_metric_distribution(comparator_data, metric, percentile_engine, comparator_group)
+    if distribution.empty:
         return None
+    comp_data = distribution.values
     
-    # Calculate percentile
-    percentile = (comp_data < index_value).mean() * 100
+    # Calculate percentile, with its bootstrap interval (wide for low-volume hospitals)
+    percentile = distribution.percentile_of(index_value)
+    percentile_low, percentile_high = get_percentile_interval(index_data, comparator_data, metric,
+                                                              percentile_engine, comparator_group)
+    interval_text = f"{BOOTSTRAP_CONFIDENCE:.0%} CI {percentile_low:.0f}–{percentile_high:.0f}"
     
     # Determine performance color based on metric type and percentile
     if "Readmission" in metric or "ALOS" in metric:
@@ -497,7 +748,7 @@ def create_comparison_chart(index_data, comparator_data, metric):
             symbol='star',
             line=dict(width=2, color='white')
         ),
-        text=[f'{percentile:.0f}%ile'],
+        text=[f'{percentile:.0f}%ile ({percentile_low:.0f}–{percentile_high:.0f})'],
         textposition='middle right',
         textfont=dict(size=14, color=perf_color, family='sans-serif', weight=600),
         name=f'{index_label}',
@@ -547,7 +798,7 @@ def create_comparison_chart(index_data, comparator_data, metric):
     fig.add_annotation(
         x=0,
         y=index_value,
-        text=f"<b>{percentile:.0f}th percentile</b>",
+        text=f"<b>{percentile:.0f}th percentile</b><br>{interval_text}",
         showarrow=True,
         arrowhead=2,
         arrowsize=1,
@@ -564,7 +815,338 @@ def create_comparison_chart(index_data, comparator_data, metric):
     
     return fig
 
-def display_summary_stats(index_data, comparator_data):
+def funnel_hospitals(df, funnel):
+    """Provider, hospital, volume, rate and flag of each hospital on a funnel plot"""
+    hospitals = df[['Provider', 'Hospital']].take(funnel.positions)
+    hospitals['Medicare Total Claims'] = funnel.claims
+    hospitals['Readmission Rate'] = funnel.rates
+    hospitals['Funnel Flag'] = funnel.flags
+    return hospitals
+
+@instrument("create_funnel_chart", rows="hospitals")
+def create_funnel_chart(funnel, hospitals, index_data, webgl_threshold=SCATTER_WEBGL_THRESHOLD):
+    """Readmission Rate vs Medicare Total Claims with the comparator group's control limits"""
+    if not len(funnel):
+        return None
+    
+    fig = go.Figure()
+    limit_styles = {funnel.levels[0]: 'dash', funnel.levels[-1]: 'dot'}
+    for level, (lower, upper) in funnel.limits.items():
+        for bound, values in (("Upper", upper), ("Lower", lower)):
+            fig.add_trace(go.Scatter(
+                x=funnel.volumes,
+                y=values,
+                mode='lines',
+                line=dict(color='#6B7280', width=1.5, dash=limit_styles.get(level, 'solid')),
+                name=f"{level_label(level)} limits",
+                legendgroup=level_label(level),
+                showlegend=bound == "Upper",
+                hovertemplate=f'{bound} {level_label(level)} limit at %{{x:.0f}} claims: %{{y:.1%}}<extra></extra>'
+            ))
+    
+    fig.add_hline(
+        y=funnel.target,
+        line_dash="solid",
+        line_color="#1E88E5",
+        line_width=2,
+        annotation_text=f"Group rate: {funnel.target:.1%}",
+        annotation_position="top right",
+        annotation_font_color="#1E88E5"
+    )
+    
+    is_index = np.isin(funnel.positions, index_data.index.to_numpy())
+    labels = truncate_labels(hospitals['Hospital'])
+    hovertemplate = ('<b>%{customdata[0]}</b><br>Medicare Total Claims: %{x:.0f}<br>'
+                     'Readmission Rate: %{y:.1%}<br>%{customdata[1]}<extra></extra>')
+    # Scattergl above the threshold, one trace per flag so the legend doubles as a filter
+    scatter_trace = go.Scattergl if len(funnel) > webgl_threshold else go.Scatter
+    for flag, color in FUNNEL_FLAG_COLORS.items():
+        points = (hospitals['Funnel Flag'].to_numpy() == flag) & ~is_index
+        if not points.any():
+            continue
+        fig.add_trace(scatter_trace(
+            x=funnel.claims[points],
+            y=funnel.rates[points],
+            mode='markers',
+            marker=dict(size=7, color=color, line=dict(width=1, color='white'), opacity=0.85),
+            customdata=np.column_stack([labels[points], hospitals['Funnel Flag'].to_numpy()[points]]),
+            name=f"{flag} ({points.sum()})",
+            hovertemplate=hovertemplate
+        ))
+    
+    if is_index.any():
+        fig.add_trace(go.Scatter(
+            x=funnel.claims[is_index],
+            y=funnel.rates[is_index],
+            mode='markers+text',
+            marker=dict(size=20, color='#F59E0B', symbol='star', line=dict(width=2, color='white')),
+            text=labels[is_index],
+            textposition="top center",
+            textfont=dict(size=11, color='#92400E', family='sans-serif'),
+            customdata=np.column_stack([labels[is_index], hospitals['Funnel Flag'].to_numpy()[is_index]]),
+            name='Selected Hospital' if is_index.sum() == 1 else 'Selected IDN Hospitals',
+            hovertemplate=hovertemplate
+        ))
+    
+    method = "exact binomial" if funnel.method == "exact" else "normal approximation"
+    fig.update_layout(
+        title=dict(
+            text=f"<b>Readmission Rate vs Medicare Total Claims</b><br><sup style='color: #6B7280'>"
+                 f"Control limits around the group rate ({method})</sup>",
+            font=dict(size=16)
+        ),
+        xaxis_title="<b>Medicare Total Claims</b>",
+        yaxis_title="<b>Readmission Rate</b>",
+        yaxis_tickformat='.0%',
+        height=550,
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(family="sans-serif", size=12, color="#374151"),
+        xaxis=dict(showgrid=True, gridwidth=1, gridcolor='#E5E7EB', zeroline=False),
+        yaxis=dict(showgrid=True, gridwidth=1, gridcolor='#E5E7EB', zeroline=False),
+        margin=dict(l=60, r=40, t=80, b=60),
+        hoverlabel=dict(bgcolor="white", font_size=12, font_family="sans-serif", bordercolor="#E5E7EB")
+    )
+    return fig
+
+def truncate_labels(names, max_length=20):
+    """Vectorized hospital-name truncation for chart labels"""
+    names = names.astype(str)
+    return names.str.slice(0, max_length).where(names.str.len() <= max_length,
+                                                names.str.slice(0, max_length) + '...')
+
+def select_label_positions(x, y, is_index, limit):
+    """Positions of the comparator points nearest the index hospital(s) plus the most extreme ones"""
+    # Standardize both axes so distances weigh ALOS and readmission equally
+    z = np.column_stack([(x - x.mean()) / (x.std() or 1), (y - y.mean()) / (y.std() or 1)])
+    candidates = np.flatnonzero(~is_index)
+    if len(candidates) <= limit:
+        return candidates
+    
+    chosen = []
+    index_z = z[is_index]
+    if len(index_z):
+        distances = np.linalg.norm(z[candidates, None, :] - index_z[None, :, :], axis=2).min(axis=1)
+        chosen.append(candidates[np.argsort(distances, kind='stable')[:limit // 2]])
+    extremeness = np.linalg.norm(z[candidates], axis=1)
+    chosen.append(candidates[np.argsort(-extremeness, kind='stable')[:limit]])
+    # Nearest first, then fill up with the most extreme, without duplicates
+    ordered = list(dict.fromkeys(np.concatenate(chosen).tolist()))
+    return np.array(ordered[:limit], dtype=np.intp)
+
+@instrument("create_scatter_chart", rows="scatter_data")
+def create_scatter_chart(scatter_data, index_data, webgl_threshold=SCATTER_WEBGL_THRESHOLD,
+                         label_limit=SCATTER_LABEL_LIMIT):
+    """Create the Normalized ALOS vs Normalized Readmission Rate scatter plot"""
+    scatter_data = scatter_data.copy()
+    
+    # Truncate hospital names for labels
+    scatter_data['Label'] = truncate_labels(scatter_data['Hospital'])
+    
+    # Identify index hospital(s)
+    if len(index_data) == 1:
+        index_provider = index_data.iloc[0]['Provider']
+        scatter_data['Is_Index'] = scatter_data['Provider'] == index_provider
+    else:
+        # For IDN selection, mark all hospitals in the IDN
+        index_providers = index_data['Provider'].tolist()
+        scatter_data['Is_Index'] = scatter_data['Provider'].isin(index_providers)
+    
+    # Create the scatter plot
+    fig = go.Figure()
+    hovertemplate = '<b>%{customdata}</b><br>Normalized ALOS: %{x:.2f}<br>Normalized Readmission Rate: %{y:.1%}<extra></extra>'
+    
+    # Add comparator hospitals
+    comparator_points = scatter_data[~scatter_data['Is_Index']]
+    high_volume = len(comparator_points) > webgl_threshold
+    if not comparator_points.empty:
+        # Above the threshold draw with WebGL and leave names to the hover
+        scatter_trace = go.Scattergl if high_volume else go.Scatter
+        fig.add_trace(scatter_trace(
+            x=comparator_points['Normalized ALOS'],
+            y=comparator_points['Normalized Readmission Rate'],
+            mode='markers' if high_volume else 'markers+text',
+            marker=dict(
+                size=7 if high_volume else 10,
+                color='#60A5FA',  # Light blue
+                line=dict(width=1 if high_volume else 1.5, color='#2563EB'),  # Darker blue border
+                opacity=0.8
+            ),
+            text=None if high_volume else comparator_points['Label'],
+            customdata=comparator_points['Label'],
+            textposition="top center",
+            textfont=dict(size=9, color='#4B5563'),
+            name='Comparator Hospitals',
+            hovertemplate=hovertemplate
+        ))
+    
+    if high_volume and label_limit:
+        # Label only the points nearest the index hospital(s) and the most extreme ones
+        positions = select_label_positions(
+            scatter_data['Normalized ALOS'].to_numpy(dtype=float),
+            scatter_data['Normalized Readmission Rate'].to_numpy(dtype=float),
+            scatter_data['Is_Index'].to_numpy(dtype=bool),
+            label_limit
+        )
+        labelled = scatter_data.iloc[positions]
+        fig.add_trace(go.Scatter(
+            x=labelled['Normalized ALOS'],
+            y=labelled['Normalized Readmission Rate'],
+            mode='text',
+            text=labelled['Label'],
+            textposition="top center",
+            textfont=dict(size=9, color='#4B5563'),
+            hoverinfo='skip',
+            showlegend=False
+        ))
+    
+    # Add index hospital(s) - highlighted
+    index_points = scatter_data[scatter_data['Is_Index']]
+    if not index_points.empty:
+        fig.add_trace(go.Scatter(
+            x=index_points['Normalized ALOS'],
+            y=index_points['Normalized Readmission Rate'],
+            mode='markers+text',
+            marker=dict(
+                size=20,
+                color='#F59E0B',  # Amber
+                symbol='star',
+                line=dict(width=2, color='white')
+            ),
+            text=index_points['Label'],
+            customdata=index_points['Label'],
+            textposition="top center",
+            textfont=dict(size=12, color='#D97706', weight=600),
+            name='Selected Hospital(s)',
+            hovertemplate=hovertemplate
+        ))
+    
+    # Add reference lines for means
+    mean_alos = scatter_data['Normalized ALOS'].mean()
+    mean_readmit = scatter_data['Normalized Readmission Rate'].mean()
+    
+    # Add quadrant shading
+    fig.add_hrect(
+        y0=0, y1=mean_readmit,
+        x0=0, x1=mean_alos,
+        fillcolor="#10B981", opacity=0.1,
+        layer="below", line_width=0
+    )
+    
+    fig.add_hline(
+        y=mean_readmit,
+        line_dash="dot",
+        line_color="#6B7280",
+        opacity=0.7,
+        line_width=2,
+        annotation_text=f"Mean: {mean_readmit:.1%}",
+        annotation_position="right",
+        annotation_font=dict(color="#6B7280", size=11)
+    )
+    fig.add_vline(
+        x=mean_alos,
+        line_dash="dot",
+        line_color="#6B7280",
+        opacity=0.7,
+        line_width=2,
+        annotation_text=f"Mean: {mean_alos:.2f}",
+        annotation_position="top",
+        annotation_font=dict(color="#6B7280", size=11)
+    )
+    
+    # Update layout with enhanced styling
+    fig.update_layout(
+        title=dict(
+            text="<b>Normalized ALOS vs Normalized Readmission Rate</b><br><sup style='color: #6B7280'>Lower values indicate better performance when adjusted for case complexity</sup>",
+            font=dict(size=18)
+        ),
+        xaxis_title="<b>Normalized ALOS</b> (days/CMI)",
+        yaxis_title="<b>Normalized Readmission Rate</b> (%/CMI)",
+        height=650,
+        hovermode='closest',
+        showlegend=True,
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(family="sans-serif", size=12, color="#374151"),
+        xaxis=dict(
+            showgrid=True,
+            gridwidth=1,
+            gridcolor='#E5E7EB',
+            zeroline=False,
+            tickfont=dict(size=11)
+        ),
+        yaxis=dict(
+            showgrid=True,
+            gridwidth=1,
+            gridcolor='#E5E7EB',
+            zeroline=False,
+            tickfont=dict(size=11)
+        ),
+        legend=dict(
+            yanchor="top",
+            y=0.99,
+            xanchor="right",
+            x=0.99,
+            bgcolor='rgba(255,255,255,0.9)',
+            bordercolor='#E5E7EB',
+            borderwidth=1,
+            font=dict(size=12)
+        ),
+        margin=dict(l=60, r=40, t=80, b=60)
+    )
+    
+    # Format y-axis as percentage
+    fig.update_layout(yaxis_tickformat='.1%')
+    
+    return fig
+
+def compute_index_metrics(index_data):
+    """Metric values for a single hospital, or averages across an IDN's hospitals"""
+    if len(index_data) == 1:
+        row = index_data.iloc[0]
+        return {metric: row[metric] for metric in SUMMARY_METRICS}
+    return {metric: index_data[metric].mean() for metric in SUMMARY_METRICS}
+
+def compute_index_percentiles(index_data, comparator_data, percentile_engine=None, comparator_group=None):
+    """Percentile rank of the index hospital/IDN within the comparator group for each metric"""
+    percentiles = {}
+    for metric, index_value in compute_index_metrics(index_data).items():
+        distribution = get_metric_distribution(comparator_data, metric, percentile_engine, comparator_group)
+        percentiles[metric] = np.nan if pd.isna(index_value) else distribution.percentile_of(index_value)
+    return percentiles
+
+def compute_index_percentile_intervals(index_data, comparator_data, percentile_engine=None, comparator_group=None):
+    """Bootstrap (low, high) interval of the index percentile rank for each metric"""
+    return {
+        metric: get_percentile_interval(index_data, comparator_data, metric, percentile_engine, comparator_group)
+        for metric in SUMMARY_METRICS
+    }
+
+def compute_comparator_stats(comparator_data, percentile_engine=None, comparator_group=None):
+    """Mean, median and quartiles of each summary metric across the comparator group
+
+    Each quantile comes with "<stat> CI Low"/"<stat> CI High" bootstrap bounds.
+    """
+    stats = []
+    for metric in SUMMARY_METRICS:
+        distribution = get_metric_distribution(comparator_data, metric, percentile_engine, comparator_group)
+        if not distribution.empty:
+            metric_stats = {
+                'Metric': metric,
+                'Mean': distribution.mean,
+                'Median': distribution.median,
+                '25th Percentile': distribution.quantile(0.25),
+                '75th Percentile': distribution.quantile(0.75)
+            }
+            intervals = get_quantile_intervals(comparator_data, metric, percentile_engine, comparator_group)
+            for stat, q in QUANTILE_STATS.items():
+                metric_stats[f"{stat} CI Low"], metric_stats[f"{stat} CI High"] = intervals[q]
+            stats.append(metric_stats)
+    return stats
+
+@instrument("display_summary_stats", rows="comparator_data")
+def display_summary_stats(index_data, comparator_data, percentile_engine=None, comparator_group=None,
+                          comparator_stats=None):
     """Display summary statistics"""
     col1, col2 = st.columns(2)
     
@@ -598,17 +1180,21 @@ def display_summary_stats(index_data, comparator_data):
                 
                 # Metrics table
                 st.write("**Key Metrics**")
+                index_metrics = compute_index_metrics(index_data)
                 metrics_data = {}
-                if pd.notna(row['Readmission Rate']):
-                    metrics_data['Readmission Rate'] = f"{row['Readmission Rate']:.1%}"
-                if pd.notna(row['ALOS']):
-                    metrics_data['Average LOS'] = f"{row['ALOS']:.1f} days"
-                if pd.notna(row['CMI']):
-                    metrics_data['CMI'] = f"{row['CMI']:.2f}"
-                if pd.notna(row['Normalized Readmission Rate']):
-                    metrics_data['Normalized Readmission Rate'] = f"{row['Normalized Readmission Rate']:.1%}"
-                if pd.notna(row['Normalized ALOS']):
-                    metrics_data['Normalized ALOS'] = f"{row['Normalized ALOS']:.1f} days"
+                if pd.notna(index_metrics['Readmission Rate']):
+                    metrics_data['Readmission Rate'] = f"{index_metrics['Readmission Rate']:.1%}"
+                if pd.notna(index_metrics['ALOS']):
+                    metrics_data['Average LOS'] = f"{index_metrics['ALOS']:.1f} days"
+                if pd.notna(index_metrics['CMI']):
+                    metrics_data['CMI'] = f"{index_metrics['CMI']:.2f}"
+                if pd.notna(index_metrics['Normalized Readmission Rate']):
+                    metrics_data['Normalized Readmission Rate'] = f"{index_metrics['Normalized Readmission Rate']:.1%}"
+                if pd.notna(index_metrics['Normalized ALOS']):
+                    metrics_data['Normalized ALOS'] = f"{index_metrics['Normalized ALOS']:.1f} days"
+                for metric in RISK_ADJUSTED_METRICS:
+                    if pd.notna(index_metrics[metric]):
+                        metrics_data[metric] = f"{index_metrics[metric]:.2f}"
                 
                 if metrics_data:
                     metrics_df = pd.DataFrame([metrics_data]).T
@@ -621,8 +1207,7 @@ def display_summary_stats(index_data, comparator_data):
                 
                 st.write("**Aggregate Metrics**")
                 metrics_data = {}
-                for metric in ['Readmission Rate', 'ALOS', 'CMI', 'Normalized Readmission Rate', 'Normalized ALOS']:
-                    mean_val = index_data[metric].mean()
+                for metric, mean_val in compute_index_metrics(index_data).items():
                     if pd.notna(mean_val):
                         if 'Readmission Rate' in metric:
                             metrics_data[f"Avg {metric}"] = f"{mean_val:.1%}"
@@ -642,32 +1227,493 @@ def display_summary_stats(index_data, comparator_data):
         st.write("**Metrics Distribution**")
         dist_data = []
         
-        for metric in ['Readmission Rate', 'ALOS', 'CMI', 'Normalized Readmission Rate', 'Normalized ALOS']:
-            clean_data = comparator_data[metric].dropna()
-            if not clean_data.empty:
-                if 'Readmission Rate' in metric:
-                    dist_data.append({
-                        'Metric': metric,
-                        'Mean': f"{clean_data.mean():.1%}",
-                        'Median': f"{clean_data.median():.1%}",
-                        '25th Percentile': f"{clean_data.quantile(0.25):.1%}",
-                        '75th Percentile': f"{clean_data.quantile(0.75):.1%}"
-                    })
-                else:
-                    dist_data.append({
-                        'Metric': metric,
-                        'Mean': f"{clean_data.mean():.2f}",
-                        'Median': f"{clean_data.median():.2f}",
-                        '25th Percentile': f"{clean_data.quantile(0.25):.2f}",
-                        '75th Percentile': f"{clean_data.quantile(0.75):.2f}"
-                    })
+        if comparator_stats is None:
+            comparator_stats = compute_comparator_stats(comparator_data, percentile_engine, comparator_group)
+        for stats in comparator_stats:
+            if 'Readmission Rate' in stats['Metric']:
+                fmt = "{:.1%}"
+            else:
+                fmt = "{:.2f}"
+            row = {'Metric': stats['Metric'], 'Mean': fmt.format(stats['Mean'])}
+            for stat in QUANTILE_STATS:
+                row[stat] = fmt.format(stats[stat])
+                if f"{stat} CI Low" in stats:
+                    low, high = fmt.format(stats[f"{stat} CI Low"]), fmt.format(stats[f"{stat} CI High"])
+                    row[stat] += f" ({low}–{high})"
+            dist_data.append(row)
         
         if dist_data:
             dist_df = pd.DataFrame(dist_data)
             dist_df = dist_df.set_index('Metric')
             st.table(dist_df)
+            st.caption(f"Ranges in parentheses are {BOOTSTRAP_CONFIDENCE:.0%} bootstrap confidence intervals.")
 
-def main():
+def table_display_columns(data):
+    """Columns shown in the hospital data table, in display order"""
+    available_columns = ['Provider', 'Hospital', 'IDN', 'Number of Staffed Beds', 
+                       'Readmission Rate', 'ALOS', 'CMI', 'Normalized Readmission Rate', 'Normalized ALOS'] + \
+                        RISK_ADJUSTED_METRICS
+    
+    # Add location columns if available
+    if 'City/State' in data.columns:
+        available_columns.insert(3, 'City/State')
+    elif 'City' in data.columns and 'State' in data.columns:
+        available_columns.insert(3, 'City')
+        available_columns.insert(4, 'State')
+    
+    # Only include columns that exist in the data
+    return [col for col in available_columns if col in data.columns]
+
+@instrument("format_table_page", rows="page_data")
+def format_table_page(page_data):
+    """Scale rate columns to percent and build number formats, keeping numeric dtypes"""
+    page_data = page_data.copy()
+    column_config = {}
+    for col in ['Readmission Rate', 'Normalized Readmission Rate']:
+        if col in page_data.columns:
+            page_data[col] = page_data[col] * 100
+            column_config[col] = st.column_config.NumberColumn(col, format="%.1f%%")
+    
+    for col in ['ALOS', 'CMI', 'Normalized ALOS'] + RISK_ADJUSTED_METRICS:
+        if col in page_data.columns:
+            column_config[col] = st.column_config.NumberColumn(col, format="%.2f")
+    
+    if 'Provider' in page_data.columns:
+        column_config['Provider'] = st.column_config.NumberColumn('Provider', format="%d")
+    return page_data, column_config
+
+@st.fragment
+@profiled("data_table")
+def display_data_table(display_data):
+    """Display the hospital data a page at a time, sorted server-side; paging reruns only this"""
+    display_columns = table_display_columns(display_data)
+    
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+    with col1:
+        sort_column = st.selectbox("Sort by:", display_columns, index=display_columns.index('Hospital'))
+    with col2:
+        descending = st.checkbox("Descending", value=False)
+    with col3:
+        page_size = st.selectbox("Rows per page:", TABLE_PAGE_SIZES)
+    
+    n_rows = len(display_data)
+    n_pages = max(1, -(-n_rows // page_size))
+    with col4:
+        page = st.number_input("Page:", min_value=1, max_value=n_pages, value=1, step=1)
+    
+    # Sort the row order over the full set, then slice out only the visible page
+    order = (display_data[sort_column].reset_index(drop=True)
+             .sort_values(ascending=not descending, na_position='last', kind='stable').index)
+    start = (min(page, n_pages) - 1) * page_size
+    page_data = display_data[display_columns].take(order[start:start + page_size])
+    
+    page_data, column_config = format_table_page(page_data)
+    st.dataframe(page_data, hide_index=True, use_container_width=True, column_config=column_config)
+    st.caption(f"Showing rows {start + 1 if n_rows else 0:,}–{start + len(page_data):,} of {n_rows:,}")
+
+@st.fragment
+@profiled("summary")
+def display_summary_section(index_data, comparator_data, comparator_group, result_key):
+    """Summary statistics for the index hospital(s) against the comparator group"""
+    result_cache = load_result_cache()
+    percentile_engine = load_percentile_engine()
+    
+    # Summary statistics with enhanced header
+    st.markdown("""
+    <h2 style='color: #1F2937; border-bottom: 3px solid #1E88E5; padding-bottom: 0.5rem; margin-bottom: 1.5rem;'>
+        📊 Summary Statistics
+    </h2>
+    """, unsafe_allow_html=True)
+    comparator_stats = result_cache.get_or_compute(
+        result_key._replace(kind="comparator_stats"),
+        lambda: compute_comparator_stats(comparator_data, percentile_engine, comparator_group)
+    )
+    display_summary_stats(index_data, comparator_data, percentile_engine, comparator_group, comparator_stats)
+
+@st.fragment
+@profiled("metric_charts")
+def display_metric_charts(index_data, comparator_data, comparator_group, result_key):
+    """Metric selector with its distribution and comparison charts; changing the metric reruns only this"""
+    result_cache = load_result_cache()
+    percentile_engine = load_percentile_engine()
+    
+    # Metric selection with enhanced header
+    st.markdown("""
+    <h2 style='color: #1F2937; border-bottom: 3px solid #1E88E5; padding-bottom: 0.5rem; margin-bottom: 1.5rem;'>
+        📈 Analysis & Charts
+    </h2>
+    """, unsafe_allow_html=True)
+    col1, col2 = st.columns([1, 2])
+    
+    with col1:
+        selected_metric = st.selectbox(
+            "Select Metric:",
+            SUMMARY_METRICS
+        )
+    with col2:
+        bin_label = st.selectbox(
+            "Histogram bins:",
+            list(HISTOGRAM_BIN_OPTIONS),
+            help="Fixed edges use the all-hospitals bins so distributions line up across comparator groups"
+        )
+        bin_method = HISTOGRAM_BIN_OPTIONS[bin_label]
+    
+    # Charts
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.subheader("📊 Distribution")
+        with st.spinner("Generating distribution chart..."):
+            title_suffix = f"{len(comparator_data)} hospitals"
+            chart = cached_figure(
+                result_cache,
+                result_key._replace(kind=f"metric_chart:{bin_method}", metric=selected_metric),
+                lambda: create_metric_chart(comparator_data, selected_metric, title_suffix,
+                                            percentile_engine, comparator_group, bin_method)
+            )
+            if chart:
+                st.plotly_chart(chart, use_container_width=True)
+    
+    with col2:
+        st.subheader("📈 Comparison")
+        with st.spinner("Generating comparison chart..."):
+            comp_chart = cached_figure(
+                result_cache,
+                result_key._replace(kind="comparison_chart", metric=selected_metric),
+                lambda: create_comparison_chart(index_data, comparator_data, selected_metric,
+                                                percentile_engine, comparator_group)
+            )
+            if comp_chart:
+                st.plotly_chart(comp_chart, use_container_width=True)
+
+@st.fragment
+@profiled("funnel_plot")
+def display_funnel_plot(index_data, comparator_data, comparator_group, result_key):
+    """Readmission funnel plot of the comparator group; switching limit methods reruns only this"""
+    df = load_data()
+    result_cache = load_result_cache()
+    
+    st.markdown("""
+    <h2 style='color: #1F2937; border-bottom: 3px solid #1E88E5; padding-bottom: 0.5rem; margin-bottom: 1.5rem;'>
+        🔻 Readmission Funnel Plot
+    </h2>
+    """, unsafe_allow_html=True)
+    method_label = st.radio(
+        "Control limits:",
+        list(FUNNEL_METHOD_OPTIONS),
+        horizontal=True,
+        help="Exact binomial limits stay accurate for low-volume hospitals; the normal approximation is the classic funnel"
+    )
+    method = FUNNEL_METHOD_OPTIONS[method_label]
+    
+    funnel = load_funnel_limits(comparator_group, method)
+    if not len(funnel):
+        st.warning("No comparator hospitals have both a readmission rate and Medicare claims.")
+        return
+    hospitals = funnel_hospitals(df, funnel)
+    
+    fig = cached_figure(
+        result_cache,
+        result_key._replace(kind=f"funnel_chart:{method}"),
+        lambda: create_funnel_chart(funnel, hospitals, index_data)
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    
+    counts = funnel.flag_counts()
+    outer = level_label(funnel.levels[-1])
+    above, below = counts.get(f"Above {outer}", 0), counts.get(f"Below {outer}", 0)
+    st.caption(f"{len(funnel)} of {len(comparator_data)} comparator hospitals have a readmission rate and claims. "
+               f"{above} lie above and {below} below the {outer} limits. Points within the funnel differ from "
+               f"the group rate by no more than chance at their volume.")
+    
+    outliers = hospitals[hospitals['Funnel Flag'] != WITHIN_LIMITS]
+    if not outliers.empty:
+        with st.expander(f"🚩 Hospitals outside the control limits ({len(outliers)})"):
+            outliers = outliers.sort_values(['Funnel Flag', 'Readmission Rate'], ascending=[True, False])
+            st.dataframe(
+                outliers.assign(**{'Readmission Rate': outliers['Readmission Rate'] * 100}),
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    'Provider': st.column_config.NumberColumn('Provider', format="%d"),
+                    'Readmission Rate': st.column_config.NumberColumn('Readmission Rate', format="%.1f%%"),
+                    'Medicare Total Claims': st.column_config.NumberColumn('Medicare Total Claims', format="%d"),
+                }
+            )
+
+@st.fragment
+@profiled("peer_comparison")
+def display_peer_comparison(index_data, comparator_data, comparator_group, result_key):
+    """Procedure-volume peer filter with the scatter plot, data table and export it drives"""
+    df = load_data()
+    result_cache = load_result_cache()
+    
+    # Data table with enhanced header
+    st.markdown("""
+    <h2 style='color: #1F2937; border-bottom: 3px solid #1E88E5; padding-bottom: 0.5rem; margin-bottom: 1.5rem;'>
+        📋 Hospital Data
+    </h2>
+    """, unsafe_allow_html=True)
+    
+    # Filter options
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        show_all = st.checkbox("Show all comparator hospitals", value=False)
+    
+    # Initialize display_data
+    display_data = comparator_data
+    display_key = result_key
+    
+    # Show percentage slider when "show all" is unchecked
+    if not show_all and not index_data.empty:
+        # Get index Medicare Total Claims
+        if len(index_data) == 1:
+            index_claims = index_data.iloc[0]['Medicare Total Claims']
+        else:
+            # For IDN, use average Medicare Total Claims
+            index_claims = index_data['Medicare Total Claims'].mean()
+        
+        # Rows shown for every tolerance (window peers plus the index hospitals) from one vectorized range query
+        claims_index = load_claims_index(comparator_group)
+        index_positions = df.index.get_indexer(index_data.index)
+        peer_counts = dict(zip(CLAIMS_PERCENT_OPTIONS,
+                               claims_index.peer_counts(index_claims, CLAIMS_PERCENT_OPTIONS, index_positions)))
+        
+        with col2:
+            claims_percent = st.select_slider(
+                "Total procedures similarity (%)",
+                options=CLAIMS_PERCENT_OPTIONS,
+                value=5,
+                format_func=lambda percent: f"±{percent}% · {peer_counts[percent]} hospitals",
+                help="Show hospitals within this percentage of the index hospital's total procedures (Medicare Total Claims)"
+            )
+        
+        # Calculate claims range based on percentage
+        claims_tolerance = index_claims * (claims_percent / 100)
+        min_claims_threshold = index_claims - claims_tolerance
+        max_claims_threshold = index_claims + claims_tolerance
+        
+        # Filter display data to hospitals within claims range
+        peer_positions = claims_index.window(min_claims_threshold, max_claims_threshold)
+        
+        # Also ensure index hospital(s) are included, by row position rather than row deduplication
+        peer_positions = peer_positions[~np.isin(peer_positions, index_positions)]
+        display_data = add_risk_adjusted_metrics(df.take(np.concatenate([index_positions, peer_positions])),
+                                                 comparator_group)
+        display_key = result_key._replace(claims_tolerance=claims_percent)
+    
+    # Scatter plot - Normalized ALOS vs Normalized Readmission Rate
+    st.header("📊 Normalized Performance Comparison")
+    
+    # Create scatter plot data from display_data (already filtered)
+    scatter_data = display_data[['Provider', 'Hospital', 'Normalized ALOS', 'Normalized Readmission Rate']].copy()
+    scatter_data = scatter_data.dropna(subset=['Normalized ALOS', 'Normalized Readmission Rate'])
+    
+    # Add info about what's being displayed
+    if not show_all and not index_data.empty:
+        st.info(f"📊 Scatter plot and table show hospitals within ±{claims_percent}% of index hospital total procedures "
+               f"({min_claims_threshold:.0f} - {max_claims_threshold:.0f} procedures). "
+               f"Displaying {len(scatter_data)} hospitals with complete normalized data.")
+    elif show_all:
+        st.info(f"📊 Showing all {len(scatter_data)} comparator hospitals with complete normalized data.")
+    
+    if not scatter_data.empty:
+        fig = cached_figure(
+            result_cache,
+            display_key._replace(kind="scatter_chart"),
+            lambda: create_scatter_chart(scatter_data, index_data)
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        
+        # Add performance quadrant explanation
+        with st.expander("📊 Understanding the Performance Quadrants"):
+            st.markdown("""
+            The scatter plot is divided into four quadrants by the mean values:
+            
+            - **Lower-Left (Best)**: Below average normalized readmission rate AND below average normalized length of stay
+            - **Lower-Right**: Below average normalized readmission rate BUT above average normalized length of stay
+            - **Upper-Left**: Above average normalized readmission rate BUT below average normalized length of stay
+            - **Upper-Right (Worst)**: Above average normalized readmission rate AND above average normalized length of stay
+            
+            **Note**: These are normalized metrics (divided by CMI), so they account for case complexity. 
+            Lower values generally indicate better performance.
+            """)
+    else:
+        st.warning("Insufficient data for scatter plot. Both Normalized ALOS and Normalized Readmission Rate data are required.")
+    
+    display_data_table(display_data)
+    display_export(display_data, display_key)
+
+@st.fragment
+@profiled("export_section")
+def display_export(display_data, display_key):
+    """Export format selection and download buttons for the displayed or complete data"""
+    # Export functionality with enhanced header
+    st.markdown("""
+    <h2 style='color: #1F2937; border-bottom: 3px solid #1E88E5; padding-bottom: 0.5rem; margin-bottom: 1.5rem;'>
+        💾 Export Data
+    </h2>
+    """, unsafe_allow_html=True)
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        export_format = st.selectbox("Format:", list(EXPORT_FORMATS))
+        mime = EXPORT_FORMATS[export_format].mime
+    
+    # Bytes are cached per dataset version and filter, so repeat downloads are free
+    with col2:
+        if st.button(f"Download Filtered Data as {export_format}"):
+            st.download_button(
+                label=f"Download {export_format}",
+                data=cached_export(display_key, display_data, export_format),
+                file_name=export_file_name("hospital_analysis", export_format),
+                mime=mime
+            )
+    
+    with col3:
+        if st.button(f"Download All Data as {export_format}"):
+            st.download_button(
+                label=f"Download All Data {export_format}",
+                data=cached_export(ResultKey(load_dataset().version, None, None, None, None, None, None),
+                                   load_data(), export_format),
+                file_name=export_file_name("hospital_data_complete", export_format),
+                mime=mime
+            )
+
+def display_league_table(league):
+    """Display every hospital's percentile ranks as a sortable table"""
+    st.markdown("""
+    <h2 style='color: #1F2937; border-bottom: 3px solid #1E88E5; padding-bottom: 0.5rem; margin-bottom: 1.5rem;'>
+        🏆 League Table
+    </h2>
+    """, unsafe_allow_html=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        comparator = st.selectbox("Rank against:", list(LEAGUE_COMPARATORS))
+    with col2:
+        sort_metric = st.selectbox("Sort by:", SUMMARY_METRICS)
+    
+    columns = ['Provider', 'Hospital', 'IDN', 'State']
+    column_config = {}
+    for metric in SUMMARY_METRICS:
+        percentile_column = league_table_column(metric, comparator)
+        columns += [metric, percentile_column]
+        column_config[metric] = st.column_config.NumberColumn(
+            metric, format="%.3f" if 'Readmission Rate' in metric else "%.2f"
+        )
+        column_config[percentile_column] = st.column_config.NumberColumn(f"{metric} %ile", format="%.0f")
+    
+    table = league[columns].sort_values(league_table_column(sort_metric, comparator), na_position='last')
+    
+    st.caption(f"Percentile = share of hospitals in the comparator group ({comparator}) with a lower value. "
+               "Lower is better for readmission and length-of-stay metrics. Click a column header to re-sort.")
+    st.dataframe(table, hide_index=True, use_container_width=True, column_config=column_config)
+    
+    league_key = ResultKey(load_dataset().version, "League Table", None, comparator, sort_metric, None, None)
+    st.download_button(
+        label="Download League Table as CSV",
+        data=cached_export(league_key, table, "CSV"),
+        file_name="hospital_league_table.csv",
+        mime="text/csv"
+    )
+
+def display_debug_panel():
+    """Opt-in sidebar panel with per-stage timings of recent reruns and cache statistics"""
+    st.sidebar.markdown("---")
+    if not st.sidebar.checkbox("🛠️ Show performance panel", key="debug_panel"):
+        return
+    st.sidebar.checkbox("Trace peak memory", key="trace_memory",
+                        help="Records peak allocations per stage; tracing slows reruns, so timings run high")
+    
+    history = list(st.session_state.get("rerun_profiles", ()))
+    with st.sidebar.expander("⏱️ Performance", expanded=True):
+        if not history:
+            st.caption("Timings appear from the next rerun.")
+        else:
+            latest = history[-1]
+            peak = "" if latest.peak_bytes is None else f", peak {latest.peak_bytes / 1024 ** 2:,.1f} MB traced"
+            st.caption(f"Last rerun ({latest.name}): {latest.wall_ms:,.0f} ms{peak}")
+            stages = latest.stage_frame()
+            stages['stage'] = stages['depth'].map(lambda depth: "· " * depth) + stages['stage']
+            stages['peak MB'] = stages['peak_bytes'] / 1024 ** 2
+            st.dataframe(
+                stages[['stage', 'wall_ms', 'rows', 'peak MB']],
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    'wall_ms': st.column_config.NumberColumn("ms", format="%.1f"),
+                    'rows': st.column_config.NumberColumn("rows", format="%d"),
+                    'peak MB': st.column_config.NumberColumn("peak MB", format="%.2f"),
+                }
+            )
+            percentiles = latency_percentiles(history)
+            st.caption(f"Rerun latency over the last {len(history)} reruns: "
+                       f"p50 {percentiles['p50']:,.0f} ms · p95 {percentiles['p95']:,.0f} ms. "
+                       "Fragment-only reruns are listed on the next full rerun.")
+        
+        for label, cache in (("Result cache", load_result_cache()), ("Export cache", load_export_cache())):
+            stats = cache.stats()
+            st.caption(f"{label}: {stats['entries']} entries, {stats['bytes'] / 1024 ** 2:,.1f} of "
+                       f"{stats['max_bytes'] / 1024 ** 2:,.0f} MB, hit rate {stats['hit_rate']:.0%}, "
+                       f"{stats['evictions']} evictions")
+        dataset = load_dataset()
+        if dataset is not None:
+            footprint = dataset.footprint()
+            st.caption(f"Dataset: {footprint['rows']:,} rows × {footprint['columns']} columns, "
+                       f"{footprint['total_bytes'] / 1024 ** 2:,.1f} MB")
+        stats = load_partition_store().stats()
+        loaded = ", ".join(os.path.basename(path) for path in reversed(stats['loaded']))
+        st.caption(f"Loaded partitions: {len(stats['loaded'])} of {stats['max_partitions']} "
+                   f"({loaded}), {stats['loads']} loads, {stats['evictions']} evictions")
+
+def display_footer():
+    """Display the copyright footer"""
+    st.markdown("<br><br>", unsafe_allow_html=True)
+    st.markdown("""
+    <div style='background: linear-gradient(to right, #F3F4F6, #E5E7EB); 
+                padding: 2rem 0; 
+                margin: 0 -1rem; 
+                text-align: center;
+                border-top: 2px solid #E5E7EB;'>
+        <img src="data:image/png;base64,{}" width="80" style="margin-bottom: 0.5rem;">
+        <p style='color: #4B5563; font-size: 0.9rem; margin: 0;'>
+            Copyright © {} tauSpan Technologies LLC. All rights reserved.
+        </p>
+        <p style='color: #6B7280; font-size: 0.8rem; margin-top: 0.5rem;'>
+            Built with ❤️ for healthcare analytics
+        </p>
+    </div>
+    """.format(get_base64_image("tauspan_logo.png"), datetime.now().year), unsafe_allow_html=True)
+
+def select_partition(catalog):
+    """Sidebar DRG family and year selectors; the chosen partition's file is used for the session"""
+    default = catalog.default_key()
+    if default is None:
+        return None
+    
+    st.sidebar.markdown("### 🗂️ Dataset")
+    families = catalog.drg_families()
+    drg_family = st.sidebar.selectbox(
+        "DRG family:",
+        families,
+        index=families.index(default.drg_family),
+        format_func=drg_family_label
+    )
+    # Years offered for the chosen family, newest first
+    years = [year for year in catalog.years() if PartitionKey(year, drg_family) in catalog]
+    year = st.sidebar.selectbox("Year:", years)
+    
+    key = PartitionKey(year, drg_family)
+    st.session_state.data_file = catalog.path(key)
+    st.sidebar.markdown("---")
+    return key
+
+@profiled("page")
+def display_page():
+    """Render the selected view"""
+    configure_page()
+    
     # Add logo in sidebar with centered styling and reduced padding
     logo_html = f"""
     <style>
@@ -682,13 +1728,19 @@ def main():
     st.sidebar.markdown(logo_html, unsafe_allow_html=True)
     st.sidebar.markdown("---")
     
+    partition_key = select_partition(load_partition_catalog())
+    if partition_key is None:
+        st.error("No hospital data files found. Add workbooks named like "
+                 "'Readmission CMI-LOS-DRG 329-334 2022.xlsx' or set HOSPITAL_DATA_DIR.")
+        st.stop()
+    
     # Main title with enhanced styling
-    st.markdown("""
+    st.markdown(f"""
     <h1 style='text-align: center; color: #1F2937; margin-bottom: 0;'>
         🏥 Hospital Outcomes Analyzer
     </h1>
     <p style='text-align: center; color: #6B7280; font-size: 1.1rem; margin-top: 0.5rem;'>
-        DRG 329-334 Intestinal Resection Procedures • 2022 Analysis
+        {drg_family_label(partition_key.drg_family)} • {partition_key.year} Analysis
     </p>
     """, unsafe_allow_html=True)
     
@@ -705,18 +1757,37 @@ def main():
         so normalizing helps identify true performance differences.
         
         **Lower normalized values typically indicate better performance** when adjusted for case complexity.
+        
+        **Risk-adjusted O/E ratios** compare each hospital's observed readmission rate and ALOS with the value
+        expected from a regression on CMI, staffed beds, discharge volume and payor mix, fitted within the
+        selected comparator group (groups with fewer than 30 hospitals use the all-hospitals fit).
+        An O/E below 1.0 means better than expected.
         """)
     
     # Load data
     df = load_data()
     if df is None:
         st.stop()
+    comparator_index = load_comparator_index()
+    selector_catalog = load_selector_catalog()
     
     # Show success toast on first load
     if 'data_loaded' not in st.session_state:
         st.session_state.data_loaded = True
         st.toast("✅ Hospital data loaded successfully!", icon='✅')
     
+    # View selection
+    view_mode = st.sidebar.radio(
+        "View:",
+        ["Hospital Analysis", "League Table"],
+        horizontal=True
+    )
+    
+    if view_mode == "League Table":
+        display_league_table(load_league_table())
+        display_footer()
+        return
+    
     # Sidebar for selections with icon
     st.sidebar.markdown("### 🏥 Hospital Selection")
     
@@ -732,26 +1803,23 @@ def main():
     
     if selection_mode == "Individual Hospital":
         # Hospital selection
-        hospital_options = [get_hospital_display_name(row) for _, row in df.iterrows() if pd.notna(row['Hospital'])]
         selected_hospital = st.sidebar.selectbox(
             "Choose Hospital:",
-            [""] + sorted(hospital_options)
+            [""] + selector_catalog.hospital_labels
         )
         
         if selected_hospital:
-            provider_id = selected_hospital.split(' - ')[0]
-            index_data = df[df['Provider'].astype(str) == provider_id]
+            index_data = selector_catalog.hospital_rows(df, selected_hospital)
     
     else:
         # IDN selection
-        idn_options = df['IDN'].dropna().unique()
         selected_idn = st.sidebar.selectbox(
             "Choose IDN:",
-            [""] + sorted(idn_options)
+            [""] + selector_catalog.idn_options
         )
         
         if selected_idn:
-            index_data = df[df['IDN'] == selected_idn]
+            index_data = comparator_index.take(df, "IDN", selected_idn)
     
     # Comparator selection with icon
     st.sidebar.markdown("### 📊 Comparison Group")
@@ -760,331 +1828,49 @@ def main():
     if selection_mode == "IDN (Health System)":
         comparison_options = ["All Hospitals", "Same IDN"]
     else:
-        comparison_options = ["All Hospitals", "Same IDN", "Same State"]
+        comparison_options = ["All Hospitals", "Same IDN", "Same State", "Most Similar Hospitals"]
     
     comparator_type = st.sidebar.radio(
         "Compare to:",
         comparison_options
     )
     
+    similarity = None
+    comparator_label = comparator_type
+    if comparator_type == "Most Similar Hospitals":
+        preset = st.sidebar.selectbox(
+            "Similarity weighting:",
+            list(SIMILARITY_PRESETS),
+            index=list(SIMILARITY_PRESETS).index(DEFAULT_SIMILARITY_PRESET),
+            help="Nearest hospitals by staffed beds, Medicare claims, CMI and payor mix; "
+                 "presets weight some features more heavily"
+        )
+        k = st.sidebar.slider("Number of similar hospitals:", 10, 200, DEFAULT_NEIGHBOR_COUNT, step=5)
+        similarity = (preset, k)
+        comparator_label = f"{comparator_type} ({preset}, {k})"
+    
     # Get comparator data
-    comparator_data = filter_comparator_data(df, index_data, comparator_type, selected_hospital, selected_idn)
+    comparator_group = resolve_comparator_group(index_data, comparator_type, selected_hospital, selected_idn,
+                                                comparator_index, similarity)
+    comparator_data = filter_comparator_data(df, index_data, comparator_type, selected_hospital, selected_idn,
+                                             comparator_index, similarity)
+    if similarity is not None and not index_data.empty and comparator_group is None:
+        st.sidebar.warning("This hospital is missing similarity features; comparing to all hospitals.")
+    if not index_data.empty:
+        # Expected values come from the comparator group's own risk model
+        index_data = add_risk_adjusted_metrics(index_data, comparator_group)
+        comparator_data = add_risk_adjusted_metrics(comparator_data, comparator_group)
+    
+    # Key for memoized results; each use fills in kind/metric/claims tolerance
+    result_key = ResultKey(load_dataset().version, selection_mode, selected_hospital or selected_idn,
+                           comparator_label, None, None, None)
     
     # Main content
     if not index_data.empty:
-        # Summary statistics with enhanced header
-        st.markdown("""
-        <h2 style='color: #1F2937; border-bottom: 3px solid #1E88E5; padding-bottom: 0.5rem; margin-bottom: 1.5rem;'>
-            📊 Summary Statistics
-        </h2>
-        """, unsafe_allow_html=True)
-        display_summary_stats(index_data, comparator_data)
-        
-        # Metric selection with enhanced header
-        st.markdown("""
-        <h2 style='color: #1F2937; border-bottom: 3px solid #1E88E5; padding-bottom: 0.5rem; margin-bottom: 1.5rem;'>
-            📈 Analysis & Charts
-        </h2>
-        """, unsafe_allow_html=True)
-        col1, col2 = st.columns([1, 2])
-        
-        with col1:
-            selected_metric = st.selectbox(
-                "Select Metric:",
-                ["Readmission Rate", "ALOS", "CMI", "Normalized Readmission Rate", "Normalized ALOS"]
-            )
-        
-        # Charts
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("📊 Distribution")
-            with st.spinner("Generating distribution chart..."):
-                title_suffix = f"{len(comparator_data)} hospitals"
-                chart = create_metric_chart(comparator_data, selected_metric, title_suffix)
-                if chart:
-                    st.plotly_chart(chart, use_container_width=True)
-        
-        with col2:
-            st.subheader("📈 Comparison")
-            with st.spinner("Generating comparison chart..."):
-                comp_chart = create_comparison_chart(index_data, comparator_data, selected_metric)
-                if comp_chart:
-                    st.plotly_chart(comp_chart, use_container_width=True)
-        
-        # Data table with enhanced header
-        st.markdown("""
-        <h2 style='color: #1F2937; border-bottom: 3px solid #1E88E5; padding-bottom: 0.5rem; margin-bottom: 1.5rem;'>
-            📋 Hospital Data
-        </h2>
-        """, unsafe_allow_html=True)
-        
-        # Filter options
-        col1, col2 = st.columns([1, 2])
-        with col1:
-            show_all = st.checkbox("Show all comparator hospitals", value=False)
-        
-        # Initialize display_data
-        display_data = comparator_data.copy()
-        
-        # Show percentage slider when "show all" is unchecked
-        if not show_all and not index_data.empty:
-            with col2:
-                claims_percent = st.slider(
-                    "Total procedures similarity (%)",
-                    min_value=1,
-                    max_value=75,
-                    value=5,
-                    step=1,
-                    help="Show hospitals within this percentage of the index hospital's total procedures (Medicare Total Claims)"
-                )
-            
-            # Get index Medicare Total Claims
-            if len(index_data) == 1:
-                index_claims = index_data.iloc[0]['Medicare Total Claims']
-            else:
-                # For IDN, use average Medicare Total Claims
-                index_claims = index_data['Medicare Total Claims'].mean()
-            
-            # Calculate claims range based on percentage
-            claims_tolerance = index_claims * (claims_percent / 100)
-            min_claims_threshold = index_claims - claims_tolerance
-            max_claims_threshold = index_claims + claims_tolerance
-            
-            # Filter display data to hospitals within claims range
-            with st.spinner(f"Filtering hospitals within ±{claims_percent}% total procedures..."):
-                display_data = display_data[
-                    (display_data['Medicare Total Claims'] >= min_claims_threshold) &
-                    (display_data['Medicare Total Claims'] <= max_claims_threshold)
-                ]
-                
-                # Also ensure index hospital(s) are included
-                display_data = pd.concat([index_data, display_data]).drop_duplicates()
-        
-        # Scatter plot - Normalized ALOS vs Normalized Readmission Rate
-        st.header("📊 Normalized Performance Comparison")
-        
-        # Create scatter plot data from display_data (already filtered)
-        scatter_data = display_data[['Provider', 'Hospital', 'Normalized ALOS', 'Normalized Readmission Rate']].copy()
-        scatter_data = scatter_data.dropna(subset=['Normalized ALOS', 'Normalized Readmission Rate'])
-        
-        # Add info about what's being displayed
-        if not show_all and not index_data.empty:
-            st.info(f"📊 Scatter plot and table show hospitals within ±{claims_percent}% of index hospital total procedures "
-                   f"({min_claims_threshold:.0f} - {max_claims_threshold:.0f} procedures). "
-                   f"Displaying {len(scatter_data)} hospitals with complete normalized data.")
-        elif show_all:
-            st.info(f"📊 Showing all {len(scatter_data)} comparator hospitals with complete normalized data.")
-        
-        if not scatter_data.empty:
-            # Truncate hospital names for labels
-            scatter_data['Label'] = scatter_data['Hospital'].apply(lambda x: x[:20] + '...' if len(str(x)) > 20 else str(x))
-            
-            # Identify index hospital(s)
-            if len(index_data) == 1:
-                index_provider = index_data.iloc[0]['Provider']
-                scatter_data['Is_Index'] = scatter_data['Provider'] == index_provider
-            else:
-                # For IDN selection, mark all hospitals in the IDN
-                index_providers = index_data['Provider'].tolist()
-                scatter_data['Is_Index'] = scatter_data['Provider'].isin(index_providers)
-            
-            # Create the scatter plot
-            fig = go.Figure()
-            
-            # Add comparator hospitals
-            comparator_points = scatter_data[~scatter_data['Is_Index']]
-            if not comparator_points.empty:
-                fig.add_trace(go.Scatter(
-                    x=comparator_points['Normalized ALOS'],
-                    y=comparator_points['Normalized Readmission Rate'],
-                    mode='markers+text',
-                    marker=dict(
-                        size=10,
-                        color='#60A5FA',  # Light blue
-                        line=dict(width=1.5, color='#2563EB'),  # Darker blue border
-                        opacity=0.8
-                    ),
-                    text=comparator_points['Label'],
-                    textposition="top center",
-                    textfont=dict(size=9, color='#4B5563'),
-                    name='Comparator Hospitals',
-                    hovertemplate='<b>%{text}</b><br>Normalized ALOS: %{x:.2f}<br>Normalized Readmission Rate: %{y:.1%}<extra></extra>'
-                ))
-            
-            # Add index hospital(s) - highlighted
-            index_points = scatter_data[scatter_data['Is_Index']]
-            if not index_points.empty:
-                fig.add_trace(go.Scatter(
-                    x=index_points['Normalized ALOS'],
-                    y=index_points['Normalized Readmission Rate'],
-                    mode='markers+text',
-                    marker=dict(
-                        size=20,
-                        color='#F59E0B',  # Amber
-                        symbol='star',
-                        line=dict(width=2, color='white')
-                    ),
-                    text=index_points['Label'],
-                    textposition="top center",
-                    textfont=dict(size=12, color='#D97706', weight=600),
-                    name='Selected Hospital(s)',
-                    hovertemplate='<b>%{text}</b><br>Normalized ALOS: %{x:.2f}<br>Normalized Readmission Rate: %{y:.1%}<extra></extra>'
-                ))
-            
-            # Add reference lines for means
-            mean_alos = scatter_data['Normalized ALOS'].mean()
-            mean_readmit = scatter_data['Normalized Readmission Rate'].mean()
-            
-            # Add quadrant shading
-            fig.add_hrect(
-                y0=0, y1=mean_readmit,
-                x0=0, x1=mean_alos,
-                fillcolor="#10B981", opacity=0.1,
-                layer="below", line_width=0
-            )
-            
-            fig.add_hline(
-                y=mean_readmit,
-                line_dash="dot",
-                line_color="#6B7280",
-                opacity=0.7,
-                line_width=2,
-                annotation_text=f"Mean: {mean_readmit:.1%}",
-                annotation_position="right",
-                annotation_font=dict(color="#6B7280", size=11)
-            )
-            fig.add_vline(
-                x=mean_alos,
-                line_dash="dot",
-                line_color="#6B7280",
-                opacity=0.7,
-                line_width=2,
-                annotation_text=f"Mean: {mean_alos:.2f}",
-                annotation_position="top",
-                annotation_font=dict(color="#6B7280", size=11)
-            )
-            
-            # Update layout with enhanced styling
-            fig.update_layout(
-                title=dict(
-                    text="<b>Normalized ALOS vs Normalized Readmission Rate</b><br><sup style='color: #6B7280'>Lower values indicate better performance when adjusted for case complexity</sup>",
-                    font=dict(size=18)
-                ),
-                xaxis_title="<b>Normalized ALOS</b> (days/CMI)",
-                yaxis_title="<b>Normalized Readmission Rate</b> (%/CMI)",
-                height=650,
-                hovermode='closest',
-                showlegend=True,
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font=dict(family="sans-serif", size=12, color="#374151"),
-                xaxis=dict(
-                    showgrid=True,
-                    gridwidth=1,
-                    gridcolor='#E5E7EB',
-                    zeroline=False,
-                    tickfont=dict(size=11)
-                ),
-                yaxis=dict(
-                    showgrid=True,
-                    gridwidth=1,
-                    gridcolor='#E5E7EB',
-                    zeroline=False,
-                    tickfont=dict(size=11)
-                ),
-                legend=dict(
-                    yanchor="top",
-                    y=0.99,
-                    xanchor="right",
-                    x=0.99,
-                    bgcolor='rgba(255,255,255,0.9)',
-                    bordercolor='#E5E7EB',
-                    borderwidth=1,
-                    font=dict(size=12)
-                ),
-                margin=dict(l=60, r=40, t=80, b=60)
-            )
-            
-            # Format y-axis as percentage
-            fig.update_layout(yaxis_tickformat='.1%')
-            
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Add performance quadrant explanation
-            with st.expander("📊 Understanding the Performance Quadrants"):
-                st.markdown("""
-                The scatter plot is divided into four quadrants by the mean values:
-                
-                - **Lower-Left (Best)**: Below average normalized readmission rate AND below average normalized length of stay
-                - **Lower-Right**: Below average normalized readmission rate BUT above average normalized length of stay
-                - **Upper-Left**: Above average normalized readmission rate BUT below average normalized length of stay
-                - **Upper-Right (Worst)**: Above average normalized readmission rate AND above average normalized length of stay
-                
-                **Note**: These are normalized metrics (divided by CMI), so they account for case complexity. 
-                Lower values generally indicate better performance.
-                """)
-        else:
-            st.warning("Insufficient data for scatter plot. Both Normalized ALOS and Normalized Readmission Rate data are required.")
-        
-        # Format data for display
-        available_columns = ['Provider', 'Hospital', 'IDN', 'Number of Staffed Beds', 
-                           'Readmission Rate', 'ALOS', 'CMI', 'Normalized Readmission Rate', 'Normalized ALOS']
-        
-        # Add location columns if available
-        if 'City/State' in display_data.columns:
-            available_columns.insert(3, 'City/State')
-        elif 'City' in display_data.columns and 'State' in display_data.columns:
-            available_columns.insert(3, 'City')
-            available_columns.insert(4, 'State')
-        
-        # Only include columns that exist in the data
-        display_columns = [col for col in available_columns if col in display_data.columns]
-        
-        formatted_data = display_data[display_columns].copy()
-        
-        # Format percentages and numbers
-        for col in ['Readmission Rate', 'Normalized Readmission Rate']:
-            if col in formatted_data.columns:
-                formatted_data[col] = formatted_data[col].apply(
-                    lambda x: f"{x:.1%}" if pd.notna(x) else "N/A"
-                )
-        
-        for col in ['ALOS', 'CMI', 'Normalized ALOS']:
-            if col in formatted_data.columns:
-                formatted_data[col] = formatted_data[col].apply(
-                    lambda x: f"{x:.2f}" if pd.notna(x) else "N/A"
-                )
-        
-        st.table(formatted_data)
-        
-        # Export functionality with enhanced header
-        st.markdown("""
-        <h2 style='color: #1F2937; border-bottom: 3px solid #1E88E5; padding-bottom: 0.5rem; margin-bottom: 1.5rem;'>
-            💾 Export Data
-        </h2>
-        """, unsafe_allow_html=True)
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            if st.button("Download Filtered Data as CSV"):
-                csv = display_data.to_csv(index=False)
-                st.download_button(
-                    label="Download CSV",
-                    data=csv,
-                    file_name="hospital_analysis.csv",
-                    mime="text/csv"
-                )
-        
-        with col2:
-            if st.button("Download All Data as CSV"):
-                csv = df.to_csv(index=False)
-                st.download_button(
-                    label="Download All Data CSV",
-                    data=csv,
-                    file_name="hospital_data_complete.csv",
-                    mime="text/csv"
-                )
+        display_summary_section(index_data, comparator_data, comparator_group, result_key)
+        display_metric_charts(index_data, comparator_data, comparator_group, result_key)
+        display_funnel_plot(index_data, comparator_data, comparator_group, result_key)
+        display_peer_comparison(index_data, comparator_data, comparator_group, result_key)
     
     else:
         # Welcome message with enhanced styling
@@ -1126,12 +1912,7 @@ def main():
                 help="Total number of Integrated Delivery Networks (IDNs)"
             )
         with col3:
-            if 'State' in df.columns:
-                states = df['State'].nunique()
-            elif 'City/State' in df.columns:
-                states = df['City/State'].str.split(', ').str[-1].nunique()
-            else:
-                states = "N/A"
+            states = len(comparator_index.keys("State")) or "N/A"
             st.metric(
                 label="States Covered", 
                 value=states,
@@ -1141,22 +1922,11 @@ def main():
         st.markdown('</div>', unsafe_allow_html=True)
     
     # Add enhanced footer
-    st.markdown("<br><br>", unsafe_allow_html=True)
-    st.markdown("""
-    <div style='background: linear-gradient(to right, #F3F4F6, #E5E7EB); 
-                padding: 2rem 0; 
-                margin: 0 -1rem; 
-                text-align: center;
-                border-top: 2px solid #E5E7EB;'>
-        <img src="data:image/png;base64,{}" width="80" style="margin-bottom: 0.5rem;">
-        <p style='color: #4B5563; font-size: 0.9rem; margin: 0;'>
-            Copyright © {} tauSpan Technologies LLC. All rights reserved.
-        </p>
-        <p style='color: #6B7280; font-size: 0.8rem; margin-top: 0.5rem;'>
-            Built with ❤️ for healthcare analytics
-        </p>
-    </div>
-    """.format(get_base64_image("tauspan_logo.png"), datetime.now().year), unsafe_allow_html=True)
+    display_footer()
+
+def main():
+    display_page()
+    display_debug_panel()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
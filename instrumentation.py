@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Rerun Instrumentation
+Per-stage wall time, rows processed and peak traced allocation for each page
+rerun, recorded through decorated functions and optionally appended to a JSON
+lines log for aggregating rerun latency across sessions
+"""
+
+import functools
+import inspect
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+# When set, every finished rerun profile is appended to this file as one JSON line
+PROFILE_LOG_ENV = "HOSPITAL_ANALYZER_PROFILE_LOG"
+# When set, logged reruns also trace peak memory (tracemalloc slows reruns several-fold)
+PROFILE_MEMORY_ENV = "HOSPITAL_ANALYZER_PROFILE_MEMORY"
+
+# Profile of the rerun executing in the current thread (None = not profiling)
+_active_profile = ContextVar("active_profile", default=None)
+
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+_log_lock = threading.Lock()
+
+def _start_tracing():
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_owned = True
+        _tracing_users += 1
+
+def _stop_tracing():
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_owned:
+            tracemalloc.stop()
+            _tracing_owned = False
+
+class RerunProfile:
+    """Stages recorded during one rerun of the page or of a single fragment
+
+    tracemalloc peaks are process-wide, so stages of concurrent sessions can
+    inflate each other's peak; wall times and row counts are per thread.
+    """
+
+    def __init__(self, name, context=None, trace_memory=False):
+        self.name = name
+        self.context = dict(context or {})
+        self.trace_memory = trace_memory
+        self.timestamp = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+        self.stages = []
+        self.wall_ms = None
+        self.peak_bytes = None
+        self._depth = 0
+        # Highest absolute traced-memory peak seen by each open stage's children
+        self._child_peaks = []
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """Record wall time, and peak allocation when tracing memory, of the enclosed block"""
+        record = {"stage": name, "depth": self._depth, "rows": rows, "wall_ms": None, "peak_bytes": None}
+        self.stages.append(record)
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self._depth += 1
+        self._child_peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["wall_ms"] = (time.perf_counter() - start) * 1000
+            self._depth -= 1
+            child_peak = self._child_peaks.pop()
+            if tracing:
+                # A nested stage resets the peak, so fold in what its children saw
+                peak = max(tracemalloc.get_traced_memory()[1], child_peak)
+                record["peak_bytes"] = max(peak - baseline, 0)
+                if self._child_peaks:
+                    self._child_peaks[-1] = max(self._child_peaks[-1], peak)
+
+    def to_dict(self):
+        """JSON-serializable record of the rerun"""
+        return {
+            "timestamp": self.timestamp,
+            "name": self.name,
+            **self.context,
+            "wall_ms": self.wall_ms,
+            "peak_bytes": self.peak_bytes,
+            "stages": self.stages,
+        }
+
+    def stage_frame(self):
+        """Stages as a table for display"""
+        return pd.DataFrame(self.stages, columns=["stage", "depth", "rows", "wall_ms", "peak_bytes"])
+
+@contextmanager
+def profile_rerun(name, enabled=True, context=None, log_path=None, on_finish=None, trace_memory=False):
+    """Profile the enclosed rerun; inside an already profiled rerun it is just a stage
+
+    Timing only by default; trace_memory also records peak allocations with tracemalloc,
+    which slows every allocation, so its wall times are not representative latencies.
+    """
+    profile = _active_profile.get()
+    if profile is not None:
+        with profile.stage(name):
+            yield profile
+        return
+    if not enabled:
+        yield None
+        return
+
+    profile = RerunProfile(name, context, trace_memory)
+    token = _active_profile.set(profile)
+    if trace_memory:
+        _start_tracing()
+    try:
+        with profile.stage(name) as record:
+            yield profile
+    finally:
+        _active_profile.reset(token)
+        if trace_memory:
+            _stop_tracing()
+        profile.wall_ms = record["wall_ms"]
+        profile.peak_bytes = record["peak_bytes"]
+        if log_path:
+            write_profile_log(log_path, profile)
+        if on_finish is not None:
+            on_finish(profile)
+
+def _count_rows(value):
+    """Length of a frame, series or array; None for anything else"""
+    if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)):
+        return len(value)
+    return None
+
+def instrument(stage_name, rows=None):
+    """Decorator recording a function as a stage of the active rerun profile
+
+    rows names the argument whose length is recorded; by default the length of a
+    returned DataFrame is used. Without an active profile the call is untouched.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = _active_profile.get()
+            if profile is None:
+                return func(*args, **kwargs)
+            row_count = None
+            if rows is not None:
+                bound = signature.bind_partial(*args, **kwargs)
+                row_count = _count_rows(bound.arguments.get(rows))
+            with profile.stage(stage_name, rows=row_count) as record:
+                result = func(*args, **kwargs)
+                if rows is None:
+                    record["rows"] = _count_rows(result)
+            return result
+        return wrapper
+    return decorator
+
+def write_profile_log(log_path, profile):
+    """Append a finished profile to a JSON lines file"""
+    line = json.dumps(profile.to_dict(), default=str)
+    with _log_lock:
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+def latency_percentiles(profiles, percentiles=(50, 95)):
+    """Rerun wall-time percentiles (ms) over finished profiles"""
+    wall_times = [p.wall_ms for p in profiles if p.wall_ms is not None]
+    if not wall_times:
+        return {f"p{q}": None for q in percentiles}
+    return {f"p{q}": float(np.percentile(wall_times, q)) for q in percentiles}
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Percentile Engine
+Sorted, NaN-free metric arrays per comparator group so percentile ranks are a
+binary search and quantiles are direct index reads, server-side histogram bins,
+plus the vectorized league table ranking every hospital against every
+comparator group at once. Risk-adjusted O/E metrics are computed per
+comparator group from the group's own fit, and bootstrap intervals of the
+quartiles are memoized next to each distribution.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from bootstrap import (BOOTSTRAP_QUANTILES, BOOTSTRAP_SEED, percentile_rank_interval, quantile_intervals,
+                       resample_index_values, seeded_rng)
+from comparator_index import COMPARATOR_DIMENSIONS, ComparatorIndex
+from result_cache import BoundedMemo
+from risk_adjustment import RISK_ADJUSTED_METRICS, RISK_ADJUSTED_OUTCOMES, RiskModel
+
+SUMMARY_METRICS = ['Readmission Rate', 'ALOS', 'CMI', 'Normalized Readmission Rate', 'Normalized ALOS'] + \
+    RISK_ADJUSTED_METRICS
+
+# League table comparator -> comparator dimension (None = all hospitals)
+LEAGUE_COMPARATORS = {
+    "All Hospitals": None,
+    "Same IDN": "IDN",
+    "Same State": "State",
+}
+
+# Histogram binning: "equal" = 30 equal-width bins over the group's range,
+# "fd" = Freedman-Diaconis width, "fixed" = the all-hospitals equal-width edges
+# reused for every comparator group so bars line up across groups
+HISTOGRAM_BIN_METHODS = ("equal", "fd", "fixed")
+DEFAULT_HISTOGRAM_BINS = 30
+MAX_HISTOGRAM_BINS = 200
+
+def histogram_edges(sorted_values, method="equal", bins=DEFAULT_HISTOGRAM_BINS):
+    """Bin edges for sorted, NaN-free values"""
+    low, high = sorted_values[0], sorted_values[-1]
+    if high <= low:
+        return np.array([low - 0.5, low + 0.5])
+    if method == "fd":
+        n = len(sorted_values)
+        iqr = np.subtract(*np.quantile(sorted_values, [0.75, 0.25]))
+        width = 2 * iqr / np.cbrt(n)
+        if width > 0:
+            bins = int(min(np.ceil((high - low) / width), MAX_HISTOGRAM_BINS))
+    return np.linspace(low, high, max(bins, 1) + 1)
+
+class MetricDistribution:
+    """Sorted values of one metric within one comparator group"""
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype=float)
+        values = np.sort(values[~np.isnan(values)])
+        values.flags.writeable = False
+        self.values = values
+        self.count = len(values)
+        self.mean = float(values.mean()) if self.count else np.nan
+
+    @classmethod
+    def from_series(cls, series):
+        """Build a one-off distribution from a pandas Series"""
+        return cls(series.to_numpy(dtype=float, na_value=np.nan))
+
+    @property
+    def empty(self):
+        return self.count == 0
+
+    @property
+    def median(self):
+        return self.quantile(0.5)
+
+    def percentile_of(self, value):
+        """Percent of the group strictly below value (matches (data < value).mean() * 100)"""
+        if self.empty:
+            return np.nan
+        return np.searchsorted(self.values, value, side='left') / self.count * 100
+
+    def bin_counts(self, edges):
+        """Values per bin, with the last bin closed on the right (matches np.histogram)"""
+        bounds = np.searchsorted(self.values, edges, side='left')
+        bounds[-1] = np.searchsorted(self.values, edges[-1], side='right')
+        return np.diff(bounds)
+
+    def histogram(self, method="equal"):
+        """(edges, counts) for this distribution alone"""
+        edges = histogram_edges(self.values, "equal" if method == "fixed" else method)
+        return edges, self.bin_counts(edges)
+
+    def quantile(self, q):
+        """Linearly interpolated quantile (matches pandas Series.quantile)"""
+        if self.empty:
+            return np.nan
+        position = q * (self.count - 1)
+        lower = int(np.floor(position))
+        upper = min(lower + 1, self.count - 1)
+        fraction = position - lower
+        return self.values[lower] + (self.values[upper] - self.values[lower]) * fraction
+
+    def quantile_intervals(self, quantiles=BOOTSTRAP_QUANTILES, rng=None):
+        """{q: (low, high)} bootstrap confidence intervals of quantiles"""
+        return quantile_intervals(self.values, quantiles, rng=rng)
+
+    def percentile_interval(self, index_data, metric, rng=None):
+        """(low, high) confidence interval of the index hospital/IDN's percentile rank"""
+        if rng is None:
+            rng = seeded_rng(BOOTSTRAP_SEED)
+        index_draws = resample_index_values(index_data, metric, rng=rng)
+        return percentile_rank_interval(self.values, index_draws, rng=rng)
+
+class PercentileEngine:
+    """Lazily built, memoized metric distributions keyed by (comparator group, metric)"""
+
+    def __init__(self, df, comparator_index, risk_model=None):
+        self._df = df
+        self._comparator_index = comparator_index
+        if risk_model is None:
+            risk_model = RiskModel(df, comparator_index)
+        self.risk_model = risk_model
+        self._columns = {}
+        # Bounded: keyed by comparator group, which includes every similarity query
+        self._distributions = BoundedMemo()
+        self._histograms = BoundedMemo()
+        self._intervals = BoundedMemo()
+        self._lock = threading.Lock()
+
+    def _column(self, metric):
+        values = self._columns.get(metric)
+        if values is None:
+            values = self._df[metric].to_numpy(dtype=float, na_value=np.nan)
+            self._columns[metric] = values
+        return values
+
+    def distribution(self, group, metric):
+        """Distribution of metric over group, a (dimension, key) pair or None for all hospitals"""
+        cache_key = (group, metric)
+        distribution = self._distributions.get(cache_key)
+        if distribution is None:
+            with self._lock:
+                distribution = self._distributions.get(cache_key)
+                if distribution is None:
+                    positions = None if group is None else self._comparator_index.positions(*group)
+                    if metric in RISK_ADJUSTED_OUTCOMES:
+                        # O/E depends on the group's own fit, so there is no shared column
+                        values = self.risk_model.observed_to_expected(group, metric, positions)
+                    else:
+                        values = self._column(metric)
+                        if positions is not None:
+                            values = values[positions]
+                    distribution = MetricDistribution(values)
+                    distribution = self._distributions.setdefault(cache_key, distribution)
+        return distribution
+
+    def histogram(self, group, metric, method="equal"):
+        """Cached (edges, counts) of a metric within a comparator group"""
+        cache_key = (group, metric, method)
+        histogram = self._histograms.get(cache_key)
+        if histogram is None:
+            distribution = self.distribution(group, metric)
+            if method == "fixed":
+                edges = self.histogram(None, metric, "equal")[0]
+                if metric in RISK_ADJUSTED_OUTCOMES and not distribution.empty:
+                    # O/E is refitted per group, so its values can fall outside the all-hospitals range;
+                    # widen the outer bins rather than drop them
+                    edges = edges.copy()
+                    edges[0] = min(edges[0], distribution.values[0])
+                    edges[-1] = max(edges[-1], distribution.values[-1])
+            else:
+                edges = histogram_edges(distribution.values, method)
+            edges.flags.writeable = False
+            counts = distribution.bin_counts(edges)
+            counts.flags.writeable = False
+            histogram = (edges, counts)
+            histogram = self._histograms.setdefault(cache_key, histogram)
+        return histogram
+
+    def percentile_of(self, group, metric, value):
+        """Percentile rank of value within a comparator group"""
+        return self.distribution(group, metric).percentile_of(value)
+
+    def quantile_intervals(self, group, metric):
+        """Cached bootstrap intervals of a metric's quartiles within a comparator group"""
+        cache_key = (group, metric)
+        intervals = self._intervals.get(cache_key)
+        if intervals is None:
+            # Seeded per (group, metric) so every session and worker sees the same interval
+            intervals = self.distribution(group, metric).quantile_intervals(rng=seeded_rng(BOOTSTRAP_SEED, *cache_key))
+            intervals = self._intervals.setdefault(cache_key, intervals)
+        return intervals
+
+    def percentile_interval(self, group, metric, index_data):
+        """Confidence interval of the index hospital/IDN's percentile rank within a comparator group"""
+        rng = seeded_rng(BOOTSTRAP_SEED, group, metric, tuple(index_data.index))
+        return self.distribution(group, metric).percentile_interval(index_data, metric, rng)
+
+    def quantile(self, group, metric, q):
+        """Quantile of a metric within a comparator group"""
+        return self.distribution(group, metric).quantile(q)
+
+def percentile_ranks(values, keys=None):
+    """Percent of each row's group strictly below its value, for every row at once"""
+    values = pd.Series(values)
+    if keys is None:
+        ranks = values.rank(method='min')
+        counts = values.notna().sum()
+    else:
+        grouped = values.groupby(pd.Series(keys, index=values.index), sort=False)
+        ranks = grouped.rank(method='min')
+        counts = grouped.transform('count')
+    # rank(method='min') - 1 is the number of non-null group values strictly below
+    return (ranks - 1) / counts * 100
+
+def league_table_column(metric, comparator):
+    """Column name for a metric's percentile against a comparator"""
+    return f"{metric} Percentile ({comparator})"
+
+def league_table(df, metrics=None, comparators=None, risk_model=None, comparator_index=None):
+    """Rank every hospital against every comparator group for each metric
+
+    O/E metrics are ranked within each group using that group's own fit, as
+    PercentileEngine does; the O/E column itself shows the all-hospitals fit.
+    """
+    if metrics is None:
+        metrics = SUMMARY_METRICS
+    if comparators is None:
+        comparators = list(LEAGUE_COMPARATORS)
+    if any(metric in RISK_ADJUSTED_OUTCOMES for metric in metrics):
+        if comparator_index is None:
+            comparator_index = ComparatorIndex(df)
+        if risk_model is None:
+            risk_model = RiskModel(df, comparator_index)
+        if any(metric not in df.columns for metric in RISK_ADJUSTED_OUTCOMES):
+            df = risk_model.assign(df, None)
+
+    table = pd.DataFrame({
+        'Provider': df['Provider'],
+        'Hospital': df['Hospital'],
+        'IDN': df['IDN'],
+        'State': COMPARATOR_DIMENSIONS["State"](df),
+    })
+    group_keys = {}
+    for comparator in comparators:
+        dimension = LEAGUE_COMPARATORS[comparator]
+        group_keys[comparator] = COMPARATOR_DIMENSIONS[dimension](df) if dimension else None
+
+    for metric in metrics:
+        values = df[metric].astype(float)
+        table[metric] = values
+        overall = percentile_ranks(values)
+        for comparator in comparators:
+            keys = group_keys[comparator]
+            if keys is None:
+                ranks = overall
+            else:
+                group_values = values
+                if metric in RISK_ADJUSTED_OUTCOMES:
+                    group_values = pd.Series(group_observed_to_expected(
+                        risk_model, comparator_index, LEAGUE_COMPARATORS[comparator], metric), index=df.index)
+                # Hospitals without a group key are compared to all hospitals, as in the app
+                ranks = percentile_ranks(group_values, keys).where(keys.notna(), overall)
+            table[league_table_column(metric, comparator)] = ranks
+
+    return table
+
+def group_observed_to_expected(risk_model, comparator_index, dimension, metric):
+    """O/E of every hospital under the fit of its own group in a dimension (NaN without a group)"""
+    values = np.full(comparator_index.n_rows, np.nan)
+    for key in comparator_index.keys(dimension):
+        positions = comparator_index.positions(dimension, key)
+        values[positions] = risk_model.observed_to_expected((dimension, key), metric, positions)
+    return values
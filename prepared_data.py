@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Prepared Dataset Cache
+Columnar on-disk cache of the cleaned hospital data so cold starts skip Excel parsing,
+plus the read-only dataset object shared by every session of the web app
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Bump whenever clean_hospital_data() changes so stale caches are rebuilt
+CACHE_FORMAT_VERSION = 1
+CACHE_DIR_NAME = ".prepared_cache"
+METADATA_KEY = b"hospital_source"
+
+def clean_hospital_data(df):
+    """Apply the standard cleaning and derived columns to raw hospital data"""
+    df['CMI'] = pd.to_numeric(df['CMI'], errors='coerce')
+    df = df.dropna(axis=1, how='all')
+    df['IDN'] = df['IDN'].fillna('Independent')
+
+    # Create City/State column if it doesn't exist
+    if 'City/State' not in df.columns and 'City' in df.columns and 'State' in df.columns:
+        df['City/State'] = df['City'].astype(str) + ', ' + df['State'].astype(str)
+        df['City/State'] = df['City/State'].replace('nan, nan', '')
+
+    # Calculate normalized metrics (divide by CMI to adjust for case complexity)
+    df['Normalized ALOS'] = df['ALOS'] / df['CMI']
+    df['Normalized Readmission Rate'] = df['Readmission Rate'] / df['CMI']
+
+    return df
+
+def file_content_hash(file_path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def source_fingerprint(file_path, with_hash=True):
+    """Describe a source file by size, modification time and content hash"""
+    stat = os.stat(file_path)
+    fingerprint = {
+        "format": CACHE_FORMAT_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+    if with_hash:
+        fingerprint["sha256"] = file_content_hash(file_path)
+    return fingerprint
+
+def cache_path_for(source_path, cache_dir=None):
+    """Return the prepared-cache path for a source file"""
+    source_path = os.path.abspath(source_path)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(source_path), CACHE_DIR_NAME)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(cache_dir, f"{stem}.arrow")
+
+def read_cache_fingerprint(cache_path):
+    """Read the source fingerprint stored in a cache file, or None if unreadable"""
+    try:
+        with pa.memory_map(cache_path, "r") as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    raw = metadata.get(METADATA_KEY)
+    return json.loads(raw) if raw else None
+
+def write_prepared_cache(df, cache_path, fingerprint):
+    """Write a cleaned frame to an uncompressed Arrow IPC file (memory-mappable)"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[METADATA_KEY] = json.dumps(fingerprint).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    # Write to a temporary file first so readers never see a partial cache
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, cache_path)
+
+def read_prepared_cache(cache_path):
+    """Memory-map a prepared cache and return it as a DataFrame"""
+    table = feather.read_table(cache_path, memory_map=True)
+    return table.to_pandas()
+
+def is_cache_current(cached, current):
+    """Check whether a stored fingerprint still describes the source file"""
+    if not cached or cached.get("format") != CACHE_FORMAT_VERSION:
+        return False
+    return cached.get("size") == current["size"] and cached.get("mtime_ns") == current["mtime_ns"]
+
+def load_prepared_data(source_path, cache_dir=None):
+    """Load cleaned hospital data, using the columnar cache when it is current"""
+    cache_path = cache_path_for(source_path, cache_dir)
+    cached = read_cache_fingerprint(cache_path)
+    current = source_fingerprint(source_path, with_hash=False)
+
+    if is_cache_current(cached, current):
+        return read_prepared_cache(cache_path)
+
+    # Size or mtime changed: only rebuild if the content actually changed
+    current["sha256"] = file_content_hash(source_path)
+    if cached and cached.get("format") == CACHE_FORMAT_VERSION and cached.get("sha256") == current["sha256"]:
+        df = read_prepared_cache(cache_path)
+        write_prepared_cache(df, cache_path, current)
+    else:
+        df = clean_hospital_data(pd.read_excel(source_path))
+        write_prepared_cache(df, cache_path, current)
+    return df
+
+def dataset_version(source_path, cache_dir=None):
+    """Return a short content version for a source file's prepared cache"""
+    fingerprint = read_cache_fingerprint(cache_path_for(source_path, cache_dir))
+    if fingerprint and fingerprint.get("sha256"):
+        return fingerprint["sha256"][:16]
+    return file_content_hash(source_path)[:16]
+
+def _freeze_column(series):
+    """Return a read-only version of a column without copying numeric data"""
+    if isinstance(series.dtype, np.dtype):
+        values = series.to_numpy(copy=False)
+        if not values.flags.writeable:
+            return values
+        if values.base is not None:
+            # Own the buffer so no other frame can write through to it
+            values = values.copy()
+        values.flags.writeable = False
+        return values
+    # Extension arrays (e.g. Arrow-backed strings) are immutable buffers already
+    return series.array
+
+class HospitalDataset:
+    """Read-only, process-wide view of the prepared hospital data"""
+
+    def __init__(self, df, version=None):
+        columns = {col: _freeze_column(df[col]) for col in df.columns}
+        self._frame = pd.DataFrame(columns, copy=False)
+        self.version = version
+
+    def __len__(self):
+        return len(self._frame)
+
+    @property
+    def columns(self):
+        """Column names in source order"""
+        return list(self._frame.columns)
+
+    @property
+    def frame(self):
+        """Shallow DataFrame over the shared buffers; adding columns never touches the original"""
+        return self._frame.copy(deep=False)
+
+    def column(self, name):
+        """Read-only view of a single column's values"""
+        values = self._frame[name].to_numpy(copy=False)
+        if values.flags.writeable:
+            values = values.view()
+            values.flags.writeable = False
+        return values
+
+    def memory_usage(self):
+        """Bytes held by each column, including string payloads"""
+        return self._frame.memory_usage(index=False, deep=True)
+
+    def footprint(self):
+        """Summarize the dataset's resident size"""
+        usage = self.memory_usage()
+        return {
+            "rows": len(self._frame),
+            "columns": len(usage),
+            "total_bytes": int(usage.sum()),
+            "largest_columns": usage.sort_values(ascending=False).head(5).astype(int).to_dict(),
+        }
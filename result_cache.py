@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Result Cache
+Process-wide LRU of computed statistics tables and serialized figures, bounded
+by total size so repeated views of popular hospitals return immediately, and
+the entry-bounded LRU behind the per-comparator-group memos
+"""
+
+import pickle
+import threading
+from collections import OrderedDict, namedtuple
+
+import pandas as pd
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Entries kept by a BoundedMemo (per-group distributions, fits, neighbour lists, ...)
+DEFAULT_MEMO_ENTRIES = 4096
+
+# Everything a cached result depends on; unused parts are None
+ResultKey = namedtuple(
+    "ResultKey",
+    ["dataset_version", "selection_mode", "index_key", "comparator_type", "metric", "claims_tolerance", "kind"]
+)
+
+def estimate_size(value):
+    """Approximate bytes held by a cached value"""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+class ResultCache:
+    """Thread-safe LRU cache with size-based eviction and hit/miss counters"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Return a cached value and mark it most recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size=None):
+        """Store a value, evicting least recently used entries to stay under max_bytes"""
+        if size is None:
+            size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Hit/miss counters and current occupancy"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+class BoundedMemo:
+    """Thread-safe LRU of computed objects bounded by entry count
+
+    For memos whose values are cheap to size but keyed by something unbounded
+    (comparator groups, similarity queries), where ResultCache's pickled size
+    estimate would cost more than the value.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MEMO_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Return a memoized value and mark it most recently used"""
+        with self._lock:
+            value = self._entries.get(key, default)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            return value
+
+    def setdefault(self, key, value):
+        """Store value unless key is already present; returns the stored value"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return value
+
+    def get_or_compute(self, key, compute):
+        """Memoized compute() for key; concurrent misses may compute twice, but one value is kept"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                value = self.setdefault(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Risk Adjustment
+Expected readmission rate and length of stay from a least-squares fit on case
+mix, bed size, volume and payor mix within each comparator group, and the
+observed/expected (O/E) ratios derived from them. The design matrix is built
+once per dataset, so fitting a new comparator group is a single small lstsq.
+"""
+
+import numpy as np
+
+from result_cache import BoundedMemo
+
+# Risk factor column -> transform applied before fitting (counts are log-scaled).
+# The private/self-pay share is left out: the three payor shares sum to one.
+RISK_FEATURES = {
+    'CMI': None,
+    'Number of Staffed Beds': np.log1p,
+    'Number of Discharges': np.log1p,
+    'Payor Mix: Medicare': None,
+    'Payor Mix: Medicaid': None,
+}
+
+# O/E metric -> observed outcome it adjusts
+RISK_ADJUSTED_OUTCOMES = {
+    'Readmission O/E': 'Readmission Rate',
+    'ALOS O/E': 'ALOS',
+}
+RISK_ADJUSTED_METRICS = list(RISK_ADJUSTED_OUTCOMES)
+
+# Groups with fewer complete hospitals than this use the all-hospitals fit
+MIN_FIT_ROWS = 30
+
+def expected_column(metric):
+    """Column holding the expected value behind an O/E metric"""
+    return f"Expected {RISK_ADJUSTED_OUTCOMES[metric]}"
+
+def design_matrix(df, features=None):
+    """Intercept plus transformed risk factors, one row per hospital (NaN where a factor is missing)"""
+    if features is None:
+        features = RISK_FEATURES
+    columns = [np.ones(len(df))]
+    for feature, transform in features.items():
+        values = df[feature].to_numpy(dtype=float, na_value=np.nan)
+        columns.append(transform(values) if transform else values)
+    return np.column_stack(columns)
+
+def fit_least_squares(X, y, min_rows=MIN_FIT_ROWS):
+    """OLS coefficients over rows with every value present, or None with fewer than min_rows"""
+    complete = ~np.isnan(y) & ~np.isnan(X).any(axis=1)
+    if complete.sum() < max(min_rows, X.shape[1]):
+        return None
+    coefficients, *_ = np.linalg.lstsq(X[complete], y[complete], rcond=None)
+    return coefficients
+
+class RiskModel:
+    """Per-comparator-group expected values and O/E ratios over one dataset
+
+    Coefficients are memoized by (dataset version, comparator group, metric).
+    Frames passed to assign() must keep the row labels of the modeled frame,
+    as every slice taken from load_data()'s frame does.
+    """
+
+    def __init__(self, df, comparator_index=None, version=None, features=None):
+        self.version = version
+        self.features = list(features or RISK_FEATURES)
+        self._X = design_matrix(df, features)
+        self._X.flags.writeable = False
+        self._observed = {
+            outcome: df[outcome].to_numpy(dtype=float, na_value=np.nan)
+            for outcome in set(RISK_ADJUSTED_OUTCOMES.values())
+        }
+        self._comparator_index = comparator_index
+        self._coefficients = BoundedMemo()
+
+    def _positions(self, group):
+        return None if group is None else self._comparator_index.positions(*group)
+
+    def coefficients(self, group, metric):
+        """Intercept followed by one coefficient per feature (NaN when even the all-hospitals fit fails)"""
+        cache_key = (self.version, group, metric)
+        coefficients = self._coefficients.get(cache_key)
+        if coefficients is None:
+            positions = self._positions(group)
+            X = self._X if positions is None else self._X[positions]
+            y = self._observed[RISK_ADJUSTED_OUTCOMES[metric]]
+            coefficients = fit_least_squares(X, y if positions is None else y[positions])
+            if coefficients is None:
+                if group is not None:
+                    coefficients = self.coefficients(None, metric)
+                else:
+                    coefficients = np.full(self._X.shape[1], np.nan)
+            coefficients.flags.writeable = False
+            coefficients = self._coefficients.setdefault(cache_key, coefficients)
+        return coefficients
+
+    def expected(self, group, metric, positions=None):
+        """Expected outcome under the group's fit for the given rows (all rows by default)"""
+        X = self._X if positions is None else self._X[positions]
+        coefficients = self.coefficients(group, metric)
+        # Column by column rather than X @ coefficients: a BLAS product can round a row
+        # differently depending on which other rows it is computed with, and a hospital's
+        # value must be identical whether it is taken alone or as part of its group
+        expected = X[:, 0] * coefficients[0]
+        for column, coefficient in zip(X.T[1:], coefficients[1:]):
+            expected = expected + column * coefficient
+        # A linear fit can extrapolate below zero; no meaningful ratio exists there
+        expected[expected <= 0] = np.nan
+        return expected
+
+    def observed_to_expected(self, group, metric, positions=None):
+        """O/E ratio under the group's fit for the given rows (all rows by default)"""
+        observed = self._observed[RISK_ADJUSTED_OUTCOMES[metric]]
+        if positions is not None:
+            observed = observed[positions]
+        return observed / self.expected(group, metric, positions)
+
+    def assign(self, data, group):
+        """Shallow copy of data with the expected and O/E columns for a comparator group added"""
+        positions = data.index.to_numpy()
+        data = data.copy(deep=False)
+        for metric, outcome in RISK_ADJUSTED_OUTCOMES.items():
+            expected = self.expected(group, metric, positions)
+            data[expected_column(metric)] = expected
+            data[metric] = self._observed[outcome][positions] / expected
+        return data
@@ -3,14 +3,31 @@ from setuptools import setup, find_packages
 setup(
     name="hospital-outcomes-analyzer",
     version="1.0.0",
-    description="Hospital Outcomes Analyzer for DRG 329-334 Data",
+    description="Hospital Outcomes Analyzer for DRG Readmission Data",
     author="Hospital Analytics Team",
-    py_modules=["hospital_analyzer"],
+    py_modules=[
+        "hospital_analyzer",
+        "hospital_analyzer_web",
+        "bootstrap",
+        "claims_ingest",
+        "comparator_index",
+        "dataset_store",
+        "exports",
+        "funnel",
+        "instrumentation",
+        "percentiles",
+        "prepared_data",
+        "result_cache",
+        "risk_adjustment",
+    ],
     install_requires=[
+        "streamlit>=1.37.0",
         "pandas>=1.5.0",
-        "matplotlib>=3.5.0",
+        "plotly>=5.15.0",
         "numpy>=1.21.0",
         "openpyxl>=3.0.0",
+        "pyarrow>=7.0.0",
+        "scipy>=1.7.0",
     ],
     entry_points={
         "console_scripts": [
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Synthetic Hospital Data
+Seeded generator of workbooks with the same columns, types and value
+distributions as the bundled DRG 329-334 file, including the mixed-type CMI
+column ("Data unavailable" text among the numbers), for offline scale testing
+of the loader and analytics at any row count and across several years
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from exports import EXPORT_FORMATS
+
+# Raw workbook columns in source order ("Unnamed: 17" is an empty, untitled column)
+SOURCE_COLUMNS = [
+    'Provider', 'Hospital', 'City', 'State', 'CMI', 'ALOS', 'Readmission Rate', 'Medicare Total Claims', 'IDN',
+    'Number of Staffed Beds', 'Number of Discharges', 'Net Operating Profit Margin',
+    'Number of Medicare Discharges', 'Payor Mix: Medicare', 'Payor Mix: Medicaid',
+    'Payor Mix: Private/Self-Pay/Other', 'Total Surgeries', 'Unnamed: 17', 'Total Days', 'Definitive IDN ID',
+    'Definitive IDN Parent ID', 'IDN Parent', 'ACO Affiliations', 'Medical School Affiliation', 'Definitive ID',
+]
+CMI_UNAVAILABLE = "Data unavailable"
+EXCEL_ROW_LIMIT = 1_048_575
+
+# Hospitals per state in the 2022 workbook, used as sampling weights
+STATE_WEIGHTS = {
+    'CA': 276, 'TX': 210, 'FL': 162, 'NY': 125, 'PA': 117, 'IL': 115, 'OH': 112, 'MI': 87, 'WI': 83, 'GA': 82,
+    'NC': 81, 'IN': 76, 'VA': 65, 'TN': 63, 'KY': 62, 'MO': 62, 'MN': 61, 'NJ': 59, 'CO': 57, 'AL': 56,
+    'IA': 55, 'WA': 55, 'AZ': 54, 'LA': 53, 'MA': 51, 'SC': 49, 'KS': 48, 'OR': 48, 'OK': 43, 'MD': 39,
+    'MS': 39, 'AR': 34, 'UT': 26, 'NE': 25, 'NM': 25, 'WV': 25, 'CT': 24, 'ME': 24, 'ID': 22, 'NV': 22,
+    'MT': 20, 'NH': 20, 'WY': 16, 'SD': 15, 'VT': 13, 'HI': 11, 'AK': 10, 'DE': 10, 'ND': 10, 'RI': 10, 'DC': 6,
+}
+MEDICAL_SCHOOL_WEIGHTS = {'No Affiliation': 1838, 'Limited': 532, 'Major': 423, 'Graduate': 120}
+
+# Share of hospitals outside any IDN, hospitals per IDN and IDNs per parent system
+INDEPENDENT_SHARE = 0.165
+HOSPITALS_PER_IDN = 3.6
+IDN_PARENT_SHARE = 0.6
+IDNS_PER_PARENT = 2.2
+# Hospitals of an IDN mostly sit in its home state
+IDN_HOME_STATE_SHARE = 0.8
+
+CITY_STEMS = ["Spring", "River", "Lake", "Oak", "Cedar", "Fair", "Green", "Maple", "Pine", "Clear", "Mill",
+              "North", "South", "East", "West", "Rock", "Silver", "Elm", "Bay", "Glen", "Ash", "Brook",
+              "Wood", "Stone", "Sun"]
+CITY_SUFFIXES = ["field", "ton", "ville", "wood", "port", "view", "dale", "burg", "ford", "haven", "brook",
+                 "side", "mont", "land", "crest", "ridge"]
+HOSPITAL_PATRONS = ["St. Mary", "St. Joseph", "St. Luke", "Mercy", "Providence", "Good Samaritan", "Sacred Heart",
+                    "Memorial", "Baptist", "Methodist", "Presbyterian", "Trinity", "Holy Cross", "St. Francis"]
+HOSPITAL_KINDS = ["Regional Medical Center", "Medical Center", "General Hospital", "Community Hospital",
+                  "Memorial Hospital", "Hospital", "Health Center", "Regional Hospital"]
+SYSTEM_WORDS = ["Summit", "Harbor", "Heritage", "Pioneer", "Beacon", "Unity", "Keystone", "Frontier", "Prairie",
+                "Coastal", "Valley", "Highland", "Lakeshore", "Riverbend", "Evergreen", "Liberty", "Crescent",
+                "Meridian", "Northstar", "Horizon"]
+SYSTEM_KINDS = ["Health", "Health System", "Healthcare", "Health Partners", "Medical Group", "Health Network"]
+
+def _names(words, kinds, count, rng):
+    """count distinct "<word> <kind>" names, numbered once the combinations run out"""
+    combos = np.array([f"{w} {k}" for w in words for k in kinds], dtype=object)
+    names = combos[rng.permutation(len(combos))][:count]
+    if count > len(combos):
+        extra = np.arange(len(combos), count)
+        names = np.concatenate([names, combos[extra % len(combos)] + " " + (extra // len(combos) + 1).astype(str)])
+    return names
+
+def _sample(rng, weights, size):
+    keys = list(weights)
+    p = np.array([weights[k] for k in keys], dtype=float)
+    return np.array(keys, dtype=object)[rng.choice(len(keys), size=size, p=p / p.sum())]
+
+def _with_missing(values, rng, share):
+    """Blank out a random share of a float array"""
+    values = values.astype(float)
+    values[rng.random(len(values)) < share] = np.nan
+    return values
+
+def generate_hospital_profiles(n_rows, seed=0):
+    """Year-independent hospital attributes: identity, location, size, payor mix and system membership"""
+    rng = np.random.default_rng([seed, 0])
+    df = pd.DataFrame({
+        'Provider': 10001 + np.arange(n_rows, dtype=np.int64),
+        'Definitive ID': 10 + rng.permutation(n_rows).astype(np.int64),
+    })
+    states = _sample(rng, STATE_WEIGHTS, n_rows)
+
+    # Systems: heavy-tailed sizes, a home state each, some rolled up under parent systems
+    in_idn = rng.random(n_rows) >= INDEPENDENT_SHARE
+    n_idns = max(1, int(round(in_idn.sum() / HOSPITALS_PER_IDN)))
+    idn_weights = rng.lognormal(0, 0.9, n_idns)
+    idn_codes = np.full(n_rows, -1)
+    idn_codes[in_idn] = rng.choice(n_idns, size=in_idn.sum(), p=idn_weights / idn_weights.sum())
+    idn_names = _names(SYSTEM_WORDS + CITY_STEMS, SYSTEM_KINDS, n_idns, rng)
+    idn_home = _sample(rng, STATE_WEIGHTS, n_idns)
+    at_home = in_idn & (rng.random(n_rows) < IDN_HOME_STATE_SHARE)
+    states[at_home] = idn_home[idn_codes[at_home]]
+
+    n_parents = max(1, int(round(n_idns * IDN_PARENT_SHARE / IDNS_PER_PARENT)))
+    parent_codes = np.where(rng.random(n_idns) < IDN_PARENT_SHARE, rng.integers(0, n_parents, n_idns), -1)
+    parent_names = _names(SYSTEM_WORDS, ["Health Corporation", "Healthcare Inc.", "Health Ministries",
+                                         "Hospital Corporation"], n_parents, rng)
+    idn_ids = 700 + rng.choice(n_idns * 20, size=n_idns, replace=False)
+    parent_ids = 1600 + rng.choice(n_parents * 20, size=n_parents, replace=False)
+
+    hospital_parent = np.where(in_idn, parent_codes[np.maximum(idn_codes, 0)], -1)
+    df['IDN'] = pd.Series(np.where(in_idn, idn_names[np.maximum(idn_codes, 0)], None), dtype=object)
+    df['Definitive IDN ID'] = np.where(in_idn, idn_ids[np.maximum(idn_codes, 0)], np.nan)
+    df['Definitive IDN Parent ID'] = np.where(hospital_parent >= 0, parent_ids[np.maximum(hospital_parent, 0)], np.nan)
+    df['IDN Parent'] = pd.Series(np.where(hospital_parent >= 0, parent_names[np.maximum(hospital_parent, 0)], None),
+                                 dtype=object)
+
+    cities = (np.array(CITY_STEMS, dtype=object)[rng.integers(0, len(CITY_STEMS), n_rows)]
+              + np.array(CITY_SUFFIXES, dtype=object)[rng.integers(0, len(CITY_SUFFIXES), n_rows)])
+    patrons = np.array(HOSPITAL_PATRONS, dtype=object)[rng.integers(0, len(HOSPITAL_PATRONS), n_rows)]
+    kinds = np.array(HOSPITAL_KINDS, dtype=object)[rng.integers(0, len(HOSPITAL_KINDS), n_rows)]
+    df['Hospital'] = np.where(rng.random(n_rows) < 0.6, cities, patrons) + " " + kinds
+    df['City'] = cities
+    df['State'] = states
+
+    beds = np.clip(np.round(rng.lognormal(np.log(146), 0.9, n_rows)), 1, 2500).astype(np.int64)
+    df['Number of Staffed Beds'] = beds
+    size = np.log(beds / 146)
+    df['_size'] = size
+
+    payor = rng.dirichlet([4.6, 1.3, 10.1], n_rows)
+    df['Payor Mix: Medicare'] = _with_missing(payor[:, 0].round(3), rng, 0.003)
+    df['Payor Mix: Medicaid'] = _with_missing(payor[:, 1].round(3), rng, 0.03)
+    df['Payor Mix: Private/Self-Pay/Other'] = _with_missing(payor[:, 2].round(3), rng, 0.0005)
+
+    discharges = np.maximum(np.round(beds * 45 * rng.lognormal(0, 0.35, n_rows)), 20)
+    df['Number of Discharges'] = _with_missing(discharges, rng, 0.0005)
+    df['Number of Medicare Discharges'] = _with_missing(
+        np.maximum(np.round(discharges * payor[:, 0] * rng.lognormal(-0.2, 0.2, n_rows)), 20), rng, 0.0005)
+    df['Total Surgeries'] = _with_missing(np.maximum(np.round(beds * 39 * rng.lognormal(0, 0.5, n_rows)), 100),
+                                          rng, 0.003)
+    df['Medical School Affiliation'] = _sample(rng, MEDICAL_SCHOOL_WEIGHTS, n_rows)
+
+    n_acos = max(1, n_rows // 5)
+    aco_names = _names(SYSTEM_WORDS + CITY_STEMS, ["ACO LLC", "Accountable Care Organization",
+                                                   "Care Network ACO", "Quality Alliance"], n_acos, rng)
+    aco_counts = np.where(rng.random(n_rows) < 0.63, rng.geometric(0.55, n_rows), 0)
+    df['ACO Affiliations'] = pd.Series([
+        ", ".join(sorted(set(aco_names[rng.integers(0, n_acos, count)]))) if count else None
+        for count in aco_counts
+    ], dtype=object)
+    return df
+
+def generate_hospital_data(n_rows, year=2022, seed=0, profiles=None):
+    """One year of synthetic hospital data with the raw workbook's columns and types"""
+    if profiles is None:
+        profiles = generate_hospital_profiles(n_rows, seed)
+    df = profiles.copy()
+    n_rows = len(df)
+    size = df.pop('_size').to_numpy()
+    rng = np.random.default_rng([seed, year])
+    # Gentle year-over-year drift so multi-year runs show trends
+    drift = year - 2022
+
+    # DRG volume is only reported for larger programs; CMS suppresses counts under 11
+    has_drg = rng.random(n_rows) < 1 / (1 + np.exp(-(0.75 + 1.5 * size)))
+    claims = np.round(11 + np.exp(np.log(21) + 0.6 * size + rng.normal(0, 0.75, n_rows)))
+    df['Medicare Total Claims'] = np.where(has_drg, claims, np.nan)
+
+    cmi = np.clip(rng.normal(3.18 + 0.1 * size + 0.01 * drift, 0.32, n_rows), 1.8, 4.5).round(2)
+    cmi_z = (cmi - 3.18) / 0.34
+    alos = np.exp(np.log(7.3 - 0.05 * drift) + 0.27 * (0.5 * cmi_z + np.sqrt(0.75) * rng.normal(0, 1, n_rows)))
+    df['ALOS'] = np.where(has_drg, np.clip(alos.round(1), 0.5, 23.5), np.nan)
+
+    # CMI text cells: "Data unavailable" where there is no DRG data (mostly), integral values stored as ints
+    has_cmi = has_drg ^ (rng.random(n_rows) < 0.025)
+    cmi_cells = np.array([int(v) if v.is_integer() else v for v in cmi.tolist()], dtype=object)
+    cmi_cells[~has_cmi] = CMI_UNAVAILABLE
+    df['CMI'] = pd.Series(cmi_cells, dtype=object)
+
+    # Readmissions are binomial on volume; small unreported programs still get coarse rates
+    true_rate = rng.beta(3.0, 18.0 + 0.3 * drift, n_rows)
+    volume = np.where(has_drg, claims, rng.integers(1, 11, n_rows)).astype(np.int64)
+    readmits = rng.binomial(volume, true_rate)
+    reported = np.where(has_drg, readmits > 0, rng.random(n_rows) < 0.4)
+    readmits = np.maximum(readmits, 1)
+    df['Readmission Rate'] = np.where(reported, np.clip((readmits / volume).round(3), 0.0, 1.0), np.nan)
+
+    margin = rng.standard_t(3, n_rows) * 0.09 - 0.036 + 0.005 * drift
+    df['Net Operating Profit Margin'] = _with_missing(np.clip(margin, -3.5, 5.5).round(3), rng, 0.007)
+    beds = df['Number of Staffed Beds'].to_numpy()
+    df['Total Days'] = _with_missing(np.maximum(np.round(beds * rng.lognormal(0, 0.5, n_rows)), 11), rng, 0.067)
+    df['Unnamed: 17'] = np.nan
+
+    return df[SOURCE_COLUMNS]
+
+def generate_years(n_rows, years, seed=0):
+    """The same hospitals across several years, as {year: DataFrame}"""
+    profiles = generate_hospital_profiles(n_rows, seed)
+    return {year: generate_hospital_data(n_rows, year, seed, profiles) for year in years}
+
+def output_path(output_dir, prefix, year, extension):
+    return os.path.join(output_dir, f"{prefix} {year}.{extension}")
+
+def write_dataset(df, path, export_format):
+    """Write one generated year; the untitled column keeps a blank header in CSV and Excel
+
+    Arrow columns are single-typed, so columnar outputs carry CMI as text that
+    still needs the loader's numeric coercion.
+    """
+    if export_format in ("CSV", "Excel"):
+        df = df.rename(columns={'Unnamed: 17': ''})
+    else:
+        df = df.assign(CMI=df['CMI'].astype(str))
+    with open(path, "wb") as f:
+        EXPORT_FORMATS[export_format].writer(df, f)
+
+FORMAT_CHOICES = {"xlsx": "Excel", "csv": "CSV", "parquet": "Parquet", "arrow": "Arrow IPC"}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="synthetic_data",
+        description="Generate schema-faithful synthetic hospital workbooks for scale testing."
+    )
+    parser.add_argument("--rows", type=int, default=2913, help="Hospitals per year (default: %(default)s)")
+    parser.add_argument("--years", nargs="+", type=int, default=[2022], help="Years to generate (default: 2022)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: %(default)s)")
+    parser.add_argument("--formats", nargs="+", choices=list(FORMAT_CHOICES), default=["xlsx"],
+                        help="Output formats (default: xlsx)")
+    parser.add_argument("--output", default="synthetic", help="Output directory (default: %(default)s)")
+    parser.add_argument("--prefix", default="Synthetic CMI-LOS-DRG 329-334",
+                        help="File name prefix; the year is appended (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if args.rows < 1:
+        parser.error("--rows must be at least 1")
+    if "xlsx" in args.formats and args.rows > EXCEL_ROW_LIMIT:
+        parser.error(f"xlsx holds at most {EXCEL_ROW_LIMIT:,} rows per sheet; use csv, parquet or arrow")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.makedirs(args.output, exist_ok=True)
+    profiles = generate_hospital_profiles(args.rows, args.seed)
+    for year in args.years:
+        df = generate_hospital_data(args.rows, year, args.seed, profiles)
+        for extension in args.formats:
+            path = output_path(args.output, args.prefix, year, extension)
+            write_dataset(df, path, FORMAT_CHOICES[extension])
+            print(f"Wrote {len(df):,} hospitals to '{path}'")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
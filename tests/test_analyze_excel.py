@@ -0,0 +1,10 @@
+import os
+
+from analyze_excel import profile_stem
+
+def test_same_named_extracts_in_different_directories_get_distinct_profiles(tmp_path):
+    first = os.path.join(tmp_path, "vendor_a", "extract.xlsx")
+    second = os.path.join(tmp_path, "vendor_b", "extract.xlsx")
+    assert profile_stem(first, "Sheet1") != profile_stem(second, "Sheet1")
+    assert profile_stem(first, "Sheet1") == profile_stem(first, "Sheet1")
+    assert profile_stem(first, "Sheet 1") != profile_stem(first, "Sheet-1")
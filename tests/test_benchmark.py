@@ -0,0 +1,38 @@
+import numpy as np
+
+import benchmark
+import percentiles
+from comparator_index import ComparatorIndex, SelectorCatalog
+from prepared_data import clean_hospital_data
+from risk_adjustment import RiskModel
+from synthetic_data import generate_hospital_data
+
+def test_rank_warm_reuses_memoized_distributions(monkeypatch):
+    df = clean_hospital_data(generate_hospital_data(3_000, seed=0))
+    comparator_index = ComparatorIndex(df)
+    selections = benchmark.sample_selections(df, SelectorCatalog(df), 6, np.random.default_rng(0))
+    resolved = benchmark.resolve_selections(df, comparator_index, RiskModel(df, comparator_index), selections)
+
+    builds = []
+
+    class CountingDistribution(percentiles.MetricDistribution):
+        def __init__(self, values):
+            builds.append(values)
+            super().__init__(values)
+
+    built_by_stage = {}
+    measure = benchmark.measure
+
+    def counting_measure(stage, *args, **kwargs):
+        before = len(builds)
+        result = measure(stage, *args, **kwargs)
+        built_by_stage[stage] = len(builds) - before
+        return result
+
+    monkeypatch.setattr(percentiles, "MetricDistribution", CountingDistribution)
+    monkeypatch.setattr(benchmark, "measure", counting_measure)
+    cold, warm = benchmark.measure_ranking(df, comparator_index, resolved, len(df), repeat=2)
+
+    assert (cold['stage'], warm['stage']) == ("rank_cold", "rank_warm")
+    assert built_by_stage["rank_cold"] > 0
+    assert built_by_stage["rank_warm"] == 0
@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+
+from bootstrap import BOOTSTRAP_MAX_ROWS, BOOTSTRAP_QUANTILES, quantile_intervals, resample_quantiles, seeded_rng
+
+def test_order_statistic_interval_takes_over_from_a_matching_bootstrap():
+    values = np.sort(np.random.default_rng(1).gamma(2.0, 0.1, BOOTSTRAP_MAX_ROWS + 1))
+    resampled = quantile_intervals(values[:-1], rng=seeded_rng(0))
+    order_statistic = quantile_intervals(values)
+    for q in BOOTSTRAP_QUANTILES:
+        assert np.allclose(resampled[q], order_statistic[q], rtol=1e-3)
+
+def test_default_comparator_group_is_bootstrapped():
+    all_hospitals = pd.read_excel("Readmission CMI-LOS-DRG 329-334 2022.xlsx")
+    assert len(all_hospitals) <= BOOTSTRAP_MAX_ROWS
+
+def test_resampled_quantiles_match_resampling_every_row():
+    n, resamples = 301, 20_000
+    values = np.sort(np.random.default_rng(2).gamma(2.0, 0.1, n))
+    drawn = resample_quantiles(values, BOOTSTRAP_QUANTILES, resamples, seeded_rng(0))
+    rows = values[seeded_rng(1).integers(0, n, size=(resamples, n))]
+    resampled = np.quantile(rows, BOOTSTRAP_QUANTILES, axis=1).T
+    bounds = (0.025, 0.5, 0.975)
+    assert np.allclose(np.quantile(drawn, bounds, axis=0), np.quantile(resampled, bounds, axis=0), rtol=1e-3)
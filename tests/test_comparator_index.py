@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+from comparator_index import ClaimsRangeIndex
+
+CLAIMS = np.array([100.0, 104.0, 96.0, 150.0, 50.0, np.nan, 103.0])
+PERCENTS = [1, 5, 10, 60]
+
+def shown_rows(index, center, percent, include):
+    """Row positions the peer table shows: the claims window joined with the included rows"""
+    tolerance = center * percent / 100
+    return set(index.window(center - tolerance, center + tolerance)) | set(include)
+
+@pytest.mark.parametrize("include", [None, [0], [3, 4], [0, 3, 5]])
+def test_peer_counts_match_window_joined_with_included_rows(include):
+    index = ClaimsRangeIndex(CLAIMS)
+    center = np.nanmean(CLAIMS[include]) if include else 100.0
+    counts = index.peer_counts(center, PERCENTS, include)
+    expected = [len(shown_rows(index, center, percent, include or [])) for percent in PERCENTS]
+    assert counts.tolist() == expected
@@ -0,0 +1,20 @@
+import tracemalloc
+
+from instrumentation import profile_rerun
+
+def test_profile_rerun_times_without_tracing_by_default():
+    with profile_rerun("page") as profile:
+        assert not tracemalloc.is_tracing()
+        with profile.stage("work"):
+            bytearray(1 << 20)
+    assert profile.wall_ms is not None
+    assert profile.peak_bytes is None
+    assert all(stage["peak_bytes"] is None for stage in profile.stages)
+
+def test_profile_rerun_traces_memory_when_asked():
+    with profile_rerun("page", trace_memory=True) as profile:
+        with profile.stage("work"):
+            buffer = bytearray(1 << 20)
+        del buffer
+    assert not tracemalloc.is_tracing()
+    assert profile.stages[1]["peak_bytes"] >= 1 << 20
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from comparator_index import ComparatorIndex
+from percentiles import (HISTOGRAM_BIN_METHODS, LEAGUE_COMPARATORS, SUMMARY_METRICS, PercentileEngine,
+                         league_table, league_table_column)
+from prepared_data import clean_hospital_data
+from risk_adjustment import RISK_ADJUSTED_METRICS, RiskModel
+
+DATA_FILE = "Readmission CMI-LOS-DRG 329-334 2022.xlsx"
+
+@pytest.fixture(scope="module")
+def comparator_index(df):
+    return ComparatorIndex(df)
+
+@pytest.fixture(scope="module")
+def df():
+    return clean_hospital_data(pd.read_excel(DATA_FILE))
+
+@pytest.fixture(scope="module")
+def engine(df, comparator_index):
+    return PercentileEngine(df, comparator_index, RiskModel(df, comparator_index))
+
+@pytest.mark.parametrize("method", HISTOGRAM_BIN_METHODS)
+@pytest.mark.parametrize("metric", RISK_ADJUSTED_METRICS)
+def test_histogram_counts_every_value_of_every_group(engine, comparator_index, metric, method):
+    groups = [None] + [(dimension, key) for dimension in comparator_index.dimensions
+                       for key in comparator_index.keys(dimension)]
+    for group in groups:
+        distribution = engine.distribution(group, metric)
+        if distribution.empty:
+            continue
+        edges, counts = engine.histogram(group, metric, method)
+        assert counts.sum() == distribution.count, group
+
+def test_league_table_matches_engine_percentiles(df, comparator_index, engine):
+    table = league_table(df, risk_model=engine.risk_model, comparator_index=comparator_index)
+    for comparator, dimension in LEAGUE_COMPARATORS.items():
+        for position in range(len(df)):
+            row = df.iloc[[position]]
+            key = comparator_index.key_for(dimension, row) if dimension else None
+            group = None if key is None else (dimension, key)
+            # The index hospital's values as the app computes them
+            row = engine.risk_model.assign(row, group)
+            for metric in SUMMARY_METRICS:
+                value = row[metric].iloc[0]
+                expected = np.nan if pd.isna(value) else engine.percentile_of(group, metric, value)
+                actual = table[league_table_column(metric, comparator)].iloc[position]
+                assert actual == expected or (np.isnan(actual) and np.isnan(expected)), \
+                    (comparator, metric, position)
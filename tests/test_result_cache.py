@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+import comparator_index
+from comparator_index import ComparatorIndex
+from prepared_data import clean_hospital_data
+from result_cache import BoundedMemo
+
+def test_bounded_memo_evicts_least_recently_used():
+    memo = BoundedMemo(max_entries=2)
+    memo.setdefault("a", 1)
+    memo.setdefault("b", 2)
+    assert memo.get("a") == 1
+    memo.setdefault("c", 3)
+    assert memo.get("b") is None
+    assert (memo.get("a"), memo.get("c"), len(memo), memo.evictions) == (1, 3, 2, 1)
+
+def test_bounded_memo_keeps_the_first_stored_value():
+    memo = BoundedMemo()
+    assert memo.get_or_compute("k", lambda: "first") == "first"
+    assert memo.setdefault("k", "second") == "first"
+
+def test_similarity_neighbour_memo_is_bounded(monkeypatch):
+    monkeypatch.setattr(comparator_index, "NEIGHBOR_MEMO_ENTRIES", 8)
+    df = clean_hospital_data(pd.read_excel("Readmission CMI-LOS-DRG 329-334 2022.xlsx"))
+    similarity = ComparatorIndex(df).similarity
+    providers = df['Provider'].astype(str)
+    providers = [p for p in providers if similarity.contains(p)][:5]
+    for provider in providers:
+        for k in (10, 20, 30):
+            first = similarity.neighbors(provider, k=k)
+            assert np.array_equal(similarity.neighbors(provider, k=k), first)
+    assert len(similarity._neighbors) == 8